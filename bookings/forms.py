@@ -9,18 +9,14 @@ from crispy_forms.helper import FormHelper, Layout
 from crispy_forms.layout import Submit, Row, Column
 from crispy_forms.bootstrap import AccordionGroup, InlineRadios, Field
 from crispy_bootstrap5.bootstrap5 import FloatingField, BS5Accordion
-import django_rq
 
 from common_config.common import PAYMENT_MODES_FORM
-from whatsapp.messages.message_handlers import handle_sending_booking_ticket
+from whatsapp.messages.message_handlers import queue_booking_ticket
 from .utils import add_payment_to_booking, create_or_update_booking
 from .models import Booking, BookingCanteen, BookingCostume, BookingLocker, Payment
 from management_core.models import Costume, Locker, TicketPrice
 
 
-high_queue = django_rq.get_queue("high")
-
-
 ## GATE MANAGEMENT FORMS
 class BookingForm(forms.Form):
     wa_number = forms.CharField(
@@ -251,20 +247,14 @@ class PaymentRecordForm(forms.Form):
     def save(self) -> Booking:
         try:
             booking: Booking = self.cleaned_data["booking"]
-            add_payment_to_booking(
-                booking=self.cleaned_data["booking"],
-                amount=self.cleaned_data["payment_amount"],
-                payment_for="booking",
-                payment_mode=self.cleaned_data["payment_mode"],
-            )
-            high_queue.enqueue(
-                handle_sending_booking_ticket,
-                booking.wa_number,
-                "",
-                None,
-                booking,
-                False
-            )
+            with transaction.atomic():
+                add_payment_to_booking(
+                    booking=self.cleaned_data["booking"],
+                    amount=self.cleaned_data["payment_amount"],
+                    payment_for="booking",
+                    payment_mode=self.cleaned_data["payment_mode"],
+                )
+                queue_booking_ticket(booking)
             return self.cleaned_data["booking"]
         except Exception as e:
             self.add_error(None, e.args[0])
@@ -380,14 +370,7 @@ class PaymentRecordEditForm(forms.Form):
                 payment.save()
                 payment.booking.save()
 
-                high_queue.enqueue(
-                    handle_sending_booking_ticket,
-                    payment.booking.wa_number,
-                    "",
-                    None,
-                    payment.booking,
-                    False
-                )
+                queue_booking_ticket(payment.booking)
             return payment.booking
         except Exception as e:
             self.add_error(None, e.args[0])
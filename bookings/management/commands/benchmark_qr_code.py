@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+import base64
+import time
+import uuid
+
+from bookings.ticket.utils import generate_qr_code
+from common_config.benchmark import format_summary, summarize_timings
+
+
+class Command(BaseCommand):
+    help = "Compare png and svg QR code generation with a cold and a warm cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=200)
+        parser.add_argument("--formats", default="png,svg")
+
+    def handle(self, *args, **options):
+        iterations = options["iterations"]
+        booking_ids = [str(uuid.uuid4()) for _ in range(iterations)]
+        for image_format in options["formats"].split(","):
+            image_format = image_format.strip()
+            generate_qr_code.cache_clear()
+
+            # Cold: every booking id is new, the image is built and written to the cache
+            cold = self.time_calls(booking_ids, image_format)
+            # Shared cache: process cache is empty, the image is read from the django cache
+            generate_qr_code.cache_clear()
+            shared = self.time_calls(booking_ids, image_format)
+            # Warm: the image is served from the process cache
+            warm = self.time_calls(booking_ids, image_format)
+
+            encoded = generate_qr_code(booking_ids[0], image_format=image_format)
+            for name, (timings, elapsed) in (
+                ("cold", cold),
+                ("django_cache", shared),
+                ("warm", warm),
+            ):
+                summary = summarize_timings(timings, elapsed)
+                summary["image_bytes"] = len(base64.b64decode(encoded))
+                summary["embedded_bytes"] = len(encoded)
+                self.stdout.write(format_summary(f"{image_format} {name}", summary))
+
+    def time_calls(self, booking_ids, image_format):
+        timings = []
+        start = time.perf_counter()
+        for booking_id in booking_ids:
+            call_start = time.perf_counter()
+            generate_qr_code(booking_id, image_format=image_format)
+            timings.append(time.perf_counter() - call_start)
+        return timings, time.perf_counter() - start
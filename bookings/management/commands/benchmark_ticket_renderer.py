@@ -0,0 +1,94 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+import tempfile
+import time
+import os
+
+from bookings.models import Booking
+from bookings.ticket.renderer import (
+    is_renderer_available,
+    render_pdf,
+    render_pdf_with_renderer,
+)
+from bookings.ticket.image import render_ticket_image
+from bookings.ticket.utils import (
+    generate_qr_code,
+    get_booking_ticket_context,
+    get_booking_ticket_data,
+    html_to_pdf,
+    render_ticket_html,
+)
+from common_config.benchmark import format_summary, summarize_timings
+from common_config.common import LOCALHOST_URL
+
+
+class Command(BaseCommand):
+    help = "Compare per ticket latency and throughput of the ticket rendering paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--booking-id", help="Booking to render (default: latest paid booking)")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--concurrency", type=int, default=1)
+        parser.add_argument(
+            "--modes",
+            default="http,local,renderer,png,jpeg",
+            help="Comma separated paths to benchmark: http, local, renderer, png, jpeg",
+        )
+        parser.add_argument(
+            "--base-url",
+            default=LOCALHOST_URL,
+            help="Server used by the http path which fetches the ticket page",
+        )
+
+    def handle(self, *args, **options):
+        booking_id = options["booking_id"]
+        if not booking_id:
+            booking = Booking.objects.filter(received_amount__gt=0).order_by("-created_at").first()
+            if not booking:
+                raise CommandError("No paid booking found, pass --booking-id.")
+            booking_id = str(booking.id)
+        html = render_ticket_html(booking_id)
+        context = get_booking_ticket_context(*get_booking_ticket_data(booking_id))
+        qr_code_png = generate_qr_code(booking_id, image_format="png")
+        output_dir = tempfile.mkdtemp(prefix="ticket_benchmark_")
+
+        renderers = {
+            "http": lambda path: html_to_pdf(
+                f"{options['base_url']}/bookings/booking/{booking_id}/ticket", path
+            ),
+            "local": lambda path: render_pdf(html, path),
+            "renderer": lambda path: render_pdf_with_renderer(html, path),
+            "png": lambda path: render_ticket_image(context, qr_code_png, path, "png"),
+            "jpeg": lambda path: render_ticket_image(context, qr_code_png, path, "jpeg"),
+        }
+        for mode in options["modes"].split(","):
+            mode = mode.strip()
+            if mode not in renderers:
+                raise CommandError(f"Unknown mode: {mode}")
+            if mode == "renderer" and not is_renderer_available():
+                self.stdout.write("renderer: skipped, ticket renderer is not running")
+                continue
+            self.run_benchmark(mode, renderers[mode], output_dir, options)
+
+    def run_benchmark(self, mode, render, output_dir, options):
+        def render_one(index: int) -> float:
+            path = os.path.join(output_dir, f"{mode}_{index}")
+            start = time.perf_counter()
+            render(path)
+            return time.perf_counter() - start
+
+        try:
+            # The first render pays the cold start costs of the path, report it separately
+            cold = render_one(-1)
+        except Exception as e:
+            self.stdout.write(f"{mode}: failed, {e}")
+            return
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+            timings = list(executor.map(render_one, range(options["iterations"])))
+        elapsed = time.perf_counter() - start
+
+        summary = summarize_timings(timings, elapsed)
+        summary["cold_ms"] = round(cold * 1000, 2)
+        summary["size_bytes"] = os.path.getsize(os.path.join(output_dir, f"{mode}_-1"))
+        self.stdout.write(format_summary(mode, summary))
@@ -0,0 +1,71 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.utils import timezone
+import tempfile
+import os
+
+from bookings.models import Booking, BookingCostume
+from bookings.ticket.renderer import render_pdf
+from bookings.ticket.utils import get_booking_ticket_context
+from common_config.common import TICKET_PDF_SIZE_BUDGET_BYTES
+from management_core.models import Costume, TicketPrice
+
+
+def get_sample_ticket_data() -> tuple[Booking, TicketPrice, list[BookingCostume]]:
+    """Build an unsaved booking which fills every section of the ticket"""
+    price_list = TicketPrice(
+        date=timezone.localdate(), adult=Decimal("700.00"), child=Decimal("500.00")
+    )
+    booking = Booking(
+        wa_number="919999999999",
+        date=price_list.date,
+        adult_male=4,
+        adult_female=4,
+        child=3,
+        infant=1,
+        ticket_amount=Decimal("7100.00"),
+        costume_received_amount=Decimal("600.00"),
+        total_amount=Decimal("7700.00"),
+        received_amount=Decimal("1100.00"),
+    )
+    costume_data = [
+        BookingCostume(
+            booking=booking,
+            costume=Costume(name=name, price=Decimal("100.00")),
+            quantity=3,
+            deposit_amount=Decimal("300.00"),
+        )
+        for name in ("Male", "Female")
+    ]
+    return booking, price_list, costume_data
+
+
+class Command(BaseCommand):
+    help = "Render a sample ticket pdf and fail when it is larger than the ticket size budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget",
+            type=int,
+            default=TICKET_PDF_SIZE_BUDGET_BYTES,
+            help="Maximum pdf size in bytes (default: TICKET_PDF_SIZE_BUDGET_BYTES)",
+        )
+        parser.add_argument("--output", help="Keep the rendered pdf at this path")
+
+    def handle(self, *args, **options):
+        context = get_booking_ticket_context(*get_sample_ticket_data())
+        html = render_to_string("booking/booking_ticket.html", context)
+
+        output_path = options["output"]
+        if not output_path:
+            output_path = os.path.join(tempfile.mkdtemp(prefix="ticket_size_"), "ticket.pdf")
+        size = render_pdf(html, output_path)
+
+        self.stdout.write(
+            f"Ticket pdf: {size} bytes, budget: {options['budget']} bytes, html: {len(html)} bytes"
+        )
+        if size > options["budget"]:
+            raise CommandError(
+                f"Ticket pdf is {size - options['budget']} bytes over the budget."
+            )
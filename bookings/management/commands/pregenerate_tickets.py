@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from bookings.ticket.batch import pregenerate_tickets_for_date
+
+
+class Command(BaseCommand):
+    help = "Render the tickets of all the paid bookings of a visit date into the ticket cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            help="Visit date in dd-mm-YYYY format (default: tomorrow)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Number of render processes (default: TICKET_PREGENERATION_WORKERS or number of cores)",
+        )
+
+    def handle(self, *args, **options):
+        if options["date"]:
+            try:
+                date = datetime.strptime(options["date"], "%d-%m-%Y").date()
+            except ValueError:
+                raise CommandError("Date must be in dd-mm-YYYY format.")
+        else:
+            date = timezone.localtime(timezone.now()).date() + timedelta(days=1)
+
+        summary = pregenerate_tickets_for_date(date, options["workers"])
+        for result in summary["results"]:
+            status = "error" if result["error"] else "hit" if result["cached"] else "rendered"
+            self.stdout.write(
+                f"{result['booking_id']}  {result['seconds'] * 1000:9.1f} ms  {result['size_bytes']:8d} B  {status}"
+            )
+        self.stdout.write(
+            f"{summary['date']}: {summary['total']} tickets, {summary['rendered']} rendered, "
+            f"{summary['cached']} cached, {summary['failed']} failed in {summary['seconds']}s, "
+            f"largest {summary['max_size_bytes']} bytes"
+        )
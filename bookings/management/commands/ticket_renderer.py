@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.ticket.renderer import TicketRendererServer
+from common_config.common import TICKET_RENDERER_SOCKET, TICKET_RENDERER_WORKERS
+
+
+class Command(BaseCommand):
+    help = "Run the persistent ticket renderer with pre-loaded WeasyPrint static files and fonts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--socket",
+            default=TICKET_RENDERER_SOCKET,
+            help="Unix socket to listen on (default: TICKET_RENDERER_SOCKET)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=TICKET_RENDERER_WORKERS,
+            help="Number of renderer processes (default: TICKET_RENDERER_WORKERS)",
+        )
+
+    def handle(self, *args, **options):
+        if not options["socket"]:
+            raise CommandError("Set TICKET_RENDERER_SOCKET or pass --socket.")
+        server = TicketRendererServer(options["socket"], options["workers"])
+        self.stdout.write(
+            f"Starting ticket renderer on {options['socket']} with {options['workers']} workers"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.shutdown()
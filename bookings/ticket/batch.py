@@ -0,0 +1,95 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date, timedelta
+from django.db import connections
+from django.utils import timezone
+import multiprocessing
+import logging
+import time
+import os
+
+from bookings.models import Booking
+from common_config.common import TICKET_PREGENERATION_WORKERS, WHATSAPP_TICKET_FORMAT
+from .utils import get_or_create_ticket, get_ticket_size
+
+logging.getLogger(__name__)
+
+# The pdf of the ticket page and the format of the ticket sent on WhatsApp
+TICKET_PREGENERATION_FORMATS = list(dict.fromkeys(["pdf", WHATSAPP_TICKET_FORMAT]))
+
+
+def render_ticket_for_batch(booking_id: str) -> dict:
+    """Render the ticket of a single booking in every `TICKET_PREGENERATION_FORMATS` inside the
+    batch pool and time it
+
+    :param booking_id: booking id for which ticket is to be rendered
+
+    :return: dict with booking id, seconds taken, pdf size, whether all the formats were cached
+        and the error if any
+    """
+    start = time.perf_counter()
+    result = {"booking_id": booking_id, "cached": True, "error": None, "size_bytes": 0}
+    try:
+        for ticket_format in TICKET_PREGENERATION_FORMATS:
+            file_name, cached = get_or_create_ticket(booking_id, ticket_format)
+            result["cached"] = result["cached"] and cached
+            if ticket_format == "pdf":
+                result["size_bytes"] = get_ticket_size(file_name)
+    except Exception as e:
+        logging.exception(e)
+        result["cached"] = False
+        result["error"] = str(e)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def pregenerate_tickets_for_date(date: Date, workers: int | None = None) -> dict:
+    """Render tickets of all the paid bookings of the date in parallel so they are in the ticket cache
+
+    :param date: visit date of the bookings
+    :param workers: number of processes to render with, defaults to `TICKET_PREGENERATION_WORKERS`
+        or the number of cores
+
+    :return: summary of the run with the per ticket results
+    """
+    booking_ids = [
+        str(booking_id)
+        for booking_id in Booking.objects.filter(
+            date=date, received_amount__gt=0
+        ).values_list("id", flat=True)
+    ]
+    workers = workers or TICKET_PREGENERATION_WORKERS or os.cpu_count()
+    logging.info(
+        f"Pre-generating {len(booking_ids)} tickets for {date} with {workers} workers"
+    )
+    start = time.perf_counter()
+    results = []
+    if booking_ids:
+        # Forked processes must open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(booking_ids)),
+            mp_context=multiprocessing.get_context("fork"),
+        ) as executor:
+            for result in executor.map(render_ticket_for_batch, booking_ids):
+                logging.info(
+                    f"Ticket {result['booking_id']}: {result['seconds']:.3f}s {result['size_bytes']} bytes cached={result['cached']} error={result['error']}"
+                )
+                results.append(result)
+    elapsed = time.perf_counter() - start
+    return {
+        "date": str(date),
+        "total": len(results),
+        "rendered": sum(1 for r in results if not r["cached"] and not r["error"]),
+        "cached": sum(1 for r in results if r["cached"]),
+        "failed": sum(1 for r in results if r["error"]),
+        "seconds": round(elapsed, 3),
+        "max_size_bytes": max((r["size_bytes"] for r in results), default=0),
+        "results": results,
+    }
+
+
+def pregenerate_next_day_tickets() -> str:
+    """Scheduled job to warm the ticket cache with the tickets of the next day"""
+    date = timezone.localtime(timezone.now()).date() + timedelta(days=1)
+    summary = pregenerate_tickets_for_date(date)
+    return f"Pre-generated tickets for {summary['date']}: rendered={summary['rendered']}, cached={summary['cached']}, failed={summary['failed']} in {summary['seconds']}s"
@@ -0,0 +1,150 @@
+from functools import lru_cache
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+from django.template.loader import get_template
+import hashlib
+import json
+
+from bookings.models import Booking, BookingCostume
+from management_core.models import TicketPrice
+from common_config.common import TICKET_PDF_SIZE_BUDGET_BYTES, TICKET_QR_CODE_FORMAT
+
+TICKET_CACHE_HIT_KEY = "ticket_cache_hits"
+TICKET_CACHE_MISS_KEY = "ticket_cache_misses"
+TICKET_SIZE_TOTAL_KEY = "ticket_size_total_bytes"
+TICKET_SIZE_COUNT_KEY = "ticket_size_count"
+TICKET_SIZE_MAX_KEY = "ticket_size_max_bytes"
+TICKET_SIZE_OVER_BUDGET_KEY = "ticket_size_over_budget"
+TICKET_TEMPLATES = ["booking/booking_ticket.html", "base.html"]
+
+# Stores the value if it is larger than the stored one, in one step so concurrent renders do not
+# overwrite a larger size with a smaller one. The redis cache stores integers as plain numbers.
+MAX_VALUE_SCRIPT = """
+local value = tonumber(ARGV[1])
+if value > (tonumber(redis.call("GET", KEYS[1])) or 0) then
+    redis.call("SET", KEYS[1], value)
+end
+"""
+
+
+@lru_cache(maxsize=1)
+def get_ticket_template_hash() -> str:
+    """Hash of the ticket template sources so that template changes invalidate the cached tickets"""
+    digest = hashlib.sha256()
+    for template_name in TICKET_TEMPLATES:
+        digest.update(get_template(template_name).template.source.encode())
+    return digest.hexdigest()
+
+
+def get_ticket_fingerprint(
+    booking: Booking,
+    price_list: TicketPrice | None,
+    costume_data: list[BookingCostume],
+    ticket_format: str = "pdf",
+) -> str:
+    """Generate fingerprint over the fields which are shown on the ticket
+
+    :param booking: booking of the ticket
+    :param price_list: ticket price for the date of the booking
+    :param costume_data: costumes booked with the booking
+    :param ticket_format: format of the rendered ticket
+
+    :return: sha256 hex digest of the ticket data
+    """
+    data = {
+        "format": ticket_format,
+        "template": get_ticket_template_hash(),
+        "qr_code": TICKET_QR_CODE_FORMAT,
+        "booking": [
+            str(booking.id),
+            booking.wa_number,
+            str(booking.date),
+            booking.adult_male,
+            booking.adult_female,
+            booking.child,
+            booking.infant,
+            str(booking.ticket_amount),
+            str(booking.costume_received_amount),
+            str(booking.total_amount),
+            str(booking.received_amount),
+        ],
+        "costumes": sorted(
+            [
+                str(costume.costume),
+                str(costume.costume.price),
+                costume.quantity,
+                str(costume.deposit_amount),
+            ]
+            for costume in costume_data
+        ),
+        "price_list": (
+            [str(price_list.adult), str(price_list.child)] if price_list else None
+        ),
+    }
+    return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
+def _increment_counter(key: str, delta: int = 1) -> None:
+    cache.add(key, 0, timeout=None)
+    cache.incr(key, delta)
+
+
+def _record_max(key: str, value: int) -> None:
+    """Store the value in the cache if it is larger than the cached one
+
+    On the redis cache the comparison runs as a Lua script on the cache connection, the other
+    backends are only used locally and compare in python.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, RedisCache):
+        client = backend._cache.get_client(key, write=True)
+        client.eval(MAX_VALUE_SCRIPT, 1, backend.make_and_validate_key(key), value)
+    elif value > cache.get(key, 0):
+        cache.set(key, value, timeout=None)
+
+
+def record_ticket_cache_hit() -> None:
+    _increment_counter(TICKET_CACHE_HIT_KEY)
+
+
+def record_ticket_cache_miss() -> None:
+    _increment_counter(TICKET_CACHE_MISS_KEY)
+
+
+def record_ticket_size(size: int) -> bool:
+    """Record the size of a rendered ticket pdf
+
+    :param size: size of the pdf in bytes
+
+    :return: whether the pdf is within `TICKET_PDF_SIZE_BUDGET_BYTES`
+    """
+    _increment_counter(TICKET_SIZE_TOTAL_KEY, size)
+    _increment_counter(TICKET_SIZE_COUNT_KEY)
+    _record_max(TICKET_SIZE_MAX_KEY, size)
+    if size > TICKET_PDF_SIZE_BUDGET_BYTES:
+        _increment_counter(TICKET_SIZE_OVER_BUDGET_KEY)
+        return False
+    return True
+
+
+def get_ticket_cache_stats() -> dict:
+    """Get hit/miss counters of the ticket cache and the sizes of the rendered pdfs
+
+    :return: dict with `hits`, `misses`, `hit_ratio` and the pdf size stats
+    """
+    hits = cache.get(TICKET_CACHE_HIT_KEY, 0)
+    misses = cache.get(TICKET_CACHE_MISS_KEY, 0)
+    total = hits + misses
+    size_count = cache.get(TICKET_SIZE_COUNT_KEY, 0)
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / total, 4) if total else 0,
+        "rendered_pdfs": size_count,
+        "average_pdf_bytes": (
+            round(cache.get(TICKET_SIZE_TOTAL_KEY, 0) / size_count) if size_count else 0
+        ),
+        "max_pdf_bytes": cache.get(TICKET_SIZE_MAX_KEY, 0),
+        "pdf_size_budget_bytes": TICKET_PDF_SIZE_BUDGET_BYTES,
+        "pdfs_over_budget": cache.get(TICKET_SIZE_OVER_BUDGET_KEY, 0),
+    }
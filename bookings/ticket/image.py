@@ -0,0 +1,228 @@
+"""
+Image ticket renderer.
+
+Draws the ticket directly with Pillow for WhatsApp delivery where a single image is enough.
+It uses the same context as `booking/booking_ticket.html` so both tickets show the same
+values, keep `draw_ticket` in sync with the template when the ticket layout changes and bump
+`TICKET_IMAGE_LAYOUT_VERSION` so that the cached images are rendered again.
+"""
+
+from django.contrib.staticfiles import finders
+from django.contrib.humanize.templatetags.humanize import intcomma
+from django.template.defaultfilters import floatformat
+from django.utils.formats import date_format
+from PIL import Image, ImageDraw, ImageFont
+import base64
+import io
+import os
+
+from common_config.common import TICKET_IMAGE_BOLD_FONT, TICKET_IMAGE_FONT
+
+TICKET_IMAGE_LAYOUT_VERSION = 1
+TICKET_IMAGE_FORMATS = {"png": "PNG", "jpeg": "JPEG"}
+
+WIDTH = 600
+PADDING = 30
+LINE_HEIGHT = 34
+MAX_HEIGHT = 2400
+SECONDARY = (108, 117, 125)
+DANGER = (220, 53, 69)
+WARNING = (255, 193, 7)
+TOTAL_GREEN = (56, 255, 56)
+TICKET_TERMS = [
+    "Tickets once booked cannot be cancelled or refunded.",
+    "All rides are included in the ticket.",
+    "Please carry this ticket with you for verification.",
+]
+INFANT_TERM = "For infants please carry a valid ID proof for Date of birth verification."
+
+_fonts = {}
+_logo = None
+
+
+def get_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+    """Load the ticket font once per process, falls back to the Pillow default font"""
+    key = (size, bold)
+    if key not in _fonts:
+        try:
+            _fonts[key] = ImageFont.truetype(
+                TICKET_IMAGE_BOLD_FONT if bold else TICKET_IMAGE_FONT, size
+            )
+        except OSError:
+            _fonts[key] = ImageFont.load_default(size)
+    return _fonts[key]
+
+
+def get_logo() -> Image.Image | None:
+    global _logo
+    if _logo is None:
+        path = finders.find("images/logo.png")
+        if path and os.path.exists(path):
+            logo = Image.open(path).convert("RGBA")
+            logo.thumbnail((WIDTH, 80))
+            _logo = logo
+    return _logo
+
+
+class TicketCanvas:
+    """Small helper to draw the ticket top to bottom"""
+
+    def __init__(self):
+        self.image = Image.new("RGB", (WIDTH, MAX_HEIGHT), "white")
+        self.draw = ImageDraw.Draw(self.image)
+        self.y = 0
+
+    def text(self, x, text, fill="black", bold=False, size=20, anchor="la"):
+        self.draw.text(
+            (x, self.y + 6), str(text), fill=fill, font=get_font(size, bold), anchor=anchor
+        )
+
+    def row(self, cells, fill="black", background=None, bold=False):
+        """Draw a table row of `(x, text, anchor, bold)` cells"""
+        if background:
+            self.draw.rectangle(
+                (PADDING, self.y, WIDTH - PADDING, self.y + LINE_HEIGHT), fill=background
+            )
+        for x, text, anchor, cell_bold, *cell_fill in cells:
+            self.text(
+                x,
+                text,
+                fill=cell_fill[0] if cell_fill else fill,
+                bold=bold or cell_bold,
+                anchor=anchor,
+            )
+        self.y += LINE_HEIGHT
+
+    def separator(self):
+        self.y += 10
+        for x in range(0, WIDTH, 20):
+            self.draw.line((x, self.y, x + 10, self.y), fill="black", width=5)
+        self.y += 15
+
+    def crop(self) -> Image.Image:
+        return self.image.crop((0, 0, WIDTH, min(self.y + PADDING, MAX_HEIGHT)))
+
+
+def draw_ticket(context: dict, qr_code_png: str) -> Image.Image:
+    """Draw the ticket with the values of the ticket template context
+
+    :param context: context built by `get_booking_ticket_context`
+    :param qr_code_png: base64 encoded png of the booking QR code
+
+    :return: ticket image
+    """
+    booking = context["booking"]
+    canvas = TicketCanvas()
+    left, rate, quantity, right = PADDING + 10, 300, 420, WIDTH - PADDING - 10
+
+    canvas.y = 80
+    qr = Image.open(io.BytesIO(base64.b64decode(qr_code_png))).convert("RGB")
+    qr = qr.resize((WIDTH - 2 * PADDING, WIDTH - 2 * PADDING), Image.NEAREST)
+    canvas.image.paste(qr, (PADDING, canvas.y))
+    logo = get_logo()
+    if logo:
+        canvas.image.paste(logo, (20, 10), logo)
+    canvas.y += qr.height
+    canvas.separator()
+
+    canvas.row([(left, "WA Number", "la", True), (rate - 60, f"+{booking.wa_number}", "la", False)])
+    canvas.row([(left, "Date", "la", True), (rate - 60, date_format(booking.date), "la", False)])
+    canvas.y += 10
+    canvas.row(
+        [
+            (left, "Item", "la", True),
+            (rate, "Rate", "ma", True),
+            (quantity, "Quantity", "ma", True),
+            (right, "Total", "ra", True),
+        ]
+    )
+    rows = [
+        ("Adults (Male)", context["adult_male_price"], booking.adult_male, context["adult_male_total"]),
+        ("Adults (Female)", context["adult_female_price"], booking.adult_female, context["adult_female_total"]),
+        ("Children", context["child_price"], booking.child, context["child_total"]),
+    ]
+    if booking.infant > 0:
+        rows.append(("Infants", "0.00", booking.infant, "0.00"))
+    for name, price, count, total in rows:
+        canvas.row(
+            [
+                (left, name, "la", True),
+                (rate, price, "ma", False),
+                (quantity, count, "ma", False),
+                (right, total, "ra", False),
+            ]
+        )
+
+    if context["costume_data"]:
+        canvas.row([(WIDTH // 2, "Costume", "ma", True)], fill="white", background=SECONDARY)
+    for costume in context["costume_data"]:
+        canvas.row(
+            [
+                (left, costume.costume, "la", True),
+                (rate, costume.costume.price, "ma", False),
+                (quantity, costume.quantity, "ma", False),
+                (right, costume.deposit_amount, "ra", False),
+            ]
+        )
+
+    for label, amount in (
+        ("SGST (9%)", context["sgst_amount"]),
+        ("CGST (9%)", context["cgst_amount"]),
+        ("Total GST (18%)", context["gst_amount"]),
+    ):
+        canvas.row([(quantity + 40, label, "ra", True), (right, amount, "ra", False)])
+    canvas.row(
+        [
+            (WIDTH // 2 - 10, "Total", "ra", True, "white"),
+            (right, f"{intcomma(floatformat(booking.total_amount, 2))} INR", "ra", True, TOTAL_GREEN),
+        ],
+        background=SECONDARY,
+    )
+    canvas.row(
+        [
+            (WIDTH // 2 - 10, "Received Amount", "ra", True),
+            (right, f"{booking.received_amount} INR", "ra", False),
+        ]
+    )
+    canvas.row(
+        [
+            (WIDTH // 2 - 10, "Remaining Amount", "ra", True, "white"),
+            (right, f"{intcomma(floatformat(context['amount_to_collect'], 2))} INR", "ra", True, WARNING),
+        ],
+        background=SECONDARY,
+    )
+    canvas.separator()
+
+    terms = TICKET_TERMS[:2] + ([INFANT_TERM] if booking.infant > 0 else []) + TICKET_TERMS[2:]
+    for term in terms:
+        canvas.text(left, f"• {term}", fill=DANGER, bold=True, size=14)
+        canvas.y += 24
+    canvas.separator()
+
+    canvas.text(WIDTH // 2, "Thank you for visiting", bold=True, anchor="ma")
+    canvas.y += 28
+    canvas.text(WIDTH // 2, "Shree Ganesha Fun World", bold=True, anchor="ma")
+    canvas.y += 28
+    return canvas.crop()
+
+
+def render_ticket_image(
+    context: dict, qr_code_png: str, output_path: str, image_format: str = "png"
+) -> int:
+    """Render the ticket image and write it to the output path
+
+    :param context: context built by `get_booking_ticket_context`
+    :param qr_code_png: base64 encoded png of the booking QR code
+    :param output_path: path where the image is written
+    :param image_format: `png` or `jpeg`
+
+    :return: size of the written image in bytes
+    """
+    image = draw_ticket(context, qr_code_png)
+    if image_format == "jpeg":
+        image.save(output_path, TICKET_IMAGE_FORMATS[image_format], quality=85, optimize=True)
+    else:
+        # The ticket has a handful of flat colors, a 16 color palette keeps the png small
+        image = image.quantize(colors=16, method=Image.Quantize.FASTOCTREE)
+        image.save(output_path, TICKET_IMAGE_FORMATS[image_format])
+    return os.path.getsize(output_path)
@@ -0,0 +1,251 @@
+"""
+Persistent ticket renderer.
+
+A long lived renderer process keeps the discovered fonts, the bytes of the static files and the
+decoded logo between the renders, while every RQ job is a fresh fork which loads them again.
+The bootstrap stylesheet is still parsed on every render. It is linked by the ticket html so
+that it keeps the author origin, WeasyPrint gives the pre-parsed stylesheets the user origin.
+
+Start the renderer with `python manage.py ticket_renderer` and set `TICKET_RENDERER_SOCKET`
+so that `generate_ticket_pdf` sends the rendered html to it. If the renderer is not reachable
+the ticket is rendered in the calling process.
+
+This module is imported by the spawned renderer processes before django is set up so it must
+not import any models.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from urllib.parse import unquote
+from django.conf import settings
+from weasyprint import HTML, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
+import multiprocessing
+import threading
+import logging
+import time
+import os
+
+from common_config.common import (
+    TICKET_PDF_DPI,
+    TICKET_PDF_JPEG_QUALITY,
+    TICKET_RENDERER_SOCKET,
+    TICKET_RENDERER_TIMEOUT,
+    TICKET_RENDERER_WORKERS,
+)
+
+logging.getLogger(__name__)
+
+# Loaded by the warm up of the renderer processes
+TICKET_STYLESHEETS = ["bootstrap-5.3.3-dist/css/bootstrap.min.css"]
+
+_font_config = None
+_static_files = {}
+_static_image_cache = None
+
+
+def static_url_fetcher(url: str) -> dict:
+    """WeasyPrint url fetcher which resolves `STATIC_URL` assets from the local filesystem
+
+    The static files are read once per process and served from memory afterwards.
+
+    :param url: url requested by WeasyPrint while rendering
+
+    :return: WeasyPrint resource dict for the url
+    """
+    from django.contrib.staticfiles import finders
+
+    static_prefix = "file:///" + settings.STATIC_URL.lstrip("/")
+    if url.startswith(static_prefix):
+        if url not in _static_files:
+            relative_path = unquote(url[len(static_prefix) :])
+            file_path = finders.find(relative_path)
+            if not file_path and settings.STATIC_ROOT:
+                file_path = os.path.join(settings.STATIC_ROOT, relative_path)
+            if not file_path or not os.path.exists(file_path):
+                return default_url_fetcher(url)
+            resource = default_url_fetcher(Path(file_path).as_uri())
+            if "file_obj" in resource:
+                with resource.pop("file_obj") as f:
+                    resource["string"] = f.read()
+            _static_files[url] = resource
+        return dict(_static_files[url])
+    return default_url_fetcher(url)
+
+
+def get_ticket_pdf_options() -> dict:
+    """WeasyPrint options which keep the ticket pdf small
+
+    Fonts are subset to the glyphs used on the ticket and the logo and QR code are downsampled
+    to `TICKET_PDF_DPI` and recompressed.
+    """
+    return {
+        "full_fonts": False,
+        "hinting": False,
+        "optimize_images": True,
+        "dpi": TICKET_PDF_DPI,
+        "jpeg_quality": TICKET_PDF_JPEG_QUALITY,
+    }
+
+
+def get_font_config() -> FontConfiguration:
+    """Font configuration of the process, the discovered fonts are kept between the renders"""
+    global _font_config
+    if _font_config is None:
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+def get_image_cache() -> dict:
+    """Image cache of a render, seeded with the images of the first ticket rendered in this process
+
+    Every QR code is a unique `data:` url, so the cache is not shared between the renders and only
+    the static images i.e. the logo are carried over.
+    """
+    return dict(_static_image_cache or {})
+
+
+def keep_static_images(image_cache: dict) -> None:
+    """Freeze the images of the first rendered ticket without its QR code for the next renders"""
+    global _static_image_cache
+    if _static_image_cache is None and image_cache:
+        _static_image_cache = {
+            key: value for key, value in image_cache.items() if not key.startswith("data:")
+        }
+
+
+def render_pdf(html: str, output_path: str) -> int:
+    """Render ticket html to pdf with the static files, fonts and images cached in this process
+
+    :param html: rendered ticket html
+    :param output_path: path where the pdf is written
+
+    :return: size of the written pdf in bytes
+    """
+    image_cache = get_image_cache()
+    HTML(string=html, base_url="file:///", url_fetcher=static_url_fetcher).write_pdf(
+        output_path,
+        font_config=get_font_config(),
+        cache=image_cache,
+        **get_ticket_pdf_options(),
+    )
+    keep_static_images(image_cache)
+    return os.path.getsize(output_path)
+
+
+def init_renderer_process() -> None:
+    """Initializer of the renderer pool processes, loads django and warms up WeasyPrint"""
+    import django
+
+    django.setup()
+    links = "".join(
+        f'<link rel="stylesheet" href="{settings.STATIC_URL}{stylesheet}" />'
+        for stylesheet in TICKET_STYLESHEETS
+    )
+    HTML(
+        string=f"{links}<p>warm up</p>", base_url="file:///", url_fetcher=static_url_fetcher
+    ).write_pdf(font_config=get_font_config())
+
+
+def get_process_id(_=None) -> int:
+    return os.getpid()
+
+
+def get_renderer_authkey() -> bytes:
+    return settings.SECRET_KEY.encode()
+
+
+class TicketRendererServer:
+    """
+    Accept render requests on a unix socket and render them on a pool of long lived processes.
+    """
+
+    def __init__(self, socket_path: str, workers: int = TICKET_RENDERER_WORKERS):
+        self.socket_path = socket_path
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_renderer_process,
+        )
+
+    def handle_connection(self, conn) -> None:
+        try:
+            while True:
+                try:
+                    request = conn.recv()
+                except EOFError:
+                    return
+                start = time.perf_counter()
+                try:
+                    size = self.executor.submit(
+                        render_pdf, request["html"], request["output_path"]
+                    ).result()
+                    conn.send(
+                        {
+                            "status": "ok",
+                            "size": size,
+                            "seconds": time.perf_counter() - start,
+                        }
+                    )
+                except Exception as e:
+                    logging.exception(e)
+                    conn.send({"status": "error", "error": str(e)})
+        finally:
+            conn.close()
+
+    def serve_forever(self) -> None:
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        # Start all the pool processes before accepting requests so that the first tickets are fast
+        list(self.executor.map(get_process_id, range(self.workers)))
+        with Listener(
+            self.socket_path, family="AF_UNIX", authkey=get_renderer_authkey()
+        ) as listener:
+            logging.info(
+                f"Ticket renderer listening on {self.socket_path} with {self.workers} workers"
+            )
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logging.exception(e)
+                    continue
+                threading.Thread(
+                    target=self.handle_connection, args=(conn,), daemon=True
+                ).start()
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def is_renderer_available(socket_path: str | None = TICKET_RENDERER_SOCKET) -> bool:
+    return bool(socket_path) and os.path.exists(socket_path)
+
+
+def render_pdf_with_renderer(
+    html: str,
+    output_path: str,
+    socket_path: str = TICKET_RENDERER_SOCKET,
+    timeout: float = TICKET_RENDERER_TIMEOUT,
+) -> int:
+    """Send the ticket html to the persistent renderer and wait for the pdf
+
+    :param html: rendered ticket html
+    :param output_path: path where the pdf is written, it must be reachable by the renderer
+    :param socket_path: unix socket of the renderer
+    :param timeout: seconds to wait for the render
+
+    :return: size of the written pdf in bytes
+    """
+    with Client(socket_path, family="AF_UNIX", authkey=get_renderer_authkey()) as conn:
+        conn.send({"html": html, "output_path": output_path})
+        if not conn.poll(timeout):
+            raise TimeoutError(f"Ticket renderer did not respond in {timeout} seconds")
+        response = conn.recv()
+    if response["status"] != "ok":
+        raise RuntimeError(f"Ticket renderer failed: {response['error']}")
+    return response["size"]
@@ -1,16 +1,56 @@
+from functools import lru_cache
+from django.core.cache import cache
+from django.template.loader import render_to_string
 from django.utils import timezone
 from weasyprint import HTML
 import qrcode
+import hashlib
+import logging
+import tempfile
 import os
 import io, base64
 
+from bookings.models import Booking, BookingCostume
+from management_core.generated_media import (
+    register_generated_media,
+    remove_stale_generated_media,
+    touch_generated_media,
+)
+from management_core.models import TicketPrice
+from management_core.storage import (
+    get_generated_file_url,
+    get_generated_media_storage,
+    save_generated_file_from_path,
+)
+from .image import TICKET_IMAGE_LAYOUT_VERSION, render_ticket_image
+from .renderer import (
+    get_ticket_pdf_options,
+    is_renderer_available,
+    render_pdf,
+    render_pdf_with_renderer,
+)
+from .cache import (
+    get_ticket_fingerprint,
+    record_ticket_cache_hit,
+    record_ticket_cache_miss,
+    record_ticket_size,
+)
 from common_config.common import (
-    GENERATED_MEDIA_BASE_URL,
     HOST_URL,
     LOCALHOST_URL,
-    TEMPORARY_FILE_LOCATION,
+    QR_CODE_CACHE_TIMEOUT,
+    QR_CODE_LRU_SIZE,
+    QR_CODE_MIME_TYPES,
+    TICKET_FORMATS,
+    TICKET_PDF_DPI,
+    TICKET_PDF_JPEG_QUALITY,
+    TICKET_PDF_SIZE_BUDGET_BYTES,
+    TICKET_QR_CODE_FORMAT,
+    TICKET_RENDER_MODE,
 )
 
+logging.getLogger(__name__)
+
 
 def ensure_directory_exists(directory):
     """
@@ -23,25 +63,78 @@ def ensure_directory_exists(directory):
         os.makedirs(directory)
 
 
-def generate_qr_code(data: str) -> None:
-    """Generate QR code from data and save it to io object in memory and return the base64 encoded image
+def build_qr_code_svg(qr: qrcode.QRCode) -> bytes:
+    """Build a compact svg of the QR code matrix without PIL
+
+    Every horizontal run of dark modules is drawn as a single rectangle of one path and the
+    svg is sized by its viewBox so it scales to the width of the `img` tag.
+
+    :param qr: QR code with the data added and made
+
+    :return: svg document bytes
+    """
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < size and row[x]:
+                x += 1
+            path.append(f"M{start} {y}h{x - start}v1H{start}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{"".join(path)}"/></svg>'
+    ).encode()
+
+
+@lru_cache(maxsize=QR_CODE_LRU_SIZE)
+def generate_qr_code(
+    data: str,
+    box_size: int = 10,
+    border: int = 4,
+    image_format: str = TICKET_QR_CODE_FORMAT,
+) -> str:
+    """Generate QR code from data and return the base64 encoded image
+
+    Generated images are cached in process and in the django cache, the data of a QR code
+    never changes so the same image is reused by every ticket view and render.
 
     :param data: data to be encoded in QR code
+    :param box_size: pixels per module of the png image
+    :param border: quiet zone around the code in modules
+    :param image_format: `png` or `svg`
 
     :return: base64 encoded image of the generated QR code
     """
+    if image_format not in QR_CODE_MIME_TYPES:
+        raise ValueError(f"Unsupported QR code format: {image_format}")
+    cache_key = f"qr_code_{image_format}_{box_size}_{border}_{hashlib.sha256(data.encode()).hexdigest()}"
+    img_base64 = cache.get(cache_key)
+    if img_base64:
+        return img_base64
+
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,
-        border=4,
+        box_size=box_size,
+        border=border,
     )
     qr.add_data(data)
     qr.make(fit=True)
-    img = qr.make_image(fill_color="black", back_color="white")
-    img_io = io.BytesIO()
-    img.save(img_io)
-    img_base64 = base64.b64encode(img_io.getvalue()).decode()
+    if image_format == "svg":
+        img_bytes = build_qr_code_svg(qr)
+    else:
+        img = qr.make_image(fill_color="black", back_color="white")
+        img_io = io.BytesIO()
+        img.save(img_io)
+        img_bytes = img_io.getvalue()
+    img_base64 = base64.b64encode(img_bytes).decode()
+    cache.set(cache_key, img_base64, timeout=QR_CODE_CACHE_TIMEOUT)
     return img_base64
 
 
@@ -55,8 +148,185 @@ def generate_booking_id_qrcode(booking_id: str) -> str:
     return generate_qr_code(booking_id)
 
 
+def get_gst_amount(total, percentage) -> float:
+    """Get the GST part included in the total amount
+
+    :param total: total amount including GST
+    :param percentage: GST percentage in fraction i.e. `0.09` for 9%
+
+    :return: GST amount rounded to 2 decimal places
+    """
+    total, percentage = float(total), float(percentage)
+    return round((total / (1 + percentage)) * percentage, 2)
+
+
+def get_booking_ticket_context(
+    booking: Booking,
+    price_list: TicketPrice,
+    costume_data: list[BookingCostume],
+) -> dict:
+    """Build the context used to render `booking/booking_ticket.html`
+
+    :param booking: booking for which ticket is rendered
+    :param price_list: ticket price for the date of the booking
+    :param costume_data: costumes booked with the booking
+
+    :return: template context for the ticket
+    """
+    return {
+        "qr_code_url": generate_booking_id_qrcode(str(booking.id)),
+        "qr_code_mime_type": QR_CODE_MIME_TYPES[TICKET_QR_CODE_FORMAT],
+        "booking": booking,
+        "adult_male_price": price_list.adult,
+        "adult_female_price": price_list.adult,
+        "adult_male_total": price_list.adult * booking.adult_male,
+        "adult_female_total": price_list.adult * booking.adult_female,
+        "child_total": price_list.child * booking.child,
+        "child_price": price_list.child,
+        "amount_to_collect": booking.total_amount - booking.received_amount,
+        "costume_data": costume_data,
+        "sgst_amount": get_gst_amount(booking.total_amount, 0.09),
+        "cgst_amount": get_gst_amount(booking.total_amount, 0.09),
+        "gst_amount": get_gst_amount(booking.total_amount, 0.09) * 2,
+    }
+
+
+def get_booking_ticket_data(
+    booking_id: str,
+) -> tuple[Booking, TicketPrice | None, list[BookingCostume]]:
+    """Load the booking with the price list and costumes shown on its ticket
+
+    :param booking_id: booking id for which ticket data is to be loaded
+
+    :return: tuple of booking, ticket price for the booking date and booked costumes
+    """
+    booking = Booking.objects.prefetch_related(
+        "booking_costume", "booking_costume__costume"
+    ).get(id=booking_id)
+    price_list = TicketPrice.objects.filter(date=booking.date).first()
+    costume_data = list(booking.booking_costume.all())
+    return booking, price_list, costume_data
+
+
+def render_ticket_html(booking_id: str) -> str:
+    """Render the ticket template of the booking to html string without going through HTTP
+
+    :param booking_id: booking id for which ticket is to be rendered
+
+    :return: rendered html of the ticket
+    """
+    context = get_booking_ticket_context(*get_booking_ticket_data(booking_id))
+    return render_to_string("booking/booking_ticket.html", context)
+
+
 def html_to_pdf(url: str, output_path: str) -> None:
-    HTML(url=url).render().write_pdf(output_path)
+    HTML(url=url).write_pdf(output_path, **get_ticket_pdf_options())
+
+
+def html_string_to_pdf(html: str, output_path: str) -> None:
+    """Render ticket html to pdf on the persistent renderer if it is running else in this process
+
+    :param html: rendered ticket html
+    :param output_path: path where the pdf is written
+    """
+    if is_renderer_available():
+        try:
+            render_pdf_with_renderer(html, output_path)
+            return
+        except Exception as e:
+            logging.warning(f"Ticket renderer unavailable, rendering in process: {e}")
+    render_pdf(html, output_path)
+
+
+def get_or_create_ticket(booking_id: str, ticket_format: str = "pdf") -> tuple[str, bool]:
+    """Get the ticket of the booking from the ticket cache or render it
+
+    Rendered tickets are stored under a fingerprint of the ticket data, so an existing file is
+    returned as it is when nothing shown on the ticket has changed.
+    Pdf tickets are rendered in process by default, set `TICKET_RENDER_MODE=http` to fetch the
+    ticket page from `HOST_URL` instead. Image tickets are drawn with Pillow.
+
+    :param booking_id: booking id for which ticket is to be generated
+    :param ticket_format: one of `TICKET_FORMATS`
+
+    :return: tuple of the ticket file name and whether it was served from the cache
+    """
+    if ticket_format not in TICKET_FORMATS:
+        raise ValueError(f"Unsupported ticket format: {ticket_format}")
+    booking, price_list, costume_data = get_booking_ticket_data(booking_id)
+    fingerprint = get_ticket_fingerprint(
+        booking,
+        price_list,
+        costume_data,
+        ticket_format=(
+            f"pdf_{TICKET_PDF_DPI}_{TICKET_PDF_JPEG_QUALITY}"
+            if ticket_format == "pdf"
+            else f"{ticket_format}_v{TICKET_IMAGE_LAYOUT_VERSION}"
+        ),
+    )
+    extension = TICKET_FORMATS[ticket_format]
+    file_name = f"booking_{booking_id}_{fingerprint[:16]}.{extension}"
+    name = get_ticket_name(file_name)
+
+    if get_generated_media_storage().exists(name):
+        record_ticket_cache_hit()
+        touch_generated_media(name)
+        return file_name, True
+
+    record_ticket_cache_miss()
+    # Render to a local temporary file and upload it once it is complete
+    fd, tmp_path = tempfile.mkstemp(suffix=f".{extension}", prefix="ticket_")
+    os.close(fd)
+    try:
+        if ticket_format != "pdf":
+            context = get_booking_ticket_context(booking, price_list, costume_data)
+            qr_code_png = generate_qr_code(str(booking.id), image_format="png")
+            render_ticket_image(context, qr_code_png, tmp_path, ticket_format)
+        elif TICKET_RENDER_MODE == "http":
+            html_url = f"{HOST_URL}/bookings/booking/{booking_id}/ticket"
+            html_to_pdf(html_url, tmp_path)
+        else:
+            context = get_booking_ticket_context(booking, price_list, costume_data)
+            html = render_to_string("booking/booking_ticket.html", context)
+            html_string_to_pdf(html, tmp_path)
+        size = os.path.getsize(tmp_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    name = save_generated_file_from_path(name, tmp_path)
+    file_name = os.path.basename(name)
+    # Tickets rendered before the booking changed are replaced by this one
+    remove_stale_generated_media(get_ticket_name(f"booking_{booking_id}_"), f".{extension}", name)
+    register_generated_media(name, "booking_ticket", size, booking.date)
+    if ticket_format == "pdf" and not record_ticket_size(size):
+        logging.warning(
+            f"Ticket {file_name} is {size} bytes, over the budget of {TICKET_PDF_SIZE_BUDGET_BYTES} bytes"
+        )
+    return file_name, False
+
+
+def get_ticket_name(file_name: str) -> str:
+    return f"booking_tickets/{file_name}"
+
+
+def get_ticket_size(file_name: str) -> int:
+    return get_generated_media_storage().size(get_ticket_name(file_name))
+
+
+def get_ticket_url(file_name: str) -> str:
+    return get_generated_file_url(get_ticket_name(file_name))
+
+
+def generate_ticket(booking_id: str, ticket_format: str = "pdf") -> str:
+    """Generate ticket of the booking in the given format
+
+    :param booking_id: booking id for which ticket is to be generated
+    :param ticket_format: one of `TICKET_FORMATS`
+
+    :return: url of the generated ticket
+    """
+    file_name, _ = get_or_create_ticket(booking_id, ticket_format)
+    return get_ticket_url(file_name)
 
 
 def generate_ticket_pdf(booking_id: str) -> str:
@@ -66,9 +336,4 @@ def generate_ticket_pdf(booking_id: str) -> str:
 
     :return: path of the generated pdf
     """
-    path = f"{TEMPORARY_FILE_LOCATION}/booking_tickets"
-    os.makedirs(path, exist_ok=True)
-    path = f"{path}/booking_{booking_id}.pdf"
-    html_url = f"{HOST_URL}/bookings/booking/{booking_id}/ticket"
-    html_to_pdf(html_url, path)
-    return f"{HOST_URL}/{GENERATED_MEDIA_BASE_URL}/booking_tickets/booking_{booking_id}.pdf"
+    return generate_ticket(booking_id, "pdf")
@@ -18,6 +18,7 @@ from .views import (
     PaymentEditFormView,
     BookingHistoryTemplateView,
     SaveBookingTicketAPIView,
+    TicketCacheStatsAPIView,
     CostumeHomeTemplateView,
     CostumeSummaryTemplateView,
     CronHandlerAPIView,
@@ -48,6 +49,7 @@ urlpatterns = [
     path("home-summary/", BookingHomeSummaryTemplateView.as_view(), name="booking_home_summary"),
     path("history/", BookingHistoryTemplateView.as_view(), name="booking_history"),
     path("cron-handler/", CronHandlerAPIView.as_view(), name="cron_handler"),
+    path("api/ticket-cache-stats", TicketCacheStatsAPIView.as_view(), name="ticket_cache_stats"),
     path(
         "booking/<str:booking_id>",
         BookingEditFormView.as_view(),
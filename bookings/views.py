@@ -25,13 +25,14 @@ from common_config.common import ADMIN_USER, BOUNCER_USER, COSTUME_MANAGER_USER,
 from management_core.models import TicketPrice
 from .forms import BookingCostumeFormSet, BookingForm, BouncerCheckInForm, CanteenCardForm, LockerEditFormSet, LockerReturnFormSet, PaymentRecordForm, PaymentRecordEditForm, get_locker_add_formset
 from .webhook_utils import handle_razorpay_webhook_booking_payment
-from .ticket.utils import generate_booking_id_qrcode
-from whatsapp.messages.message_handlers import send_booking_ticket, whatsapp_config
+from .ticket.utils import get_booking_ticket_context
+from .ticket.cache import get_ticket_cache_stats
+from whatsapp.messages.message_handlers import send_booking_ticket
+from whatsapp.outbox import queue_outbound_message
 from .decorators import user_type_required
 
 logging.getLogger(__name__)
 
-default_queue = django_rq.get_queue("default")
 low_queue = django_rq.get_queue("low")
 
 
@@ -596,10 +597,6 @@ class BookingSummaryCardTemplateView(LoginRequiredMixin, TemplateView):
 class BookingTicketTemplateView(TemplateView):
     template_name = "booking/booking_ticket.html"
 
-    def get_gst_amount(self, total, percentage):
-        total, percentage = float(total), float(percentage)
-        return round((total / (1 + percentage)) * percentage, 2)
-
     def get(self, request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponse:
         booking_id = kwargs.get("booking_id")
         if not booking_id:
@@ -620,22 +617,7 @@ class BookingTicketTemplateView(TemplateView):
         ).get(id=booking_id)
         price_list = TicketPrice.objects.filter(date=booking.date).first()
         costume_data = booking.booking_costume.all()
-        qr_code_url = generate_booking_id_qrcode(booking_id)
-        context = {
-            "qr_code_url": qr_code_url,
-            "booking": booking,
-            "adult_male_price": price_list.adult,
-            "adult_female_price": price_list.adult,
-            "adult_male_total": price_list.adult * booking.adult_male,
-            "adult_female_total": price_list.adult * booking.adult_female,
-            "child_total": price_list.child * booking.child,
-            "child_price": price_list.child,
-            "amount_to_collect": booking.total_amount - booking.received_amount,
-            "costume_data": costume_data,
-            "sgst_amount": self.get_gst_amount(booking.total_amount, 0.09),
-            "cgst_amount": self.get_gst_amount(booking.total_amount, 0.09),
-            "gst_amount": self.get_gst_amount(booking.total_amount, 0.09) * 2,
-        }
+        context = get_booking_ticket_context(booking, price_list, costume_data)
         return render(request, "booking/booking_ticket.html", context=context)
 
 
@@ -771,7 +753,7 @@ class CronHandlerAPIView(APIView):
                 payment_type_income_str = ", ".join([f"{i['x']}: {i['y']}" for i in data["payment_method_income_pie_chart"]])
                 payment_type_return_str = ", ".join([f"{i['x']}: {i['y']}" for i in data["payment_method_returned_pie_chart"]])
                 message_str = f"Date: {today_date_str}\nTotal Bookings: {data["total_bookings"]}\nTotal Income: {data["total_income"]}\nTotal Persons: {data["total_persons"]}\nTotal Only Cash: {total_amount}\nAdjusted Amount: {current_amount}\nPayment Methods(Income): {payment_type_income_str}\nPayment Methods(Return): {payment_type_return_str}\nPerson Type: {person_type_str}"
-                res = whatsapp_config.send_message(os.environ.get("ADMIN_WHATSAPP_NUMBER"), "text", {"body": message_str})
+                queue_outbound_message(os.environ.get("ADMIN_WHATSAPP_NUMBER"), "text", {"body": message_str})
                 cache.set("daily_cron_run_flag", True, timeout=18000)
                 return Response(status=status.HTTP_200_OK)
         except Exception as e:
@@ -798,6 +780,12 @@ class SaveBookingTicketAPIView(APIView):
             return Response(status=status.HTTP_200_OK)
 
 
+class TicketCacheStatsAPIView(APIView):
+    @user_type_required([ADMIN_USER])
+    def get(self, request: Request) -> Response:
+        return Response(get_ticket_cache_stats(), status=status.HTTP_200_OK)
+
+
 ## COSTUME MANAGEMENT VIEWS
 class CostumeHomeTemplateView(LoginRequiredMixin, TemplateView):
     template_name = "costume/costume_home.html"
@@ -1199,13 +1187,13 @@ class LockerSummaryTemplateView(TemplateView):
 
 
 def send_locker_update_whatsapp_message(receiver:str, date: str, locker_numbers: list[int|str]) -> None:
-    """Send the locker update message to the receiver.
+    """Queue the locker update message to the receiver in the outbox.
 
     :param receiver: The receiver's phone number.
     :param locker_numbers: The locker numbers to be sent in the message.  
     """
     message = f"Your Issued lockers for booking on {date} are:\n {', '.join(locker_numbers)}"
-    whatsapp_config.send_message(receiver, "text", {
+    queue_outbound_message(receiver, "text", {
         "body": message
     })
 
@@ -1292,8 +1280,7 @@ class LockerAddFormView(FormView):
                 locker_payment.save()
                 messages.success(self.request, "Locker added successfully.")
                 # TODO enable this after implementing numbering on the key and lock of lockers.
-                # default_queue.enqueue(
-                #     send_locker_update_whatsapp_message,
+                # send_locker_update_whatsapp_message(
                 #     booking.wa_number,
                 #     booking.date.strftime("%d-%m-%Y"),
                 #     locker_numbers
@@ -1383,8 +1370,7 @@ class LockerEditFormView(FormView):
                 booking_payment.save()
                 messages.success(self.request, "Lockers edited successfully.")
                 # TODO enable this after implementing numbering on the key and lock of lockers.
-                # default_queue.enqueue(
-                #     send_locker_update_whatsapp_message,
+                # send_locker_update_whatsapp_message(
                 #     booking.wa_number,
                 #     booking.date.strftime("%d-%m-%Y"),
                 #     updated_lockers
@@ -1489,15 +1475,13 @@ class SendLockerUpdateMessageAPIView(APIView):
                 locker_numbers.append(str(locker.locker.locker_number))
             
             if locker_numbers:
-                default_queue.enqueue(
-                    send_locker_update_whatsapp_message,
+                send_locker_update_whatsapp_message(
                     booking_number,
                     booking_date.strftime("%d-%m-%Y"),
                     locker_numbers
                 )
             else:
-                default_queue.enqueue(
-                    whatsapp_config.send_message,
+                queue_outbound_message(
                     booking_number,
                     "text",
                     {"body": f"No locker issued for this booking for date: {booking_date.strftime("%d-%m-%Y")}"}
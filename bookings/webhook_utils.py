@@ -1,11 +1,10 @@
 from django.db import transaction
 from decimal import Decimal
-import django_rq
 import logging
 
 from bookings.models import Booking, Payment
 from common_config.common import ADVANCE_PER_PERSON_AMOUNT_FOR_BOOKING
-from whatsapp.messages.message_handlers import handle_sending_booking_ticket
+from whatsapp.messages.message_handlers import queue_booking_ticket
 
 logging.getLogger(__name__)
 
@@ -49,14 +48,7 @@ def handle_razorpay_webhook_booking_payment(data: dict) -> bool:
             payment.booking.received_amount += Decimal(payment.amount)
             payment.booking.save()
             payment.save()
-        django_rq.enqueue(
-            handle_sending_booking_ticket,
-            booking.wa_number,
-            "",
-            None,
-            booking,
-            True
-        )
+            queue_booking_ticket(booking)
         return True
     except Exception as e:
         logging.error(f"Razorpay ReqData: {str(data)}")
@@ -0,0 +1,39 @@
+import statistics
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """Get the percentile of the values using nearest rank
+
+    :param values: list of values
+    :param percent: percentile between 0 and 100
+
+    :return: value at the given percentile
+    """
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_timings(timings: list[float], elapsed: float) -> dict:
+    """Summarize per item timings of a benchmark run
+
+    :param timings: seconds taken by every item
+    :param elapsed: wall clock seconds of the whole run
+
+    :return: dict with count, latency stats in milliseconds and throughput per second
+    """
+    return {
+        "count": len(timings),
+        "mean_ms": round(statistics.mean(timings) * 1000, 2) if timings else 0,
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p95_ms": round(percentile(timings, 95) * 1000, 2),
+        "p99_ms": round(percentile(timings, 99) * 1000, 2),
+        "max_ms": round(max(timings) * 1000, 2) if timings else 0,
+        "throughput_per_sec": round(len(timings) / elapsed, 2) if elapsed else 0,
+    }
+
+
+def format_summary(name: str, summary: dict) -> str:
+    return f"{name}: " + ", ".join(f"{key}={value}" for key, value in summary.items())
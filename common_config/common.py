@@ -54,9 +54,88 @@ if os.environ.get("ENVIRONMENT") == "prod":
 else:
     TEMPORARY_FILE_LOCATION = "/home/generated_media"
 
+# Storage of tickets and promotional images, `local` for TEMPORARY_FILE_LOCATION or `s3`
+GENERATED_MEDIA_STORAGE = os.environ.get("GENERATED_MEDIA_STORAGE", "local")
+S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME")
+# Endpoint of an S3 compatible service like MinIO, leave empty for AWS S3
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL") or None
+S3_ACCESS_KEY_ID = os.environ.get("S3_ACCESS_KEY_ID")
+S3_SECRET_ACCESS_KEY = os.environ.get("S3_SECRET_ACCESS_KEY")
+S3_REGION_NAME = os.environ.get("S3_REGION_NAME") or None
+# Public domain of the bucket for stable urls, pre-signed urls are used when it is not set
+S3_PUBLIC_DOMAIN = os.environ.get("S3_PUBLIC_DOMAIN") or None
+S3_PRESIGNED_URL_EXPIRY = int(os.environ.get("S3_PRESIGNED_URL_EXPIRY", 60 * 60 * 24))
+
+# Ticket pdf rendering mode, `local` renders the template in process and `http` fetches it from HOST_URL
+TICKET_RENDER_MODE = os.environ.get("TICKET_RENDER_MODE", "local")
+# Unix socket of the persistent ticket renderer started by `manage.py ticket_renderer`
+TICKET_RENDERER_SOCKET = os.environ.get("TICKET_RENDERER_SOCKET")
+TICKET_RENDERER_WORKERS = int(os.environ.get("TICKET_RENDERER_WORKERS", 2))
+TICKET_RENDERER_TIMEOUT = int(os.environ.get("TICKET_RENDERER_TIMEOUT", 60))
+# Ticket formats with their file extensions, pdf is rendered by WeasyPrint and images by Pillow
+TICKET_FORMATS = {"pdf": "pdf", "png": "png", "jpeg": "jpg"}
+# Format of the ticket sent on WhatsApp when it is not sent with the approved template
+WHATSAPP_TICKET_FORMAT = os.environ.get("WHATSAPP_TICKET_FORMAT", "pdf")
+TICKET_IMAGE_FONT = os.environ.get(
+    "TICKET_IMAGE_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+)
+TICKET_IMAGE_BOLD_FONT = os.environ.get(
+    "TICKET_IMAGE_BOLD_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+)
+# QR code image embedded in the ticket, `png` or `svg`
+TICKET_QR_CODE_FORMAT = os.environ.get("TICKET_QR_CODE_FORMAT", "png")
+QR_CODE_MIME_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+QR_CODE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+QR_CODE_LRU_SIZE = 1024
+# Embedded images of the ticket pdf are downsampled to this resolution and recompressed
+TICKET_PDF_DPI = int(os.environ.get("TICKET_PDF_DPI", 150))
+TICKET_PDF_JPEG_QUALITY = int(os.environ.get("TICKET_PDF_JPEG_QUALITY", 80))
+# Maximum size of a ticket pdf, larger tickets are logged and fail `manage.py check_ticket_size`
+TICKET_PDF_SIZE_BUDGET_BYTES = int(os.environ.get("TICKET_PDF_SIZE_BUDGET_BYTES", 150000))
+# Processes used to pre-generate the tickets of a date, defaults to the number of cores
+TICKET_PREGENERATION_WORKERS = int(os.environ.get("TICKET_PREGENERATION_WORKERS", 0))
+# Cron (UTC) of the job which pre-generates the tickets of the next day, 15:30 UTC is 9 PM IST
+TICKET_PREGENERATION_CRON = os.environ.get("TICKET_PREGENERATION_CRON", "30 15 * * *")
+
 
 # MANAGEMENT CORE CONSTANTS
 
+GENERATED_MEDIA_KINDS = [
+    ("booking_ticket", "booking_ticket"),
+    ("promotional_image", "promotional_image"),
+]
+# Disk budget of TEMPORARY_FILE_LOCATION, least recently used files are evicted above it
+GENERATED_MEDIA_BUDGET_BYTES = int(
+    os.environ.get("GENERATED_MEDIA_BUDGET_BYTES", 2 * 1024 * 1024 * 1024)
+)
+# Files which are not accessed for these many days are evicted irrespective of the budget
+GENERATED_MEDIA_MAX_AGE_DAYS = int(os.environ.get("GENERATED_MEDIA_MAX_AGE_DAYS", 30))
+# Cron (UTC) of the generated media cleanup job, 21:30 UTC is 3 AM IST
+GENERATED_MEDIA_CLEANUP_CRON = os.environ.get(
+    "GENERATED_MEDIA_CLEANUP_CRON", "30 21 * * *"
+)
+
+CAMPAIGN_STATUSES = [
+    ("running", "running"),
+    ("paused", "paused"),
+    ("completed", "completed"),
+]
+# Stored as small integers, a campaign has a row per recipient
+CAMPAIGN_RECIPIENT_PENDING = 0
+CAMPAIGN_RECIPIENT_SENDING = 1
+CAMPAIGN_RECIPIENT_SENT = 2
+CAMPAIGN_RECIPIENT_FAILED = 3
+CAMPAIGN_RECIPIENT_STATUSES = [
+    (CAMPAIGN_RECIPIENT_PENDING, "pending"),
+    (CAMPAIGN_RECIPIENT_SENDING, "sending"),
+    (CAMPAIGN_RECIPIENT_SENT, "sent"),
+    (CAMPAIGN_RECIPIENT_FAILED, "failed"),
+]
+
+# Promotional images are downscaled and recompressed before they are uploaded to WhatsApp
+PROMOTIONAL_IMAGE_MAX_SIZE = int(os.environ.get("PROMOTIONAL_IMAGE_MAX_SIZE", 1600))
+PROMOTIONAL_IMAGE_JPEG_QUALITY = int(os.environ.get("PROMOTIONAL_IMAGE_JPEG_QUALITY", 85))
+
 WHATSAPP_INQUIRY_MSG_TYPES = [
     ("text", "text"),
     ("image_only", "image_only"),
@@ -64,3 +143,71 @@ WHATSAPP_INQUIRY_MSG_TYPES = [
     ("document", "document"),
 ]
 CURRENT_ENVIRONMENT = os.environ.get("ENVIRONMENT", "test")
+
+# WHATSAPP CONSTANTS
+# `sync` handles webhook messages in the request, `async` acknowledges them and handles them on the `whatsapp` queue
+WA_WEBHOOK_MODE = os.environ.get("WA_WEBHOOK_MODE", "sync")
+# Seconds a drain job of the webhook inbox of a sender may run, every message makes Graph API calls
+WA_INBOX_DRAIN_TIMEOUT = int(os.environ.get("WA_INBOX_DRAIN_TIMEOUT", 10*60))
+# Cron (UTC) of the sweep which drains the inboxes left behind by a killed drain job
+WA_INBOX_SWEEP_CRON = os.environ.get("WA_INBOX_SWEEP_CRON", "* * * * *")
+# Seconds a received message id is remembered to drop the redelivered webhooks, Meta retries for up to 7 days
+WA_SEEN_MESSAGE_TTL = int(os.environ.get("WA_SEEN_MESSAGE_TTL", 7*24*60*60))
+# Published WhatsApp Flow of the booking form, unset to book step by step
+WA_BOOKING_FLOW_ID = os.environ.get("WA_BOOKING_FLOW_ID", "")
+WA_BOOKING_FLOW_SCREEN = os.environ.get("WA_BOOKING_FLOW_SCREEN", "BOOKING")
+# Graph API of the WhatsApp client, point it to a local stub for testing
+WA_GRAPH_API_URL = os.environ.get("WA_GRAPH_API_URL", "https://graph.facebook.com/v19.0")
+WA_API_TIMEOUT = float(os.environ.get("WA_API_TIMEOUT", 10))
+WA_API_CONNECT_TIMEOUT = float(os.environ.get("WA_API_CONNECT_TIMEOUT", 5))
+WA_API_MAX_CONNECTIONS = int(os.environ.get("WA_API_MAX_CONNECTIONS", 20))
+# Requests in flight of `send_many`
+WA_API_CONCURRENCY = int(os.environ.get("WA_API_CONCURRENCY", 10))
+WA_API_HTTP2 = int(os.environ.get("WA_API_HTTP2", 1)) == 1
+# Prefixed to the 10 digit numbers of the promotional audience
+WA_DEFAULT_COUNTRY_CODE = os.environ.get("WA_DEFAULT_COUNTRY_CODE", "91")
+# Seconds an uploaded media id is reused, WhatsApp deletes the uploaded media after 30 days
+WA_MEDIA_ID_TTL = int(os.environ.get("WA_MEDIA_ID_TTL", 29*24*60*60))
+# Recipients of a promotional campaign job and the messages per second shared by all the campaign workers
+WA_CAMPAIGN_CHUNK_SIZE = int(os.environ.get("WA_CAMPAIGN_CHUNK_SIZE", 500))
+WA_CAMPAIGN_RATE_PER_SECOND = float(os.environ.get("WA_CAMPAIGN_RATE_PER_SECOND", 40))
+WA_CAMPAIGN_BURST = int(os.environ.get("WA_CAMPAIGN_BURST", 40))
+# Outbound messages of the outbox, stored as small integers
+OUTBOUND_MESSAGE_PENDING = 0
+OUTBOUND_MESSAGE_SENDING = 1
+OUTBOUND_MESSAGE_SENT = 2
+OUTBOUND_MESSAGE_DEAD = 3
+OUTBOUND_MESSAGE_STATUSES = [
+    (OUTBOUND_MESSAGE_PENDING, "pending"),
+    (OUTBOUND_MESSAGE_SENDING, "sending"),
+    (OUTBOUND_MESSAGE_SENT, "sent"),
+    (OUTBOUND_MESSAGE_DEAD, "dead"),
+]
+# Messages claimed by a drain of the outbox, a failed message is retried after an exponential backoff and dead lettered after the attempts
+WA_OUTBOX_BATCH_SIZE = int(os.environ.get("WA_OUTBOX_BATCH_SIZE", 100))
+WA_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("WA_OUTBOX_MAX_ATTEMPTS", 8))
+WA_OUTBOX_BACKOFF_SECONDS = int(os.environ.get("WA_OUTBOX_BACKOFF_SECONDS", 10))
+WA_OUTBOX_MAX_BACKOFF_SECONDS = int(os.environ.get("WA_OUTBOX_MAX_BACKOFF_SECONDS", 60*60))
+# Seconds after which a message left sending by a killed worker is sent again
+WA_OUTBOX_SENDING_TIMEOUT = int(os.environ.get("WA_OUTBOX_SENDING_TIMEOUT", 5*60))
+# Cron (UTC) of the job which drains the messages due for a retry
+WA_OUTBOX_DRAIN_CRON = os.environ.get("WA_OUTBOX_DRAIN_CRON", "* * * * *")
+# Delivery statuses of the sent messages, a status never moves back to a lower one
+MESSAGE_STATUS_SENT = 1
+MESSAGE_STATUS_DELIVERED = 2
+MESSAGE_STATUS_READ = 3
+MESSAGE_STATUS_FAILED = 4
+MESSAGE_STATUSES = [
+    (MESSAGE_STATUS_SENT, "sent"),
+    (MESSAGE_STATUS_DELIVERED, "delivered"),
+    (MESSAGE_STATUS_READ, "read"),
+    (MESSAGE_STATUS_FAILED, "failed"),
+]
+# Webhook statuses are buffered in Redis and written to the database at most once per interval in batches
+WA_STATUS_FLUSH_INTERVAL = int(os.environ.get("WA_STATUS_FLUSH_INTERVAL", 5))
+WA_STATUS_FLUSH_BATCH_SIZE = int(os.environ.get("WA_STATUS_FLUSH_BATCH_SIZE", 1000))
+# Cron (UTC) of the job which flushes the statuses left in the buffer
+WA_STATUS_FLUSH_CRON = os.environ.get("WA_STATUS_FLUSH_CRON", "* * * * *")
+# `pipelined` starts every part of a multi-part reply shortly after the previous one instead of after its response
+WA_INQUIRY_DELIVERY_MODE = os.environ.get("WA_INQUIRY_DELIVERY_MODE", "pipelined")
+WA_ORDERED_SEND_GAP = int(os.environ.get("WA_ORDERED_SEND_GAP_MS", 150)) / 1000
@@ -0,0 +1,9 @@
+from functools import lru_cache
+import django_rq
+import redis
+
+
+@lru_cache(maxsize=1)
+def get_redis_client() -> redis.Redis:
+    """Redis connection of the default RQ queue for the data structures the django cache does not offer"""
+    return django_rq.get_connection("default")
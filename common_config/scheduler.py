@@ -0,0 +1,84 @@
+"""
+Periodic jobs run by rq-scheduler.
+
+Jobs are registered with `python manage.py schedule_jobs` before the scheduler starts. A job
+is cancelled and scheduled again on every run so that a changed cron takes effect on deploy.
+"""
+
+from django.utils.module_loading import import_string
+import django_rq
+import logging
+
+from common_config.common import (
+    GENERATED_MEDIA_CLEANUP_CRON,
+    TICKET_PREGENERATION_CRON,
+    WA_INBOX_SWEEP_CRON,
+    WA_OUTBOX_DRAIN_CRON,
+    WA_STATUS_FLUSH_CRON,
+)
+
+logging.getLogger(__name__)
+
+SCHEDULED_JOBS = [
+    {
+        "id": "pregenerate_next_day_tickets",
+        "cron": TICKET_PREGENERATION_CRON,
+        "func": "bookings.ticket.batch.pregenerate_next_day_tickets",
+        "queue": "low",
+        "timeout": 60 * 60,
+    },
+    {
+        "id": "cleanup_generated_media",
+        "cron": GENERATED_MEDIA_CLEANUP_CRON,
+        "func": "management_core.generated_media.cleanup_generated_media",
+        "queue": "low",
+        "timeout": 60 * 60,
+    },
+    {
+        "id": "drain_whatsapp_outbox",
+        "cron": WA_OUTBOX_DRAIN_CRON,
+        "func": "whatsapp.outbox.drain_outbox",
+        "queue": "high",
+        "timeout": 10 * 60,
+    },
+    {
+        "id": "sweep_whatsapp_webhook_inboxes",
+        "cron": WA_INBOX_SWEEP_CRON,
+        "func": "whatsapp.webhook_utils.sweep_webhook_inboxes",
+        "queue": "whatsapp",
+        "timeout": 5 * 60,
+    },
+    {
+        "id": "flush_whatsapp_message_statuses",
+        "cron": WA_STATUS_FLUSH_CRON,
+        "func": "whatsapp.statuses.flush_message_statuses",
+        "queue": "low",
+        "timeout": 10 * 60,
+    },
+]
+
+
+def register_scheduled_jobs() -> list[str]:
+    """Schedule all the jobs of `SCHEDULED_JOBS`, replacing the previously scheduled ones
+
+    :return: ids of the scheduled jobs
+    """
+    scheduler = django_rq.get_scheduler("default")
+    scheduled = []
+    for job in SCHEDULED_JOBS:
+        if job["id"] in scheduler:
+            scheduler.cancel(job["id"])
+        if not job["cron"]:
+            logging.info(f"Scheduled job {job['id']} is disabled")
+            continue
+        scheduler.cron(
+            job["cron"],
+            func=import_string(job["func"]),
+            id=job["id"],
+            queue_name=job["queue"],
+            timeout=job.get("timeout"),
+            use_local_timezone=False,
+        )
+        logging.info(f"Scheduled job {job['id']} with cron {job['cron']}")
+        scheduled.append(job["id"])
+    return scheduled
@@ -19,6 +19,7 @@ INSTALLED_APPS = [
     "frontend",
     "management_core",
     "bookings",
+    "whatsapp",
 ]
 
 MIDDLEWARE = [
@@ -46,12 +47,24 @@ RQ_QUEUES = {
         "DB": 0,
         "DEFAULT_TIMEOUT": 600,
     },
+    "whatsapp": {
+        "HOST": "redis",
+        "PORT": 6379,
+        "DB": 0,
+        "DEFAULT_TIMEOUT": 600,
+    },
     "high": {
         "HOST": "redis",
         "PORT": 6379,
         "DB": 0,
         "DEFAULT_TIMEOUT": 600,
     },
+    "tickets": {
+        "HOST": "redis",
+        "PORT": 6379,
+        "DB": 0,
+        "DEFAULT_TIMEOUT": 600,
+    },
     "low": {
         "HOST": "redis",
         "PORT": 6379,
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     "frontend",
     "management_core",
     "bookings",
+    "whatsapp",
 ]
 
 MIDDLEWARE = [
@@ -48,12 +49,24 @@ RQ_QUEUES = {
         "DB": 0,
         "DEFAULT_TIMEOUT": 600,
     },
+    "whatsapp": {
+        "HOST": "test_redis",
+        "PORT": 6379,
+        "DB": 0,
+        "DEFAULT_TIMEOUT": 600,
+    },
     "high": {
         "HOST": "test_redis",
         "PORT": 6379,
         "DB": 0,
         "DEFAULT_TIMEOUT": 600,
     },
+    "tickets": {
+        "HOST": "test_redis",
+        "PORT": 6379,
+        "DB": 0,
+        "DEFAULT_TIMEOUT": 600,
+    },
     "low": {
         "HOST": "test_redis",
         "PORT": 6379,
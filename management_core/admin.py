@@ -1,4 +1,5 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.utils.html import format_html
 from django.urls import path
 from django.utils import timezone
 from django.shortcuts import render
@@ -12,8 +13,20 @@ from .models import (
     Locker,
     WhatsAppInquiryMessage,
     ExtraWhatsAppNumbers,
+    WhatsAppOptOut,
+    GeneratedMedia,
+    Campaign,
+    CampaignRecipient,
+)
+from .audience import normalize_whatsapp_number
+from .campaigns import (
+    get_campaign_stats,
+    pause_campaign,
+    resume_campaign,
+    retry_failed_campaign_recipients,
 )
 from .forms import TicketListPriceForm, LockerBulkAddForm
+from whatsapp.statuses import get_campaign_delivery_rollup
 from .resources import ExtraWANumbersResource
 
 
@@ -122,3 +135,105 @@ class ExtraWhatsAppNumbersAdmin(ImportExportModelAdmin):
     list_display = ("number",)
     search_fields = ("number",)
     resource_class = ExtraWANumbersResource
+
+
+@admin.register(WhatsAppOptOut)
+class WhatsAppOptOutAdmin(admin.ModelAdmin):
+    list_display = ("number", "reason", "created_at")
+    search_fields = ("number",)
+
+    def save_model(self, request, obj, form, change):
+        obj.number = normalize_whatsapp_number(obj.number)
+        return super().save_model(request, obj, form, change)
+
+
+@admin.register(GeneratedMedia)
+class GeneratedMediaAdmin(admin.ModelAdmin):
+    list_display = (
+        "path",
+        "kind",
+        "size",
+        "booking_date",
+        "last_accessed_at",
+    )
+    list_filter = ("kind", "booking_date")
+    search_fields = ("path",)
+
+
+@admin.register(Campaign)
+class CampaignAdmin(admin.ModelAdmin):
+    list_display = (
+        "name",
+        "status",
+        "total",
+        "sent",
+        "failed",
+        "progress",
+        "messages_per_second",
+        "created_at",
+    )
+    list_filter = ("status",)
+    search_fields = ("name",)
+    readonly_fields = (
+        "status",
+        "total",
+        "sent",
+        "failed",
+        "send_seconds",
+        "finished_at",
+        "progress",
+        "messages_per_second",
+        "delivery",
+    )
+    actions = ("pause", "resume", "retry_failed")
+
+    @admin.display(description="Progress")
+    def progress(self, obj):
+        progress = get_campaign_stats(obj)["progress"]
+        return format_html(
+            '<progress value="{}" max="100"></progress> {}%', progress, progress
+        )
+
+    @admin.display(description="Messages/s")
+    def messages_per_second(self, obj):
+        return get_campaign_stats(obj)["messages_per_second"]
+
+    @admin.display(description="Delivery")
+    def delivery(self, obj):
+        rollup = get_campaign_delivery_rollup(obj)
+        return (
+            f"{rollup['delivered_rate']}% delivered, {rollup['read_rate']}% read, "
+            f"{rollup['failed_rate']}% failed of {rollup['accepted']} sent"
+        )
+
+    @admin.action(description="Pause selected campaigns")
+    def pause(self, request, queryset):
+        paused = sum(pause_campaign(campaign) for campaign in queryset)
+        self.message_user(request, f"{paused} campaigns paused.", messages.SUCCESS)
+
+    @admin.action(description="Resume selected campaigns")
+    def resume(self, request, queryset):
+        chunks = sum(resume_campaign(campaign) for campaign in queryset)
+        self.message_user(request, f"{chunks} chunks enqueued.", messages.SUCCESS)
+
+    @admin.action(description="Retry failed recipients of selected campaigns")
+    def retry_failed(self, request, queryset):
+        chunks = sum(retry_failed_campaign_recipients(campaign) for campaign in queryset)
+        self.message_user(request, f"{chunks} chunks enqueued.", messages.SUCCESS)
+
+
+@admin.register(CampaignRecipient)
+class CampaignRecipientAdmin(admin.ModelAdmin):
+    list_display = (
+        "number",
+        "campaign",
+        "status",
+        "message_id",
+        "error",
+        "claimed_at",
+    )
+    list_filter = ("status", "campaign")
+    search_fields = ("number", "message_id")
+    list_select_related = ("campaign",)
+    # Campaigns have a row per recipient, skip counting the whole table on every page
+    show_full_result_count = False
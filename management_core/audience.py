@@ -0,0 +1,80 @@
+"""
+Audience of the promotional campaigns.
+
+The numbers of the bookings and of `ExtraWhatsAppNumbers` are normalized to digits with the
+`WA_DEFAULT_COUNTRY_CODE` prefix in SQL, deduplicated by a UNION and the numbers which opted out
+are excluded in the same query. The result is streamed with a server-side cursor so the memory of
+the worker does not grow with the customer base.
+"""
+
+from django.db.models import Case, CharField, Exists, OuterRef, QuerySet, Value, When
+from django.db.models.functions import Concat, Length, Replace
+from django.db.models.lookups import Exact
+import re
+
+from common_config.common import WA_CAMPAIGN_CHUNK_SIZE, WA_DEFAULT_COUNTRY_CODE
+from bookings.models import Booking
+from .models import ExtraWhatsAppNumbers, WhatsAppOptOut
+
+NUMBER_SEPARATORS = ("+", " ", "-")
+LOCAL_NUMBER_LENGTH = 10
+
+
+def normalize_whatsapp_number(number: str) -> str:
+    """
+    Function to normalize a number the same way as `get_normalized_number_expression`.
+
+    :param `number`: The number i.e. `98765 43210`, `+91 9876543210` or `919876543210`
+    :return: The digits of the number with the country code i.e. `919876543210`
+    """
+    digits = re.sub(r"[+\s-]", "", number or "")
+    if len(digits) == LOCAL_NUMBER_LENGTH:
+        return f"{WA_DEFAULT_COUNTRY_CODE}{digits}"
+    return digits
+
+
+def get_normalized_number_expression(field: str):
+    """
+    Function to get the SQL expression which normalizes the number of the field.
+    """
+    digits = field
+    for separator in NUMBER_SEPARATORS:
+        digits = Replace(digits, Value(separator), Value(""))
+    return Case(
+        When(
+            Exact(Length(digits), LOCAL_NUMBER_LENGTH),
+            then=Concat(Value(WA_DEFAULT_COUNTRY_CODE), digits),
+        ),
+        default=digits,
+        output_field=CharField(),
+    )
+
+
+def get_normalized_numbers(queryset: QuerySet, field: str) -> QuerySet:
+    opted_out = WhatsAppOptOut.objects.filter(number=OuterRef("normalized_number"))
+    return (
+        queryset.annotate(normalized_number=get_normalized_number_expression(field))
+        .exclude(normalized_number="")
+        .exclude(Exists(opted_out))
+        .order_by()
+        .values_list("normalized_number", flat=True)
+    )
+
+
+def get_promotional_audience_queryset() -> QuerySet:
+    """
+    Function to get the query of the normalized, distinct numbers which did not opt out.
+    """
+    return get_normalized_numbers(Booking.objects.all(), "wa_number").union(
+        get_normalized_numbers(ExtraWhatsAppNumbers.objects.all(), "number")
+    )
+
+
+def get_combined_numbers_for_promotional_message(chunk_size: int = WA_CAMPAIGN_CHUNK_SIZE):
+    """
+    Function to stream the numbers of the promotional audience.
+
+    :param `chunk_size`: The number of rows fetched from the cursor at once
+    :return: Iterator of the numbers
+    """
+    return get_promotional_audience_queryset().iterator(chunk_size=chunk_size)
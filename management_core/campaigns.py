@@ -0,0 +1,365 @@
+"""
+Promotional WhatsApp campaigns.
+
+A campaign stores a `CampaignRecipient` row per number which is bulk inserted as pending and
+bulk updated with the result of the send, so a campaign can be paused, resumed after a worker
+restart and retried for the failed recipients only without messaging anyone twice.
+
+The pending recipients are sent in chunks of `WA_CAMPAIGN_CHUNK_SIZE`, every chunk is one job on
+the `low` queue. A chunk job sends its messages concurrently with the pooled async WhatsApp
+client, every message takes a token from a Redis token bucket shared by all the workers so that
+the campaigns stay within `WA_CAMPAIGN_RATE_PER_SECOND` of the messaging tier. A paused campaign
+stops at the next chunk.
+"""
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from datetime import timedelta
+import django_rq
+import asyncio
+import logging
+import time
+
+import httpx
+
+from common_config.common import (
+    CAMPAIGN_RECIPIENT_FAILED,
+    CAMPAIGN_RECIPIENT_PENDING,
+    CAMPAIGN_RECIPIENT_SENDING,
+    CAMPAIGN_RECIPIENT_SENT,
+    WA_API_CONCURRENCY,
+    WA_CAMPAIGN_BURST,
+    WA_CAMPAIGN_CHUNK_SIZE,
+    WA_CAMPAIGN_RATE_PER_SECOND,
+)
+from common_config.redis_client import get_redis_client
+from whatsapp.messages.message_handlers import whatsapp_config
+from .models import Campaign, CampaignRecipient
+
+logging.getLogger(__name__)
+
+CAMPAIGN_RATE_LIMIT_KEY = "wa_campaign_rate_limit"
+CAMPAIGN_CHUNK_TIMEOUT = 30*60
+
+# Refills the bucket for the time passed since the last call and takes the requested tokens.
+# Returns the seconds to wait for the tokens as a string, Lua numbers are truncated to integers.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "updated_at")
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= requested then
+    tokens = tokens - requested
+else
+    wait = (requested - tokens) / rate
+end
+redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "updated_at", tostring(now))
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+_token_bucket = None
+
+
+def take_send_token(
+    rate: float = WA_CAMPAIGN_RATE_PER_SECOND, capacity: int = WA_CAMPAIGN_BURST
+) -> float:
+    """
+    Function to take a token from the campaign rate limit bucket.
+
+    :return: 0 if the token is taken, else the seconds to wait before trying again
+    """
+    global _token_bucket
+    if _token_bucket is None:
+        _token_bucket = get_redis_client().register_script(TOKEN_BUCKET_SCRIPT)
+    return float(_token_bucket(keys=[CAMPAIGN_RATE_LIMIT_KEY], args=[capacity, rate, 1]))
+
+
+async def wait_for_send_token() -> None:
+    while True:
+        # The Redis call would block the event loop and the other sends with it
+        wait = await asyncio.to_thread(take_send_token)
+        if wait <= 0:
+            return
+        await asyncio.sleep(wait)
+
+
+def start_campaign(
+    name: str,
+    message_type: str,
+    type_data: dict,
+    phone_numbers,
+    chunk_size: int = WA_CAMPAIGN_CHUNK_SIZE,
+) -> str:
+    """
+    Function to start sending the same message to all the phone numbers.
+
+    :param `name`: The name of the campaign i.e. the template name
+    :param `message_type`: The type of the message i.e. `template`
+    :param `type_data`: The data of the message
+    :param `phone_numbers`: Iterable of the recipient numbers, it is consumed chunk by chunk
+    :param `chunk_size`: The number of recipients of a chunk job
+    :return: The id of the campaign
+    """
+    campaign = Campaign.objects.create(
+        name=name, message_type=message_type, type_data=type_data
+    )
+    chunk = []
+    for number in phone_numbers:
+        chunk.append(CampaignRecipient(campaign=campaign, number=number))
+        if len(chunk) >= chunk_size:
+            # Duplicate numbers of the audience are skipped by the unique constraint
+            CampaignRecipient.objects.bulk_create(chunk, ignore_conflicts=True)
+            chunk = []
+    if chunk:
+        CampaignRecipient.objects.bulk_create(chunk, ignore_conflicts=True)
+    Campaign.objects.filter(id=campaign.id).update(total=campaign.recipients.count())
+
+    chunks = enqueue_pending_chunks(campaign, chunk_size)
+    logging.info(f"Campaign {campaign.id} {name} started with {chunks} chunks")
+    return str(campaign.id)
+
+
+def enqueue_pending_chunks(campaign: Campaign, chunk_size: int = WA_CAMPAIGN_CHUNK_SIZE) -> int:
+    """
+    Function to enqueue a chunk job for every `chunk_size` pending recipients of the campaign.
+
+    :return: The number of enqueued chunks
+    """
+    queue = django_rq.get_queue("low")
+    pending_ids = (
+        campaign.recipients.filter(status=CAMPAIGN_RECIPIENT_PENDING)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    chunks, first_id, count = 0, None, 0
+    for recipient_id in pending_ids:
+        if first_id is None:
+            first_id = recipient_id
+        count += 1
+        if count >= chunk_size:
+            enqueue_campaign_chunk(queue, campaign.id, first_id, recipient_id)
+            chunks += 1
+            first_id, count = None, 0
+    if first_id is not None:
+        enqueue_campaign_chunk(queue, campaign.id, first_id, recipient_id)
+        chunks += 1
+    return chunks
+
+
+def enqueue_campaign_chunk(queue, campaign_id, first_id: int, last_id: int) -> None:
+    queue.enqueue(
+        send_campaign_chunk,
+        str(campaign_id),
+        first_id,
+        last_id,
+        job_timeout=CAMPAIGN_CHUNK_TIMEOUT,
+    )
+
+
+def get_send_result(response: httpx.Response | Exception) -> tuple[int, str | None, str | None]:
+    """
+    Function to get the result of a sent message.
+
+    :return: tuple of the recipient status, the WhatsApp message id and the error
+    """
+    if isinstance(response, Exception):
+        return CAMPAIGN_RECIPIENT_FAILED, None, type(response).__name__[:100]
+    if not response.is_success:
+        return CAMPAIGN_RECIPIENT_FAILED, None, f"HTTP {response.status_code}"
+    try:
+        return CAMPAIGN_RECIPIENT_SENT, response.json()["messages"][0]["id"], None
+    except (ValueError, KeyError, IndexError):
+        return CAMPAIGN_RECIPIENT_SENT, None, None
+
+
+async def send_campaign_messages(
+    phone_numbers: list[str], message_type: str, type_data: dict
+) -> list[httpx.Response | Exception]:
+    async with whatsapp_config.get_async_client() as client:
+        return await client.send_many(
+            [
+                {
+                    "recipient_number": number,
+                    "message_type": message_type,
+                    "type_data": type_data,
+                }
+                for number in phone_numbers
+            ],
+            WA_API_CONCURRENCY,
+            before_send=wait_for_send_token,
+        )
+
+
+def claim_campaign_recipients(campaign_id: str, first_id: int, last_id: int) -> list[CampaignRecipient]:
+    """
+    Function to mark the pending recipients of the chunk as sending, so that a chunk enqueued
+    again by a resume does not send them twice.
+    """
+    with transaction.atomic():
+        recipients = list(
+            CampaignRecipient.objects.select_for_update(skip_locked=True)
+            .filter(
+                campaign_id=campaign_id,
+                id__gte=first_id,
+                id__lte=last_id,
+                status=CAMPAIGN_RECIPIENT_PENDING,
+            )
+            .only("id", "number")
+        )
+        CampaignRecipient.objects.filter(
+            id__in=[recipient.id for recipient in recipients]
+        ).update(status=CAMPAIGN_RECIPIENT_SENDING, claimed_at=timezone.now())
+    return recipients
+
+
+def record_campaign_results(campaign_id: str, recipients: list[CampaignRecipient], seconds: float) -> None:
+    """
+    Function to store the results of a chunk and update the campaign counters.
+
+    :param `campaign_id`: The id of the campaign
+    :param `recipients`: The recipients of the chunk with their result set
+    :param `seconds`: The time taken to send the chunk
+    """
+    sent = sum(recipient.status == CAMPAIGN_RECIPIENT_SENT for recipient in recipients)
+    with transaction.atomic():
+        CampaignRecipient.objects.bulk_update(
+            recipients, ["status", "message_id", "error"], batch_size=WA_CAMPAIGN_CHUNK_SIZE
+        )
+        Campaign.objects.filter(id=campaign_id).update(
+            sent=F("sent") + sent,
+            failed=F("failed") + len(recipients) - sent,
+            send_seconds=F("send_seconds") + seconds,
+            updated_at=timezone.now(),
+        )
+    unfinished = CampaignRecipient.objects.filter(
+        campaign_id=campaign_id,
+        status__in=[CAMPAIGN_RECIPIENT_PENDING, CAMPAIGN_RECIPIENT_SENDING],
+    )
+    if not unfinished.exists():
+        Campaign.objects.filter(id=campaign_id, status="running").update(
+            status="completed", finished_at=timezone.now()
+        )
+
+
+def send_campaign_chunk(campaign_id: str, first_id: int, last_id: int) -> str:
+    """
+    RQ job to send the message of the campaign to the pending recipients with ids in the range.
+    """
+    campaign = Campaign.objects.filter(id=campaign_id).first()
+    if campaign is None or campaign.status != "running":
+        return f"Campaign {campaign_id} is not running, chunk {first_id}-{last_id} skipped"
+
+    recipients = claim_campaign_recipients(campaign_id, first_id, last_id)
+    if not recipients:
+        return f"No pending recipients in chunk {first_id}-{last_id}"
+
+    start = time.perf_counter()
+    responses = asyncio.run(
+        send_campaign_messages(
+            [recipient.number for recipient in recipients],
+            campaign.message_type,
+            campaign.type_data,
+        )
+    )
+    for recipient, response in zip(recipients, responses):
+        recipient.status, recipient.message_id, recipient.error = get_send_result(response)
+    seconds = time.perf_counter() - start
+    record_campaign_results(campaign_id, recipients, seconds)
+
+    progress = get_campaign_progress(campaign_id)
+    logging.info(
+        f"Campaign {campaign_id} chunk of {len(recipients)} sent in {seconds:.2f}s "
+        f"({len(recipients) / seconds:.1f}/s): {progress}"
+    )
+    return f"Sent {len(recipients)} messages in {seconds:.2f}s, campaign progress {progress['progress']}%"
+
+
+def pause_campaign(campaign: Campaign) -> bool:
+    """
+    Function to pause the campaign, the chunks being sent are finished and the rest are skipped.
+    """
+    return bool(Campaign.objects.filter(id=campaign.id, status="running").update(status="paused"))
+
+
+def resume_campaign(campaign: Campaign) -> int:
+    """
+    Function to resume the campaign by enqueuing its pending recipients again.
+
+    :return: The number of enqueued chunks
+    """
+    Campaign.objects.filter(id=campaign.id).update(
+        status="running", finished_at=None, updated_at=timezone.now()
+    )
+    chunks = enqueue_pending_chunks(campaign)
+    if not chunks:
+        record_campaign_results(campaign.id, [], 0)
+    return chunks
+
+
+def retry_failed_campaign_recipients(campaign: Campaign) -> int:
+    """
+    Function to send the campaign again to its failed recipients only.
+
+    Recipients left sending by a worker which stopped in the middle of a chunk are retried as well
+    once the campaign is paused or completed and their chunk job has timed out, so a chunk which is
+    still being sent is not sent twice. Otherwise they are left sending for the admin to check.
+
+    :return: The number of enqueued chunks
+    """
+    with transaction.atomic():
+        campaign = Campaign.objects.select_for_update().get(id=campaign.id)
+        failed = CampaignRecipient.objects.filter(
+            campaign=campaign, status=CAMPAIGN_RECIPIENT_FAILED
+        ).update(status=CAMPAIGN_RECIPIENT_PENDING, error=None)
+        if campaign.status in ("paused", "completed"):
+            # Recipients claimed before `claimed_at` was tracked have no claim time
+            released = CampaignRecipient.objects.filter(
+                Q(claimed_at__isnull=True)
+                | Q(claimed_at__lt=timezone.now() - timedelta(seconds=CAMPAIGN_CHUNK_TIMEOUT)),
+                campaign=campaign,
+                status=CAMPAIGN_RECIPIENT_SENDING,
+            ).update(status=CAMPAIGN_RECIPIENT_PENDING, claimed_at=None)
+            if released:
+                logging.warning(f"Released {released} recipients of campaign {campaign.id} left sending")
+        Campaign.objects.filter(id=campaign.id).update(failed=F("failed") - failed)
+    return resume_campaign(campaign)
+
+
+def get_campaign_progress(campaign_id: str) -> dict | None:
+    """
+    Function to get the progress and the throughput of the campaign.
+
+    :param `campaign_id`: The id of the campaign
+    :return: The campaign counters or None if the campaign does not exist
+    """
+    campaign = Campaign.objects.filter(id=campaign_id).first()
+    if campaign is None:
+        return None
+    return get_campaign_stats(campaign)
+
+
+def get_campaign_stats(campaign: Campaign) -> dict:
+    processed = campaign.sent + campaign.failed
+    elapsed = ((campaign.finished_at or campaign.updated_at) - campaign.created_at).total_seconds()
+    return {
+        "id": str(campaign.id),
+        "name": campaign.name,
+        "status": campaign.status,
+        "total": campaign.total,
+        "sent": campaign.sent,
+        "failed": campaign.failed,
+        "pending": campaign.total - processed,
+        "progress": round(processed * 100 / campaign.total, 2) if campaign.total else 0,
+        "messages_per_second": round(processed / elapsed, 2) if elapsed > 0 and processed else 0,
+        "started_at": campaign.created_at,
+        "finished_at": campaign.finished_at,
+    }
@@ -1,26 +1,18 @@
 from datetime import timedelta
-import os
 from django import forms
 from django.core.files.uploadedfile import InMemoryUploadedFile
-from urllib.parse import quote
 from crispy_forms.helper import FormHelper, Layout
 from crispy_forms.layout import Submit
 from crispy_bootstrap5.bootstrap5 import FloatingField
-import django_rq
 import logging
 
-from .models import Locker, TicketPrice, ExtraWhatsAppNumbers
-from bookings.models import Booking
-from whatsapp.messages.message_handlers import whatsapp_config
-from common_config.common import (
-    HOST_URL,
-    TEMPORARY_FILE_LOCATION,
-    GENERATED_MEDIA_BASE_URL,
-)
+from .models import Locker, TicketPrice
+from .audience import get_combined_numbers_for_promotional_message
+from .campaigns import start_campaign
+from .promotional_media import get_promotional_image_header
 
 
 logging.getLogger(__name__)
-low_queue = django_rq.get_queue("low")
 
 
 class TicketListPriceForm(forms.Form):
@@ -107,16 +99,6 @@ class LockerBulkAddForm(forms.Form):
             )
 
 
-def get_combined_numbers_for_promotional_message() -> set:
-    booking_phone_numbers = list(
-        Booking.objects.all().values_list("wa_number", flat=True)
-    )
-    extra_phone_numbers = list(
-        ExtraWhatsAppNumbers.objects.all().values_list("number", flat=True)
-    )
-    return set(booking_phone_numbers + extra_phone_numbers)
-
-
 class TextOnlyPromotionalMessageForm(forms.Form):
     template_name = forms.CharField(
         required=True,
@@ -137,20 +119,15 @@ class TextOnlyPromotionalMessageForm(forms.Form):
             msg_template = self.cleaned_data["template_name"]
             phone_numbers = get_combined_numbers_for_promotional_message()
 
-            for number in phone_numbers:
-                try:
-                    low_queue.enqueue(
-                        whatsapp_config.send_message,
-                        number,
-                        "template",
-                        {
-                            "name": msg_template,
-                            "language": {"code": "en"},
-                        },
-                        None,
-                    )
-                except Exception as e:
-                    logging.exception(e)
+            self.campaign_id = start_campaign(
+                msg_template,
+                "template",
+                {
+                    "name": msg_template,
+                    "language": {"code": "en"},
+                },
+                phone_numbers,
+            )
         except Exception as e:
             logging.exception(e)
             self.add_error(
@@ -158,20 +135,6 @@ class TextOnlyPromotionalMessageForm(forms.Form):
             )
 
 
-def save_promotional_image(image: InMemoryUploadedFile) -> str:
-    image_path = f"{TEMPORARY_FILE_LOCATION}/promotional_images"
-    os.makedirs(image_path, exist_ok=True)
-    image_path = f"{image_path}/{image.name}"
-    # save above file in the path
-    with open(image_path, "wb") as f:
-        for chunk in image.chunks():
-            f.write(chunk)
-
-    return (
-        f"{HOST_URL}{GENERATED_MEDIA_BASE_URL}/promotional_images/{quote(image.name)}"
-    )
-
-
 class ImageOnlyPromotionalMessageForm(forms.Form):
     template_name = forms.CharField(
         required=True,
@@ -194,37 +157,30 @@ class ImageOnlyPromotionalMessageForm(forms.Form):
         try:
             image: InMemoryUploadedFile = self.cleaned_data["image"]
             template_name: str = self.cleaned_data["template_name"]
-            hosted_image_path = save_promotional_image(image)
+            image_header = get_promotional_image_header(image)
 
             phone_numbers = get_combined_numbers_for_promotional_message()
 
-            for phone in phone_numbers:
-                try:
-                    low_queue.enqueue(
-                        whatsapp_config.send_message,
-                        phone,
-                        "template",
+            self.campaign_id = start_campaign(
+                template_name,
+                "template",
+                {
+                    "name": template_name,
+                    "language": {"code": "en"},
+                    "components": [
                         {
-                            "name": template_name,
-                            "language": {"code": "en"},
-                            "components": [
+                            "type": "header",
+                            "parameters": [
                                 {
-                                    "type": "header",
-                                    "parameters": [
-                                        {
-                                            "type": "image",
-                                            "image": {
-                                                "link": hosted_image_path
-                                            },
-                                        }
-                                    ],
-                                },
+                                    "type": "image",
+                                    "image": image_header,
+                                }
                             ],
                         },
-                        None,
-                    )
-                except Exception as e:
-                    logging.exception(e)
+                    ],
+                },
+                phone_numbers,
+            )
 
         except Exception as e:
             logging.exception(e)
@@ -256,36 +212,29 @@ class ImageWithCaptionPromotionalMessageForm(forms.Form):
         try:
             template_name: str = self.cleaned_data["template_name"]
             image: InMemoryUploadedFile = self.cleaned_data["image"]
-            hosted_image_path = save_promotional_image(image)
+            image_header = get_promotional_image_header(image)
             phone_numbers = get_combined_numbers_for_promotional_message()
 
-            for phone in phone_numbers:
-                try:
-                    low_queue.enqueue(
-                        whatsapp_config.send_message,
-                        phone,
-                        "template",
+            self.campaign_id = start_campaign(
+                template_name,
+                "template",
+                {
+                    "name": template_name,
+                    "language": {"code": "en"},
+                    "components": [
                         {
-                            "name": template_name,
-                            "language": {"code": "en"},
-                            "components": [
+                            "type": "header",
+                            "parameters": [
                                 {
-                                    "type": "header",
-                                    "parameters": [
-                                        {
-                                            "type": "image",
-                                            "image": {
-                                                "link": hosted_image_path
-                                            },
-                                        }
-                                    ],
-                                },
+                                    "type": "image",
+                                    "image": image_header,
+                                }
                             ],
                         },
-                        None,
-                    )
-                except Exception as e:
-                    logging.exception(e)
+                    ],
+                },
+                phone_numbers,
+            )
 
         except Exception as e:
             logging.exception(e)
@@ -0,0 +1,191 @@
+"""
+Lifecycle of the files written to the generated media storage.
+
+Every generated file is tracked in `GeneratedMedia` with its size and last access. The
+scheduled `cleanup_generated_media` job evicts files which are not accessed for
+`GENERATED_MEDIA_MAX_AGE_DAYS` and, while the stored files are over `GENERATED_MEDIA_BUDGET_BYTES`,
+evicts tickets of past bookings first and then the least recently used files.
+"""
+
+from datetime import date as Date, timedelta
+from django.db.models import Sum
+from django.utils import timezone
+import logging
+import uuid
+import os
+
+from common_config.common import (
+    GENERATED_MEDIA_BUDGET_BYTES,
+    GENERATED_MEDIA_MAX_AGE_DAYS,
+)
+from bookings.models import Booking
+from .models import GeneratedMedia
+from .storage import get_generated_media_storage
+
+logging.getLogger(__name__)
+
+GENERATED_MEDIA_DIRECTORIES = {
+    "booking_tickets": "booking_ticket",
+    "promotional_images": "promotional_image",
+}
+
+
+def register_generated_media(
+    name: str, kind: str, size: int, booking_date: Date | None = None
+) -> GeneratedMedia:
+    """Track a file written to the generated media storage
+
+    :param name: storage name of the file
+    :param kind: one of `GENERATED_MEDIA_KINDS`
+    :param size: size of the file in bytes
+    :param booking_date: visit date of the booking for tickets
+
+    :return: index entry of the file
+    """
+    media, _ = GeneratedMedia.objects.update_or_create(
+        path=name,
+        defaults={
+            "kind": kind,
+            "size": size,
+            "booking_date": booking_date,
+            "last_accessed_at": timezone.now(),
+        },
+    )
+    return media
+
+
+def touch_generated_media(name: str) -> None:
+    """Mark a tracked file as used now so that it is evicted last"""
+    GeneratedMedia.objects.filter(path=name).update(last_accessed_at=timezone.now())
+
+
+def remove_stale_generated_media(prefix: str, extension: str, current_name: str) -> None:
+    """Delete the tracked files with the prefix and extension except the current one
+
+    :param prefix: storage name prefix of the files i.e. `booking_tickets/booking_{id}_`
+    :param extension: extension of the files including the dot
+    :param current_name: storage name of the file to keep
+    """
+    stale = GeneratedMedia.objects.filter(
+        path__startswith=prefix, path__endswith=extension
+    ).exclude(path=current_name)
+    for media in stale:
+        delete_generated_media(media)
+
+
+def set_ticket_booking_dates(media_list: list[GeneratedMedia]) -> None:
+    """Set the visit date of untracked tickets from the booking id in their file name"""
+    tickets = {}
+    for media in media_list:
+        if media.kind == "booking_ticket":
+            # Ticket files are named `booking_{booking_id}_{fingerprint}.{extension}`
+            parts = os.path.basename(media.path).split("_")
+            try:
+                booking_id = str(uuid.UUID(parts[1]))
+            except (IndexError, ValueError):
+                continue
+            tickets.setdefault(booking_id, []).append(media)
+    if not tickets:
+        return
+    booking_dates = Booking.objects.filter(id__in=list(tickets)).values_list("id", "date")
+    for booking_id, booking_date in booking_dates:
+        for media in tickets.get(str(booking_id), []):
+            media.booking_date = booking_date
+
+
+def sync_generated_media() -> dict:
+    """Index the stored files which are not tracked and drop entries of missing files
+
+    :return: dict with the number of `added` and `removed` entries
+    """
+    storage = get_generated_media_storage()
+    tracked = set(GeneratedMedia.objects.values_list("path", flat=True))
+    stored = set()
+    new_media = []
+    now = timezone.now()
+    for directory, kind in GENERATED_MEDIA_DIRECTORIES.items():
+        try:
+            file_names = storage.listdir(directory)[1]
+        except FileNotFoundError:
+            continue
+        for file_name in file_names:
+            if file_name.endswith(".tmp"):
+                continue
+            name = f"{directory}/{file_name}"
+            stored.add(name)
+            if name not in tracked:
+                new_media.append(
+                    GeneratedMedia(
+                        path=name,
+                        kind=kind,
+                        size=storage.size(name),
+                        last_accessed_at=min(now, storage.get_modified_time(name)),
+                    )
+                )
+    set_ticket_booking_dates(new_media)
+    GeneratedMedia.objects.bulk_create(new_media, ignore_conflicts=True)
+    missing = tracked - stored
+    if missing:
+        GeneratedMedia.objects.filter(path__in=missing).delete()
+    return {"added": len(new_media), "removed": len(missing)}
+
+
+def delete_generated_media(media: GeneratedMedia) -> None:
+    get_generated_media_storage().delete(media.path)
+    media.delete()
+
+
+def evict_generated_media(
+    budget: int = GENERATED_MEDIA_BUDGET_BYTES,
+    max_age_days: int = GENERATED_MEDIA_MAX_AGE_DAYS,
+) -> dict:
+    """Evict old files and keep the generated media within the budget
+
+    :param budget: maximum total size of the tracked files in bytes
+    :param max_age_days: files not accessed for these many days are always evicted
+
+    :return: dict with the number of evicted files and bytes and the size left
+    """
+    evicted_files, evicted_bytes = 0, 0
+
+    expired = GeneratedMedia.objects.filter(
+        last_accessed_at__lt=timezone.now() - timedelta(days=max_age_days)
+    )
+    for media in expired.iterator():
+        evicted_bytes += media.size
+        evicted_files += 1
+        delete_generated_media(media)
+
+    total = GeneratedMedia.objects.aggregate(total=Sum("size"))["total"] or 0
+    if total > budget:
+        today = timezone.localdate()
+        # Tickets of past visit dates are not needed at the gate anymore, evict them first
+        candidates = [
+            GeneratedMedia.objects.filter(booking_date__lt=today).order_by(
+                "last_accessed_at"
+            ),
+            GeneratedMedia.objects.order_by("last_accessed_at"),
+        ]
+        for queryset in candidates:
+            for media in queryset.iterator():
+                if total <= budget:
+                    break
+                total -= media.size
+                evicted_bytes += media.size
+                evicted_files += 1
+                delete_generated_media(media)
+
+    return {
+        "evicted_files": evicted_files,
+        "evicted_bytes": evicted_bytes,
+        "total_bytes": total,
+        "budget_bytes": budget,
+    }
+
+
+def cleanup_generated_media() -> str:
+    """Scheduled job to index the generated media and evict files over the budget"""
+    synced = sync_generated_media()
+    summary = evict_generated_media()
+    logging.info(f"Generated media cleanup: {synced} {summary}")
+    return f"Synced {synced}, evicted {summary['evicted_files']} files ({summary['evicted_bytes']} bytes), {summary['total_bytes']} of {summary['budget_bytes']} bytes used"
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from common_config.scheduler import register_scheduled_jobs
+
+
+class Command(BaseCommand):
+    help = "Register the periodic jobs of common_config.scheduler with rq-scheduler"
+
+    def handle(self, *args, **options):
+        for job_id in register_scheduled_jobs():
+            self.stdout.write(f"Scheduled {job_id}")
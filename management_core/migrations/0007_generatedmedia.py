@@ -0,0 +1,30 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:00
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_core', '0006_alter_locker_locker_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeneratedMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('path', models.CharField(max_length=500, unique=True)),
+                ('kind', models.CharField(choices=[('booking_ticket', 'booking_ticket'), ('promotional_image', 'promotional_image')], db_index=True, max_length=50)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('booking_date', models.DateField(blank=True, db_index=True, null=True)),
+                ('last_accessed_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['last_accessed_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:13
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_core', '0007_generatedmedia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campaign',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('message_type', models.CharField(default='template', max_length=50)),
+                ('type_data', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('running', 'running'), ('paused', 'paused'), ('completed', 'completed')], db_index=True, default='running', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('sent', models.PositiveIntegerField(default=0)),
+                ('failed', models.PositiveIntegerField(default=0)),
+                ('send_seconds', models.FloatField(default=0)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CampaignRecipient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.CharField(max_length=20)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'pending'), (1, 'sending'), (2, 'sent'), (3, 'failed')], default=0)),
+                ('message_id', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('error', models.CharField(blank=True, max_length=100, null=True)),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recipients', to='management_core.campaign')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['campaign', 'status'], name='management__campaig_2b1b48_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='campaignrecipient',
+            constraint=models.UniqueConstraint(fields=('campaign', 'number'), name='unique_campaign_recipient'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('management_core', '0008_campaign'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WhatsAppOptOut',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('number', models.CharField(max_length=20, unique=True)),
+                ('reason', models.CharField(blank=True, max_length=200, null=True)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+                'abstract': False,
+            },
+        ),
+    ]
@@ -1,7 +1,15 @@
 from django.db import models
 from django.core.validators import MinValueValidator
+from django.utils import timezone
+import uuid
 
-from common_config.common import WHATSAPP_INQUIRY_MSG_TYPES
+from common_config.common import (
+    CAMPAIGN_RECIPIENT_PENDING,
+    CAMPAIGN_RECIPIENT_STATUSES,
+    CAMPAIGN_STATUSES,
+    GENERATED_MEDIA_KINDS,
+    WHATSAPP_INQUIRY_MSG_TYPES,
+)
 
 
 class DateTimeBaseModel(models.Model):
@@ -77,3 +85,71 @@ class ExtraWhatsAppNumbers(DateTimeBaseModel):
 
     def __str__(self) -> str:
         return self.number
+
+
+class GeneratedMedia(DateTimeBaseModel):
+    path = models.CharField(max_length=500, unique=True)
+    kind = models.CharField(max_length=50, choices=GENERATED_MEDIA_KINDS, db_index=True)
+    size = models.PositiveBigIntegerField(default=0)
+    booking_date = models.DateField(null=True, blank=True, db_index=True)
+    last_accessed_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self) -> str:
+        return self.path
+
+    class Meta:
+        ordering = ["last_accessed_at"]
+
+
+class WhatsAppOptOut(DateTimeBaseModel):
+    # Normalized with the country code i.e. `919876543210`
+    number = models.CharField(max_length=20, unique=True)
+    reason = models.CharField(max_length=200, null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.number
+
+
+class Campaign(DateTimeBaseModel):
+    id = models.UUIDField(
+        primary_key=True, default=uuid.uuid4, editable=False, db_index=True
+    )
+    name = models.CharField(max_length=200)
+    message_type = models.CharField(max_length=50, default="template")
+    type_data = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=20, choices=CAMPAIGN_STATUSES, default=CAMPAIGN_STATUSES[0][0], db_index=True
+    )
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    send_seconds = models.FloatField(default=0)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.name} - {self.created_at.strftime('%d-%m-%Y %H:%M')}"
+
+    class Meta:
+        ordering = ["-created_at"]
+
+
+class CampaignRecipient(models.Model):
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name="recipients")
+    number = models.CharField(max_length=20)
+    status = models.PositiveSmallIntegerField(
+        choices=CAMPAIGN_RECIPIENT_STATUSES, default=CAMPAIGN_RECIPIENT_PENDING
+    )
+    message_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    error = models.CharField(max_length=100, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return self.number
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["campaign", "number"], name="unique_campaign_recipient"
+            ),
+        ]
+        indexes = [models.Index(fields=["campaign", "status"])]
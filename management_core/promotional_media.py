@@ -0,0 +1,91 @@
+"""
+Promotional images sent with the WhatsApp templates.
+
+The uploaded image is downscaled and recompressed once and uploaded to the WhatsApp media
+endpoint, every recipient of the campaign then gets the media id instead of a link so Meta does
+not fetch the image from our server for every message. Media ids are cached by the hash of the
+optimized image for `WA_MEDIA_ID_TTL`, Meta keeps the uploaded media for 30 days.
+"""
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps
+import hashlib
+import logging
+import io
+import os
+
+from common_config.common import (
+    PROMOTIONAL_IMAGE_JPEG_QUALITY,
+    PROMOTIONAL_IMAGE_MAX_SIZE,
+    WA_MEDIA_ID_TTL,
+)
+from whatsapp.messages.message_handlers import whatsapp_config
+from .generated_media import register_generated_media
+from .storage import get_generated_file_url, save_generated_file
+
+logging.getLogger(__name__)
+
+
+def optimize_promotional_image(image: UploadedFile) -> ContentFile:
+    """
+    Function to downscale the image to `PROMOTIONAL_IMAGE_MAX_SIZE` and recompress it as jpeg.
+
+    :param `image`: The uploaded image
+    :return: The optimized jpeg named after the uploaded image
+    """
+    image.seek(0)
+    with Image.open(image) as original:
+        optimized = ImageOps.exif_transpose(original).convert("RGB")
+    optimized.thumbnail((PROMOTIONAL_IMAGE_MAX_SIZE, PROMOTIONAL_IMAGE_MAX_SIZE))
+    output = io.BytesIO()
+    optimized.save(
+        output,
+        "JPEG",
+        quality=PROMOTIONAL_IMAGE_JPEG_QUALITY,
+        optimize=True,
+        progressive=True,
+    )
+    name = f"{os.path.splitext(os.path.basename(image.name))[0]}.jpg"
+    return ContentFile(output.getvalue(), name=name)
+
+
+def save_promotional_image(image: ContentFile) -> str:
+    name = save_generated_file(f"promotional_images/{image.name}", image)
+    register_generated_media(name, "promotional_image", image.size)
+    return get_generated_file_url(name)
+
+
+def get_promotional_media_id(image: ContentFile) -> str:
+    """
+    Function to upload the image to WhatsApp once and get its media id.
+
+    :param `image`: The optimized image
+    :return: The WhatsApp media id
+    """
+    content = image.read()
+    cache_key = f"wa_media_{hashlib.sha256(content).hexdigest()}"
+    media_id = cache.get(cache_key)
+    if media_id is None:
+        media_id = whatsapp_config.upload_media(content, image.name, "image/jpeg")
+        cache.set(cache_key, media_id, timeout=WA_MEDIA_ID_TTL)
+        logging.info(f"Promotional image {image.name} ({len(content)} bytes) uploaded as {media_id}")
+    return media_id
+
+
+def get_promotional_image_header(image: UploadedFile) -> dict:
+    """
+    Function to optimize and store the promotional image and get the image of the template header.
+
+    :param `image`: The uploaded image
+    :return: `{"id": media_id}` or `{"link": url}` if the upload to WhatsApp failed
+    """
+    optimized = optimize_promotional_image(image)
+    hosted_image_path = save_promotional_image(optimized)
+    try:
+        optimized.seek(0)
+        return {"id": get_promotional_media_id(optimized)}
+    except Exception as e:
+        logging.exception(e)
+        return {"link": hosted_image_path}
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import logging
+
+from whatsapp.messages.payloads import get_reply_payloads_key, rebuild_reply_payloads
+from .models import TicketPrice, WhatsAppInquiryMessage
+
+logging.getLogger(__name__)
+
+
+def rebuild_reply_payloads_on_commit() -> None:
+    try:
+        rebuild_reply_payloads()
+    except Exception as e:
+        logging.exception(e)
+        # The next reply builds the payloads again
+        cache.delete(get_reply_payloads_key(timezone.localtime(timezone.now()).date()))
+
+
+@receiver(post_save, sender=TicketPrice)
+@receiver(post_delete, sender=TicketPrice)
+@receiver(post_save, sender=WhatsAppInquiryMessage)
+@receiver(post_delete, sender=WhatsAppInquiryMessage)
+def rebuild_whatsapp_reply_payloads(sender, **kwargs) -> None:
+    """Rebuild the cached WhatsApp reply payloads once the changed prices or inquiry messages are committed"""
+    transaction.on_commit(rebuild_reply_payloads_on_commit)
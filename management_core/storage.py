@@ -0,0 +1,119 @@
+"""
+Storage of the generated media i.e. tickets and promotional images.
+
+`GENERATED_MEDIA_STORAGE=local` keeps the files in `TEMPORARY_FILE_LOCATION` served under
+`GENERATED_MEDIA_BASE_URL`. `GENERATED_MEDIA_STORAGE=s3` stores them in an S3 compatible
+bucket so that every API node serves the same files, set `S3_ENDPOINT_URL` to use MinIO.
+Files are addressed by their storage name relative to the root, e.g. `booking_tickets/x.pdf`.
+"""
+
+from functools import lru_cache
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, Storage
+import tempfile
+import os
+
+from common_config.common import (
+    GENERATED_MEDIA_BASE_URL,
+    GENERATED_MEDIA_STORAGE,
+    HOST_URL,
+    S3_ACCESS_KEY_ID,
+    S3_BUCKET_NAME,
+    S3_ENDPOINT_URL,
+    S3_PRESIGNED_URL_EXPIRY,
+    S3_PUBLIC_DOMAIN,
+    S3_REGION_NAME,
+    S3_SECRET_ACCESS_KEY,
+    TEMPORARY_FILE_LOCATION,
+)
+
+
+@lru_cache(maxsize=2)
+def get_generated_media_storage(file_overwrite: bool = False) -> Storage:
+    """Get the storage backend of the generated media configured by `GENERATED_MEDIA_STORAGE`
+
+    :param file_overwrite: get the s3 backend which writes to the given name, replacing the file
+        with the same name instead of saving under an alternate name
+    """
+    if GENERATED_MEDIA_STORAGE == "s3":
+        # Only needed for the s3 backend, install `django-storages[s3]`
+        from storages.backends.s3 import S3Storage
+
+        return S3Storage(
+            bucket_name=S3_BUCKET_NAME,
+            endpoint_url=S3_ENDPOINT_URL,
+            access_key=S3_ACCESS_KEY_ID,
+            secret_key=S3_SECRET_ACCESS_KEY,
+            region_name=S3_REGION_NAME,
+            custom_domain=S3_PUBLIC_DOMAIN,
+            # Without a public domain the urls are pre-signed, WhatsApp fetches them right away
+            querystring_auth=bool(S3_PRESIGNED_URL_EXPIRY) and not S3_PUBLIC_DOMAIN,
+            querystring_expire=S3_PRESIGNED_URL_EXPIRY,
+            # `exists` always returns False with file overwrite, it is only used to write the files
+            file_overwrite=file_overwrite,
+            default_acl=None,
+        )
+    if GENERATED_MEDIA_STORAGE != "local":
+        raise ValueError(f"Unsupported generated media storage: {GENERATED_MEDIA_STORAGE}")
+    return FileSystemStorage(
+        location=TEMPORARY_FILE_LOCATION,
+        base_url=f"{HOST_URL}{GENERATED_MEDIA_BASE_URL}/",
+    )
+
+
+def replace_local_file(storage: FileSystemStorage, name: str, content: File) -> str:
+    """Write the file next to its final path and move it in place with `os.replace`
+
+    Readers get either the previous or the new file, never a partly written one.
+    """
+    path = storage.path(name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in content.chunks():
+                f.write(chunk)
+        os.chmod(tmp_path, storage.file_permissions_mode or 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return name
+
+
+def save_generated_file(name: str, content: File) -> str:
+    """Save the file to the generated media storage, replacing a file with the same name
+
+    The file is replaced in one step so a concurrent reader never gets a missing or truncated file.
+    The content is streamed in chunks, S3 uploads are multipart for large files and an S3 object
+    is only visible once the upload is complete.
+
+    :param name: storage name of the file
+    :param content: django file or uploaded file
+
+    :return: storage name of the saved file
+    """
+    storage = get_generated_media_storage()
+    if isinstance(storage, FileSystemStorage):
+        return replace_local_file(storage, name, content)
+    return get_generated_media_storage(file_overwrite=True).save(name, content)
+
+
+def save_generated_file_from_path(name: str, path: str) -> str:
+    """Move a locally rendered file to the generated media storage
+
+    :param name: storage name of the file
+    :param path: local path of the rendered file, it is removed after saving
+
+    :return: storage name of the saved file
+    """
+    try:
+        with open(path, "rb") as f:
+            return save_generated_file(name, File(f, name=os.path.basename(name)))
+    finally:
+        os.remove(path)
+
+
+def get_generated_file_url(name: str) -> str:
+    return get_generated_media_storage().url(name)
@@ -7,6 +7,8 @@ from .views import (
     LockerBulkAddFormView,
     TextOnlyPromotionalMessageFormView,
     PromotionalHomeTemplateView,
+    CampaignProgressAPIView,
+    CampaignDeliveryAPIView,
 )
 
 
@@ -41,4 +43,14 @@ urlpatterns = [
         PromotionalHomeTemplateView.as_view(),
         name="promotional_message_home",
     ),
+    path(
+        "campaign-progress/<str:campaign_id>",
+        CampaignProgressAPIView.as_view(),
+        name="campaign_progress",
+    ),
+    path(
+        "campaign-delivery/<str:campaign_id>",
+        CampaignDeliveryAPIView.as_view(),
+        name="campaign_delivery",
+    ),
 ]
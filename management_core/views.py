@@ -3,6 +3,8 @@ from django.shortcuts import render
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import FormView, TemplateView
 from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
 import logging
 
 from .forms import (
@@ -12,6 +14,9 @@ from .forms import (
     LockerBulkAddForm,
     TextOnlyPromotionalMessageForm,
 )
+from .campaigns import get_campaign_progress
+from .models import Campaign
+from whatsapp.statuses import get_campaign_delivery_rollup
 from bookings.decorators import user_type_required
 from common_config.common import ADMIN_USER
 
@@ -91,6 +96,24 @@ class ImageWithCaptionPromotionalMessageFormView(FormView):
             return self.form_invalid(form)
 
 
+class CampaignProgressAPIView(LoginRequiredMixin, APIView):
+    @user_type_required([ADMIN_USER])
+    def get(self, request, campaign_id: str):
+        progress = get_campaign_progress(campaign_id)
+        if progress is None:
+            return Response({"message": "Campaign not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress, status=status.HTTP_200_OK)
+
+
+class CampaignDeliveryAPIView(LoginRequiredMixin, APIView):
+    @user_type_required([ADMIN_USER])
+    def get(self, request, campaign_id: str):
+        campaign = Campaign.objects.filter(id=campaign_id).first()
+        if campaign is None:
+            return Response({"message": "Campaign not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(get_campaign_delivery_rollup(campaign), status=status.HTTP_200_OK)
+
+
 class AdminHomeTemplateView(TemplateView):
     template_name = "admin_home.html"
 
@@ -1,3 +1,36 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-# Register your models here.
+from .models import MessageStatus, OutboundMessage
+from .outbox import retry_dead_outbound_messages
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = (
+        "recipient",
+        "message_type",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "message_id",
+        "last_error",
+        "created_at",
+    )
+    list_filter = ("status", "message_type")
+    search_fields = ("recipient", "message_id")
+    readonly_fields = ("message_id", "sent_at", "last_error")
+    actions = ("retry_dead",)
+    show_full_result_count = False
+
+    @admin.action(description="Retry selected dead messages")
+    def retry_dead(self, request, queryset):
+        count = retry_dead_outbound_messages(queryset)
+        self.message_user(request, f"{count} messages queued again.", messages.SUCCESS)
+
+
+@admin.register(MessageStatus)
+class MessageStatusAdmin(admin.ModelAdmin):
+    list_display = ("message_id", "recipient", "status", "error_code", "status_at")
+    list_filter = ("status",)
+    search_fields = ("message_id", "recipient")
+    show_full_result_count = False
@@ -0,0 +1,116 @@
+"""
+Local stand-in of the WhatsApp Cloud API for load tests.
+
+It accepts the `/{version}/{phone_id}/messages` and `/{version}/{phone_id}/media` requests of
+`WhatsAppClient`, answers like the Graph API and records the sent messages. Latency and error
+rate can be simulated. `GET /stats` returns the counters and `GET /messages` the last messages.
+
+Run it with `python manage.py fake_graph_api` and point `WA_GRAPH_API_URL` to it.
+"""
+
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import logging
+import random
+import json
+import time
+import uuid
+
+logging.getLogger(__name__)
+
+
+class FakeGraphAPIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        error_rate: float = 0,
+        max_recorded: int = 10000,
+    ):
+        super().__init__(address, FakeGraphAPIHandler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.messages = deque(maxlen=max_recorded)
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def record(self, counter: str, message: dict | None = None) -> None:
+        with self.lock:
+            self.counters[counter] += 1
+            if message is not None:
+                self.messages.append(message)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.counters)
+
+    def simulate_latency(self) -> None:
+        delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+
+class FakeGraphAPIHandler(BaseHTTPRequestHandler):
+    server: FakeGraphAPIServer
+    protocol_version = "HTTP/1.1"
+
+    def send_json(self, status: int, data: dict | list) -> None:
+        body = json.dumps(data, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            return self.send_json(200, self.server.get_stats())
+        if self.path.rstrip("/") == "/messages":
+            return self.send_json(200, list(self.server.messages))
+        return self.send_json(404, {"error": {"message": "Unknown path"}})
+
+    def do_POST(self):
+        content = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.simulate_latency()
+        if random.random() < self.server.error_rate:
+            self.server.record("errors")
+            return self.send_json(
+                500,
+                {"error": {"message": "Simulated error", "type": "OAuthException", "code": 131000}},
+            )
+
+        if self.path.endswith("/media"):
+            self.server.record("media")
+            return self.send_json(200, {"id": str(random.randint(10**15, 10**16))})
+
+        if not self.path.endswith("/messages"):
+            return self.send_json(404, {"error": {"message": "Unknown path"}})
+        try:
+            message = json.loads(content)
+            recipient = message["to"]
+        except (ValueError, KeyError):
+            self.server.record("invalid")
+            return self.send_json(
+                400, {"error": {"message": "Invalid parameter", "code": 100}}
+            )
+        message_id = f"wamid.fake.{uuid.uuid4().hex}"
+        self.server.record(
+            f"messages_{message.get('type')}",
+            {"id": message_id, "received_at": time.time(), **message},
+        )
+        self.send_json(
+            200,
+            {
+                "messaging_product": "whatsapp",
+                "contacts": [{"input": recipient, "wa_id": recipient}],
+                "messages": [{"id": message_id}],
+            },
+        )
+
+    def log_message(self, format, *args):
+        logging.debug(f"Fake Graph API: {format % args}")
@@ -0,0 +1,214 @@
+"""
+Webhook load test.
+
+Generates realistic webhook payloads of the WhatsApp Cloud API and replays concurrent
+conversations against `WhatsAppWebhook`, either in process or over HTTP. Run it against the
+fake Graph API (`python manage.py fake_graph_api`) so that the replies are not sent to WhatsApp.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import itertools
+import logging
+import time
+import uuid
+
+from django.utils import timezone
+import httpx
+from rest_framework.test import APIRequestFactory
+
+from .views import WhatsAppWebhook
+
+logging.getLogger(__name__)
+
+WEBHOOK_PATH = "/whatsapp/webhook/"
+
+
+def new_message_id() -> str:
+    return f"wamid.load.{uuid.uuid4().hex}"
+
+
+def text_message(sender: str, body: str) -> dict:
+    return {
+        "from": sender,
+        "id": new_message_id(),
+        "timestamp": str(int(time.time())),
+        "type": "text",
+        "text": {"body": body},
+    }
+
+
+def button_message(sender: str, payload: str) -> dict:
+    """Quick reply button of a template message"""
+    return {
+        "from": sender,
+        "id": new_message_id(),
+        "timestamp": str(int(time.time())),
+        "type": "button",
+        "button": {"payload": payload, "text": payload},
+    }
+
+
+def list_reply_message(sender: str, reply_id: str, title: str = "") -> dict:
+    return {
+        "from": sender,
+        "id": new_message_id(),
+        "timestamp": str(int(time.time())),
+        "type": "interactive",
+        "interactive": {
+            "type": "list_reply",
+            "list_reply": {"id": reply_id, "title": title or reply_id},
+        },
+    }
+
+
+def button_reply_message(sender: str, reply_id: str, title: str = "") -> dict:
+    return {
+        "from": sender,
+        "id": new_message_id(),
+        "timestamp": str(int(time.time())),
+        "type": "interactive",
+        "interactive": {
+            "type": "button_reply",
+            "button_reply": {"id": reply_id, "title": title or reply_id},
+        },
+    }
+
+
+def message_status(recipient: str, status: str, message_id: str = None) -> dict:
+    return {
+        "id": message_id or new_message_id(),
+        "recipient_id": recipient,
+        "status": status,
+        "timestamp": str(int(time.time())),
+    }
+
+
+def webhook_payload(
+    messages: list[dict] = None,
+    statuses: list[dict] = None,
+    phone_number_id: str = "load-test",
+) -> dict:
+    """
+    Function to build the webhook payload of a batch of messages and statuses.
+
+    :param `messages`: The received messages
+    :param `statuses`: The status updates of the sent messages
+    :param `phone_number_id`: The id of the business phone number
+    :return: The webhook payload as sent by Meta
+    """
+    value = {
+        "messaging_product": "whatsapp",
+        "metadata": {"display_phone_number": phone_number_id, "phone_number_id": phone_number_id},
+    }
+    if messages:
+        value["contacts"] = [
+            {"profile": {"name": "Load Test"}, "wa_id": sender}
+            for sender in dict.fromkeys(message["from"] for message in messages)
+        ]
+        value["messages"] = messages
+    if statuses:
+        value["statuses"] = statuses
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{"id": phone_number_id, "changes": [{"field": "messages", "value": value}]}],
+    }
+
+
+def get_load_test_senders(count: int, prefix: str = "9100") -> list[str]:
+    return [f"{prefix}{index:0{12 - len(prefix)}d}" for index in range(count)]
+
+
+def get_booking_conversation(sender: str, booking_date: str, confirm: bool = False) -> list[dict]:
+    """
+    Function to build the webhook payloads of a step by step booking conversation, every payload
+    also carries the statuses of the replies sent for the previous step.
+
+    :param `sender`: The number of the user
+    :param `booking_date`: The date replied from the date list in `DD-MM-YYYY` format
+    :param `confirm`: Whether to confirm the booking, this creates the booking and the payment order
+    :return: The webhook payloads in the order of the conversation
+    """
+    steps = [
+        text_message(sender, "Hi"),
+        button_reply_message(sender, "booking_session_start", "Book Ticket"),
+        list_reply_message(sender, booking_date),
+        text_message(sender, "2"),
+        text_message(sender, "1"),
+        text_message(sender, "1"),
+        text_message(sender, "0"),
+    ]
+    if confirm:
+        steps.append(button_reply_message(sender, "booking_session_confirm", "Confirm"))
+    payloads = [webhook_payload(messages=[steps[0]])]
+    for message in steps[1:]:
+        payloads.append(
+            webhook_payload(
+                messages=[message],
+                statuses=[
+                    message_status(sender, status) for status in ("sent", "delivered", "read")
+                ],
+            )
+        )
+    return payloads
+
+
+def get_default_booking_date() -> str:
+    return (timezone.localtime(timezone.now()).date() + timedelta(days=1)).strftime("%d-%m-%Y")
+
+
+def post_in_process(data: dict) -> int:
+    request = APIRequestFactory().post(WEBHOOK_PATH, data, format="json")
+    return WhatsAppWebhook.as_view()(request).status_code
+
+
+def run_conversation(post, payloads: list[dict], timings: list[float], statuses: list[int]) -> None:
+    for data in payloads:
+        start = time.perf_counter()
+        try:
+            status = post(data)
+        except Exception as e:
+            logging.exception(f"Load test request failed: {e}")
+            status = 0
+        timings.append(time.perf_counter() - start)
+        statuses.append(status)
+
+
+def run_webhook_load_test(
+    conversations: list[list[dict]],
+    concurrency: int,
+    url: str = None,
+) -> tuple[list[float], list[int], float]:
+    """
+    Function to replay the conversations concurrently against the webhook, the payloads of a
+    conversation are posted in order like WhatsApp does for a single user.
+
+    :param `conversations`: The webhook payloads of every conversation
+    :param `concurrency`: The number of conversations replayed at the same time
+    :param `url`: The webhook url to post to over HTTP, the view is called in process if not given
+    :return: tuple of the request timings in seconds, the response status codes and the elapsed seconds
+    """
+    timings, statuses = [], []
+    if url:
+        client = httpx.Client(timeout=30, limits=httpx.Limits(max_connections=concurrency))
+        post = lambda data: client.post(url, json=data).status_code
+    else:
+        client = None
+        post = post_in_process
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(
+                executor.map(
+                    run_conversation,
+                    itertools.repeat(post),
+                    conversations,
+                    itertools.repeat(timings),
+                    itertools.repeat(statuses),
+                )
+            )
+    finally:
+        if client:
+            client.close()
+    return timings, statuses, time.perf_counter() - start
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+import threading
+import time
+
+from common_config.benchmark import format_summary, summarize_timings
+from common_config.common import WA_ORDERED_SEND_GAP
+from whatsapp.fake_graph_api import FakeGraphAPIServer
+from whatsapp.utils import WhatsAppClient
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sequential and the pipelined delivery of a multi-part inquiry reply against "
+        "a local Graph API stub, reports the reply latency and whether the parts kept their order"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--parts", type=int, default=5)
+        parser.add_argument("--replies", type=int, default=20)
+        parser.add_argument("--latency-ms", type=float, default=400)
+        parser.add_argument("--jitter-ms", type=float, default=50)
+        parser.add_argument("--gap-ms", type=float, default=WA_ORDERED_SEND_GAP * 1000)
+
+    def handle(self, *args, **options):
+        server = FakeGraphAPIServer(
+            ("127.0.0.1", 0),
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        client = WhatsAppClient("benchmark", "benchmark", f"http://127.0.0.1:{server.server_port}/v19.0")
+        gap = options["gap_ms"] / 1000
+
+        modes = {
+            "sequential": lambda messages: [client.send_message(**message) for message in messages],
+            "pipelined": lambda messages: client.send_ordered(messages, gap),
+        }
+        try:
+            for name, send in modes.items():
+                timings, in_order = [], 0
+                start = time.perf_counter()
+                for reply in range(options["replies"]):
+                    recipient = f"{name}-{reply}"
+                    messages = [
+                        {"recipient_number": recipient, "message_type": "text", "type_data": {"body": str(part)}}
+                        for part in range(options["parts"])
+                    ]
+                    reply_start = time.perf_counter()
+                    send(messages)
+                    timings.append(time.perf_counter() - reply_start)
+                    received = [
+                        message["text"]["body"] for message in server.messages if message["to"] == recipient
+                    ]
+                    in_order += received == [str(part) for part in range(options["parts"])]
+
+                summary = summarize_timings(timings, time.perf_counter() - start)
+                summary["in_order"] = f"{in_order}/{options['replies']}"
+                self.stdout.write(format_summary(name, summary))
+        finally:
+            client.get_client().close()
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+import logging
+
+from whatsapp.fake_graph_api import FakeGraphAPIServer
+
+logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run a local stand-in of the WhatsApp Cloud API, point WA_GRAPH_API_URL to http://<host>:<port>/v19.0"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--latency-ms", type=float, default=50)
+        parser.add_argument("--jitter-ms", type=float, default=20)
+        parser.add_argument("--error-rate", type=float, default=0)
+
+    def handle(self, *args, **options):
+        server = FakeGraphAPIServer(
+            (options["host"], options["port"]),
+            latency_ms=options["latency_ms"],
+            jitter_ms=options["jitter_ms"],
+            error_rate=options["error_rate"],
+        )
+        self.stdout.write(
+            f"Fake Graph API listening on http://{options['host']}:{options['port']}/v19.0"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f"Fake Graph API stats: {server.get_stats()}")
@@ -0,0 +1,86 @@
+from collections import Counter
+from urllib.parse import urlparse
+import ipaddress
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from common_config.benchmark import format_summary, summarize_timings
+from common_config.common import WA_GRAPH_API_URL
+from whatsapp.load_test import (
+    get_booking_conversation,
+    get_default_booking_date,
+    get_load_test_senders,
+    run_webhook_load_test,
+)
+
+
+def is_local_url(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    if host == "localhost" or host.endswith(".localhost"):
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay concurrent booking conversations against the WhatsApp webhook and report the "
+        "latency and throughput. Point WA_GRAPH_API_URL to the fake Graph API and, outside of "
+        "prod, list the senders in WA_TEST_NUMBERS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--conversations", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=10)
+        parser.add_argument(
+            "--url",
+            help="Webhook url i.e. http://127.0.0.1:8000/whatsapp/webhook/, the view is called in process if not given",
+        )
+        parser.add_argument(
+            "--senders",
+            help="Comma separated sender numbers reused by the conversations, generated if not given",
+        )
+        parser.add_argument("--date", help="Booking date in DD-MM-YYYY format, defaults to tomorrow")
+        parser.add_argument(
+            "--confirm",
+            action="store_true",
+            help="Confirm the bookings, this creates bookings and payment orders",
+        )
+        parser.add_argument(
+            "--allow-real-api",
+            action="store_true",
+            help="Run even if WA_GRAPH_API_URL is not a local host, the replies are sent as real WhatsApp messages",
+        )
+
+    def handle(self, *args, **options):
+        if not is_local_url(WA_GRAPH_API_URL) and not options["allow_real_api"]:
+            raise CommandError(
+                f"WA_GRAPH_API_URL is {WA_GRAPH_API_URL}, the load test would send real WhatsApp "
+                "messages. Point it to the fake Graph API or pass --allow-real-api."
+            )
+        if options["senders"]:
+            senders = options["senders"].split(",")
+        else:
+            senders = get_load_test_senders(options["conversations"])
+        booking_date = options["date"] or get_default_booking_date()
+        conversations = [
+            get_booking_conversation(senders[index % len(senders)], booking_date, options["confirm"])
+            for index in range(options["conversations"])
+        ]
+        if len(senders) < len(conversations):
+            self.stdout.write(
+                self.style.WARNING(
+                    "Conversations share senders, their steps interleave in the booking sessions."
+                )
+            )
+
+        timings, statuses, elapsed = run_webhook_load_test(
+            conversations, options["concurrency"], options["url"]
+        )
+        close_old_connections()
+
+        self.stdout.write(format_summary("webhook", summarize_timings(timings, elapsed)))
+        self.stdout.write(f"status codes: {dict(Counter(statuses))}")
@@ -3,18 +3,27 @@ from decimal import Decimal
 from django.utils import timezone
 from django.core.cache import cache
 from django.db import transaction
-import requests
+import httpx
+import json
 import os
+import re
+import time
 import logging
 import django_rq
 from django_rq.queues import get_queue
+from rq import Retry, get_current_job
+from rq.job import Job
 
 from bookings.models import Booking, Payment
-from common_config.common import ADVANCE_PER_PERSON_AMOUNT_FOR_BOOKING, HOST_URL
+from common_config.common import ADVANCE_PER_PERSON_AMOUNT_FOR_BOOKING, HOST_URL, WA_BOOKING_FLOW_ID, WA_BOOKING_FLOW_SCREEN, WA_INQUIRY_DELIVERY_MODE, WHATSAPP_TICKET_FORMAT
 from whatsapp.utils import WhatsAppClient
-from management_core.models import TicketPrice, WhatsAppInquiryMessage
+from whatsapp.outbox import BOOKING_TICKET_MESSAGE_TYPE, queue_outbound_message, queue_outbound_messages
+from whatsapp.messages.payloads import get_cached_booking_dates, get_reply_payloads
+from whatsapp.messages.session import delete_booking_session, start_booking_session, update_booking_session
+from management_core.audience import normalize_whatsapp_number
+from management_core.models import TicketPrice, WhatsAppOptOut
 from bookings.utils import create_or_update_booking, create_razorpay_order, razorpay_client
-from bookings.ticket.utils import generate_ticket_pdf
+from bookings.ticket.utils import generate_ticket, generate_ticket_pdf, get_or_create_ticket, get_ticket_size, get_ticket_url
 
 logging.getLogger(__name__)
 
@@ -22,47 +31,31 @@ LOGO_URL = os.environ.get(
     "LOGO_URL", "https://www.shreeganeshafunworld.com/images/logo.png"
 )
 USE_TEMPLATE_MESSAGE_BOOKING_TICKET = int(os.environ.get("USE_TEMPLATE_MESSAGE_BOOKING_TICKET", 0)) == 1
+TICKET_RENDER_RETRY = Retry(max=3, interval=[10, 30, 60])
+TICKET_DELIVERY_RETRY = Retry(max=5, interval=[5, 15, 30, 60, 120])
 
 
 whatsapp_config = WhatsAppClient(
     os.environ.get("WA_SECRET_KEY"),
     os.environ.get("WA_PHONE_ID"),
 )
-client = whatsapp_config.get_client()
 
-def delete_booking_session(sender: str):
-    cache.delete(f"booking_session_{sender}")
+def get_available_booking_dates() -> list:
+    """Function to get the next dates open for the WhatsApp bookings, a list message has at most 10 rows."""
+    return get_cached_booking_dates()
 
 
-def send_date_list_message(recipient_number: str, context: dict|None) -> requests.Response:
+def send_date_list_message(recipient_number: str, context: dict|None) -> httpx.Response:
     """
     Function to send date list message to the user.
 
     :param `recipient_number`: The number to which message is to be sent
     """
-    available_dates = list(TicketPrice.objects.filter(date__gt=timezone.localtime(timezone.now()).date()).order_by("date")[:10].values_list("date", flat=True))
+    payloads = get_reply_payloads()
+    available_dates = payloads["booking_dates"]
     logging.info(f"Available Dates: {available_dates}")
     
-    response_payload = {
-        "type": "list",
-        "body": {"text": "Please select date for booking"},
-        "action": {
-            "button": "Select Date",
-            "sections": [
-                {
-                    "title": "Available Dates",
-                    "rows": [
-                        {
-                            "id": date.strftime("%d-%m-%Y"),
-                            "title": date.strftime("%d %b %Y"),
-                            # "description": "",
-                        }
-                        for date in available_dates
-                    ],
-                },
-            ],
-        },
-    }
+    response_payload = payloads["date_list"]
     if available_dates:
         res = whatsapp_config.send_message(
             recipient_number, "interactive", response_payload, context
@@ -75,7 +68,7 @@ def send_date_list_message(recipient_number: str, context: dict|None) -> request
     return res
 
 
-def send_welcome_message(recipient_number: str) -> requests.Response:
+def send_welcome_message(recipient_number: str) -> httpx.Response:
     """
     Function to send welcome message to the user.
 
@@ -156,7 +149,7 @@ def confirm_razorpay_payment(payment_link_id: str, available_tries: int = 3) ->
                 payment.booking.received_amount += Decimal(payment.amount)
                 payment.booking.save()
                 payment.save()
-            handle_sending_booking_ticket(booking.wa_number, "", None, booking, True)
+                queue_booking_ticket(booking)
             return "Payment confirmed successfully"
         RETRY_AFTER = [1,2,3,5,7]
         if available_tries > 0:
@@ -210,206 +203,300 @@ def handle_booking_session_confirm(active_session: dict, sender: str, msg_contex
             msg_context
         )
 
-def handle_booking_session_messages(
-    sender: str, message_type: str, payload: str, active_session: dict, msg_context: dict | None
-) -> requests.Response | None:
+def parse_booking_date(payload: str) -> str:
+    date = timezone.datetime.strptime(payload.strip(), "%d-%m-%Y").date()
+    if date - timezone.localtime(timezone.now()).date() <= timedelta(days=0):
+        raise ValueError(f"Booking date {payload} is not in the future")
+    return date.strftime("%d-%m-%Y")
+
+
+def parse_person_count(payload: str) -> int:
+    if not payload.strip().isnumeric():
+        raise ValueError(f"Invalid number of persons: {payload}")
+    return int(payload)
+
+
+def validate_booking_persons(session: dict) -> str | None:
+    """
+    Function to validate the persons of the booking session.
+
+    :return: The reason the booking is not allowed or None if it is valid
+    """
+    if session["adult_female"] <= 0 and session["child"] <= 0:
+        return "At least one female adult or child is required for booking. Send Hi to start again."
+    if session["adult_male"] <= 0 and session["adult_female"] <= 0:
+        return "At least one adult is required for booking. Send Hi to start again."
+    return None
+
+
+def send_booking_session_date_prompt(sender: str, session: dict, msg_context: dict | None) -> httpx.Response:
+    return send_date_list_message(sender, msg_context)
+
+
+def send_booking_session_summary(sender: str, session: dict, msg_context: dict | None) -> httpx.Response:
+    return whatsapp_config.send_message(
+        sender,
+        "interactive",
+        {
+            "type": "button",
+            "body": {
+            "text": f"Your booking details are as follows:\n*Date*: {session.get("date")}\n*Adults (Male)*: {session.get("adult_male")}\n*Adults (Female)*: {session.get("adult_female")}\n*Children*: {session.get("child")}\n*Infants*: {session.get("infant")}",
+            },
+            "action": {
+            "buttons": [
+                {
+                "type": "reply",
+                "reply": {
+                    "id": "booking_session_confirm",
+                    "title": "Confirm Booking"
+                }
+                }
+            ]
+            }
+        },
+        msg_context
+    )
+
+
+def confirm_booking_session(sender: str, session: dict, msg_context: dict | None) -> None:
+    # Create booking instance and generate razorpay order for the same.
+    queue = django_rq.get_queue("high")
+    queue.enqueue(
+        handle_booking_session_confirm,
+        session,
+        sender,
+        msg_context
+    )
+
+
+BOOKING_SESSION_START_STATE = "date"
+BOOKING_TEXT_PATTERN = re.compile(
+    r"^book\s+(\d{1,2}-\d{1,2}-\d{4})\s+(\d+)\s+(\d+)\s+(\d+)(?:\s+(\d+))?\s*$", re.IGNORECASE
+)
+BOOKING_TEXT_USAGE = (
+    "To book in one message send:\n*book <date> <adults male> <adults female> <children> <infants>*\n"
+    "For example *book DD-MM-YYYY 2 2 1 0* with the visit date. Send Hi to book step by step."
+)
+# Booking conversation states, a state with `parse` stores the parsed answer in the session field
+# named after the state and moves to `next`, a state with `actions` runs the action of the payload.
+# `prompt` is the message sent when the session enters the state.
+BOOKING_SESSION_STATES = {
+    "date": {
+        "message_type": "interactive",
+        "prompt": send_booking_session_date_prompt,
+        "parse": parse_booking_date,
+        "error": "Please select a valid date for booking.",
+        "next": "adult_male",
+    },
+    "adult_male": {
+        "message_type": "text",
+        "prompt": "Enter total number of *Adults (Male)* age *more than 10 years*.",
+        "parse": parse_person_count,
+        "error": "Enter a valid number of Male Adults (it's value can only be 0 or more)",
+        "next": "adult_female",
+    },
+    "adult_female": {
+        "message_type": "text",
+        "prompt": "Enter total number of *Adults (Female)* age *more than 10 years*.",
+        "parse": parse_person_count,
+        "error": "Please enter a valid number of Female Adults (it's value can only be 0 or more)",
+        "next": "child",
+    },
+    "child": {
+        "message_type": "text",
+        "prompt": "Enter total number of *Children* age between *5 - 10 years*.",
+        "parse": parse_person_count,
+        "error": "Please enter a valid number of Child (it's value can only be 0 or more)",
+        "next": "infant",
+    },
+    "infant": {
+        "message_type": "text",
+        "prompt": "Enter total number of *Infants* age between *0 - 5 years*.",
+        "parse": parse_person_count,
+        "validate": validate_booking_persons,
+        "error": "Please enter a valid number of Infants (it's value can only be 0 or more)",
+        "next": "confirm",
+    },
+    "confirm": {
+        "message_type": "interactive",
+        "prompt": send_booking_session_summary,
+        "actions": {"booking_session_confirm": confirm_booking_session},
+    },
+}
+
+
+def parse_booking_form(date: str, adult_male: str, adult_female: str, child: str, infant: str) -> dict:
+    """
+    Function to parse all the answers of the booking conversation submitted at once.
+
+    :return: The booking session fields
+    :raises ValueError: If any of the values is invalid
+    """
+    return {
+        "date": parse_booking_date(str(date)),
+        "adult_male": parse_person_count(str(adult_male)),
+        "adult_female": parse_person_count(str(adult_female)),
+        "child": parse_person_count(str(child)),
+        "infant": parse_person_count(str(infant)),
+    }
+
+
+def validate_booking_form(session: dict) -> str | None:
     """
-    Function to handle booking session messages.
+    Function to validate the booking submitted at once, the dates of the step by step booking
+    are picked from the available dates.
+
+    :return: The reason the booking is not allowed or None if it is valid
+    """
+    error = validate_booking_persons(session)
+    if error:
+        return error
+    date = timezone.datetime.strptime(session["date"], "%d-%m-%Y").date()
+    if not TicketPrice.objects.filter(date=date).exists():
+        return f"Bookings are not open for {date.strftime("%d %b %Y")}. Send Hi to see the available dates."
+    return None
+
+
+def handle_booking_text_message(sender: str, payload: str, msg_context: dict | None) -> httpx.Response:
+    """
+    Function to handle a booking sent in a single text message i.e. `book 21-10-2024 2 1 0 1`.
+
+    The booking skips the step by step conversation and the user only has to confirm the summary.
 
     :param `sender`: The sender of the message
-    :param `message_type`: The type of the message i.e. `text`, `button`, `interactive`
-    :param `payload`: The payload of the message
-    :param `active_session`: The active booking session of the user
+    :param `payload`: The text of the message
     :param `msg_context`: The context of the message i.e. for replying to msg
     """
-
-    if payload == "booking_session_cancel":
+    match = BOOKING_TEXT_PATTERN.match(payload)
+    try:
+        if not match:
+            raise ValueError(f"Invalid booking message: {payload}")
+        session = parse_booking_form(*match.groups(default="0"))
+    except ValueError:
+        return whatsapp_config.send_message(
+            sender, "text", {"body": BOOKING_TEXT_USAGE}, msg_context
+        )
+    error = validate_booking_form(session)
+    if error:
         delete_booking_session(sender)
+        return whatsapp_config.send_message(sender, "text", {"body": error}, msg_context)
+
+    start_booking_session(sender, "confirm", **session)
+    return send_booking_session_prompt(
+        sender, "confirm", {"wa_number": sender, **session}, msg_context
+    )
+
+
+def handle_booking_flow_reply(sender: str, response_json: str, msg_context: dict | None) -> httpx.Response | None:
+    """
+    Function to handle the submission of the booking WhatsApp Flow.
+
+    The user reviews the booking on the Flow form itself, so the submission is confirmed directly.
+
+    :param `sender`: The sender of the message
+    :param `response_json`: The `response_json` of the flow reply
+    :param `msg_context`: The context of the message i.e. for replying to msg
+    """
+    try:
+        response = json.loads(response_json)
+        session = parse_booking_form(
+            response["date"],
+            response["adult_male"],
+            response["adult_female"],
+            response["child"],
+            response.get("infant", 0),
+        )
+    except (ValueError, KeyError, TypeError) as e:
+        logging.warning(f"Invalid booking flow reply from {sender}: {response_json}, {e}")
         return whatsapp_config.send_message(
             sender,
             "text",
-            {"body": "Booking session cancelled. Please send Hi to start again."},
-            msg_context
-        )
-        
-    # Handle the logic after booking is confirmed i.e. create booking instance and generate razorpay order for the same.
-    if message_type == "interactive" and payload == "booking_session_confirm":
-        # Create booking
-        queue = django_rq.get_queue("high")
-        queue.enqueue(
-            handle_booking_session_confirm,
-            active_session,
-            sender,
-            msg_context
+            {"body": "Invalid booking details. Please send Hi to start again."},
+            msg_context,
         )
-        return
-        
+    error = validate_booking_form(session)
+    if error:
+        return whatsapp_config.send_message(sender, "text", {"body": error}, msg_context)
+    return confirm_booking_session(sender, {"wa_number": sender, **session}, msg_context)
 
-    if active_session.get("date") is None:
-        if message_type == "interactive":
-            if timezone.datetime.strptime(payload, "%d-%m-%Y").date() - timezone.localtime(timezone.now()).date() <= timedelta(days=0):
-                return whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {"body": "Please select a valid date for booking."},
-                    msg_context
-                )
-            active_session["date"] = payload
-            cache.set(f"booking_session_{sender}", active_session, timeout=300)
-            return whatsapp_config.send_message(
-                sender,
-                "text",
-                {"body": f"Enter total number of *Adults (Male)* age *more than 10 years*."},
-                msg_context
-            )
-    elif active_session.get("adult_male") is None:
-        if message_type == "text":
-            value = payload.isnumeric()
-            if value:
-                value = int(payload)
-                if value >= 0:
-                    active_session["adult_male"] = value
-                    cache.set(f"booking_session_{sender}", active_session, timeout=300)
-                    return whatsapp_config.send_message(
-                        sender,
-                        "text",
-                        {
-                            "body": f"Enter total number of *Adults (Female)* age *more than 10 years*."
-                        },
-                        msg_context
-                    )
-            else:
-                return whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {
-                        "body": "Enter a valid number of Male Adults (it's value can only be 0 or more)",
-                    },
-                    msg_context
-                )
-
-    elif active_session.get("adult_female") is None:
-        if message_type == "text":
-            value = payload.isnumeric()
-            if value:
-                value = int(payload)
-                if value >= 0:
-                    active_session["adult_female"] = value
-                    cache.set(f"booking_session_{sender}", active_session, timeout=300)
-                    return whatsapp_config.send_message(
-                        sender,
-                        "text",
-                        {
-                            "body": f"Enter total number of *Children* age between *5 - 10 years*.",
-                        },
-                        msg_context
-                    )
-            else:
-                return whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {
-                        "body": "Please enter a valid number of Female Adults (it's value can only be 0 or more)",
-                    },
-                    msg_context
-                )
-
-    elif active_session.get("child") is None:
-        if message_type == "text":
-            value = payload.isnumeric()
-            if value:
-                value = int(payload)
-                if value >= 0:
-                    active_session["child"] = value
-                    cache.set(f"booking_session_{sender}", active_session, timeout=300)
-                    return whatsapp_config.send_message(
-                        sender,
-                        "text",
-                        {
-                            "body": f"Enter total number of *Infants* age between *0 - 5 years*.",
-                        },
-                        msg_context
-                    )
-            else:
-                return whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {
-                        "body": "Please enter a valid number of Child (it's value can only be 0 or more)"
-                    },
-                    msg_context
-                )
-
-    elif active_session.get("infant") is None:
-        if message_type == "text":
-            value = payload.isnumeric()
-            if value:
-                value = int(payload)
-                if value >= 0:
-                    # Handle the validation logic for booking here
-                    if (
-                        active_session["adult_female"] <= 0
-                        and active_session["child"] <= 0
-                    ):
-                        delete_booking_session(sender)
-                        return whatsapp_config.send_message(
-                            sender,
-                            "text",
-                            {
-                                "body": "At least one female adult or child is required for booking. Send Hi to start again.",
-                            },
-                            msg_context
-                        )
-
-                    if (
-                        active_session["adult_male"] <= 0
-                        and active_session["adult_female"] <= 0
-                    ):
-                        delete_booking_session(sender)
-                        return whatsapp_config.send_message(
-                            sender,
-                            "text",
-                            {
-                                "body": "At least one adult is required for booking. Send Hi to start again.",
-                            },
-                            msg_context
-                        )
-
-                    active_session["infant"] = value
-                    cache.set(f"booking_session_{sender}", active_session, timeout=300)
-                    return whatsapp_config.send_message(
-                        sender,
-                        "interactive",
-                        {
-                            "type": "button",
-                            "body": {
-                            "text": f"Your booking details are as follows:\n*Date*: {active_session.get("date")}\n*Adults (Male)*: {active_session.get("adult_male")}\n*Adults (Female)*: {active_session.get("adult_female")}\n*Children*: {active_session.get("child")}\n*Infants*: {active_session.get("infant")}",
-                            },
-                            "action": {
-                            "buttons": [
+
+def send_booking_flow_message(sender: str, msg_context: dict | None) -> httpx.Response:
+    """
+    Function to send the booking WhatsApp Flow `WA_BOOKING_FLOW_ID` which collects the date and
+    all the person counts in a single submission.
+
+    The first screen `WA_BOOKING_FLOW_SCREEN` gets the available dates as `dates` data.
+
+    :param `sender`: The number of the user
+    :param `msg_context`: The context of the message i.e. for replying to msg
+    """
+    available_dates = get_available_booking_dates()
+    if not available_dates:
+        return whatsapp_config.send_message(
+            sender, "text", {"body": "No dates available for booking."}, msg_context
+        )
+    return whatsapp_config.send_message(
+        sender,
+        "interactive",
+        {
+            "type": "flow",
+            "body": {"text": "Fill in your visit date and the number of visitors to book your tickets."},
+            "action": {
+                "name": "flow",
+                "parameters": {
+                    "flow_message_version": "3",
+                    "flow_token": f"booking_{sender}",
+                    "flow_id": WA_BOOKING_FLOW_ID,
+                    "flow_cta": "Book Tickets",
+                    "flow_action": "navigate",
+                    "flow_action_payload": {
+                        "screen": WA_BOOKING_FLOW_SCREEN,
+                        "data": {
+                            "dates": [
                                 {
-                                "type": "reply",
-                                "reply": {
-                                    "id": "booking_session_confirm",
-                                    "title": "Confirm Booking"
-                                }
+                                    "id": date.strftime("%d-%m-%Y"),
+                                    "title": date.strftime("%d %b %Y"),
                                 }
-                            ]
-                            }
+                                for date in available_dates
+                            ],
                         },
-                        msg_context
-                    )
-            else:
-                return whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {
-                        "body": "Please enter a valid number of Male Adults (it's value can only be 0 or more)"
                     },
-                    msg_context
-                )
+                },
+            },
+        },
+        msg_context,
+    )
+
+
+def send_booking_session_prompt(sender: str, state: str, session: dict, msg_context: dict | None) -> httpx.Response:
+    prompt = BOOKING_SESSION_STATES[state]["prompt"]
+    if callable(prompt):
+        return prompt(sender, session, msg_context)
+    return whatsapp_config.send_message(sender, "text", {"body": prompt}, msg_context)
 
-    # delete_booking_session(sender)
+
+def start_whatsapp_booking_session(sender: str, msg_context: dict | None) -> httpx.Response:
+    """
+    Function to start the booking conversation of the user.
+
+    With `WA_BOOKING_FLOW_ID` set the booking form is sent as a WhatsApp Flow, the step by step
+    conversation is the fallback when the flow can not be sent.
+
+    :param `sender`: The number of the user
+    :param `msg_context`: The context of the message i.e. for replying to msg
+    """
+    if WA_BOOKING_FLOW_ID:
+        response = send_booking_flow_message(sender, msg_context)
+        if response.is_success:
+            return response
+        logging.error(f"Booking flow not sent to {sender}: {response.text}")
+    start_booking_session(sender, BOOKING_SESSION_START_STATE)
+    return send_booking_session_prompt(
+        sender, BOOKING_SESSION_START_STATE, {"wa_number": sender}, msg_context
+    )
+
+
+def send_booking_session_invalid_message(sender: str, msg_context: dict | None) -> httpx.Response:
     return whatsapp_config.send_message(
         sender,
         "interactive",
@@ -434,60 +521,246 @@ def handle_booking_session_messages(
     )
 
 
-def send_booking_ticket(booking: Booking, send_ticket_directly: bool=False) -> str:
+def handle_booking_session_messages(
+    sender: str, message_type: str, payload: str, active_session: dict, msg_context: dict | None
+) -> httpx.Response | None:
     """
-    Function to send booking ticket to the user.
+    Function to handle booking session messages with the `BOOKING_SESSION_STATES` state machine.
 
-    :param `booking`: The booking instance
-    :param `booking_id`: The booking id
+    :param `sender`: The sender of the message
+    :param `message_type`: The type of the message i.e. `text`, `button`, `interactive`
+    :param `payload`: The payload of the message
+    :param `active_session`: The active booking session of the user
+    :param `msg_context`: The context of the message i.e. for replying to msg
     """
+
+    if payload == "booking_session_cancel":
+        delete_booking_session(sender)
+        return whatsapp_config.send_message(
+            sender,
+            "text",
+            {"body": "Booking session cancelled. Please send Hi to start again."},
+            msg_context
+        )
+
+    state = active_session.get("state")
+    step = BOOKING_SESSION_STATES.get(state)
+    if step is None or message_type != step["message_type"]:
+        return send_booking_session_invalid_message(sender, msg_context)
+
+    if "actions" in step:
+        action = step["actions"].get(payload)
+        if action is None:
+            return send_booking_session_invalid_message(sender, msg_context)
+        return action(sender, active_session, msg_context)
+
     try:
-        booking_id = str(booking.id)
-        pdf_path = generate_ticket_pdf(booking_id)
-        active_conversation = cache.get(f"active_{booking.wa_number.strip()}")
-        if active_conversation or (not USE_TEMPLATE_MESSAGE_BOOKING_TICKET):
+        value = step["parse"](payload)
+    except ValueError:
+        return whatsapp_config.send_message(
+            sender, "text", {"body": step["error"]}, msg_context
+        )
+
+    active_session[state] = value
+    error = step["validate"](active_session) if "validate" in step else None
+    if error:
+        delete_booking_session(sender)
+        return whatsapp_config.send_message(sender, "text", {"body": error}, msg_context)
+
+    update_booking_session(sender, step["next"], **{state: value})
+    return send_booking_session_prompt(sender, step["next"], active_session, msg_context)
+
+
+def uses_booking_ticket_template(booking: Booking) -> bool:
+    """
+    Whether the ticket is to be sent with the approved template message, it is used when the
+    user has no active conversation and the template always sends the pdf ticket.
+
+    :param `booking`: The booking instance
+    """
+    active_conversation = cache.get(f"active_{booking.wa_number.strip()}")
+    return bool(USE_TEMPLATE_MESSAGE_BOOKING_TICKET and not active_conversation)
+
+
+def get_booking_ticket_messages(booking: Booking, ticket_url: str, ticket_format: str="pdf") -> list[dict]:
+    """
+    Function to get the messages which deliver the generated booking ticket to the user.
+
+    :param `booking`: The booking instance
+    :param `ticket_url`: Public url of the generated ticket
+    :param `ticket_format`: Format of the generated ticket, must be `pdf` when the template message is used
+    :return: The keyword arguments of `send_message` for every message in the order they are sent
+    """
+    booking_id = str(booking.id)
+    if not uses_booking_ticket_template(booking):
+        caption = f"Your booking ticket is attached above for date: {booking.date.strftime("%a, %d %b %Y")}."
+        if ticket_format == "pdf":
             payload = {
-                "link": pdf_path,
+                "link": ticket_url,
                 "filename": f"{booking_id}.pdf",
-                "caption": f"Your booking ticket is attached above for date: {booking.date.strftime("%a, %d %b %Y")}.",    
+                "caption": caption,
             }
-            res = whatsapp_config.send_message(booking.wa_number, "document", payload)
-        else:
-            whatsapp_config.send_message(booking.wa_number, "template", {"name": "booking_ticket_gate_confirm", "language": {"code": "en"}, "components": []})
-            payload = {
-                "name": "booking_ticket",
-                "language": {"code": "en"},
-                "components": [
+            return [{"recipient_number": booking.wa_number, "message_type": "document", "type_data": payload}]
+        payload = {
+            "link": ticket_url,
+            "caption": caption,
+        }
+        return [{"recipient_number": booking.wa_number, "message_type": "image", "type_data": payload}]
+
+    payload = {
+        "name": "booking_ticket",
+        "language": {"code": "en"},
+        "components": [
+            {
+                "type": "header",
+                "parameters": [
                     {
-                        "type": "header",
-                        "parameters": [
-                            {
-                                "type": "document",
-                                "document": {
-                                    "link": pdf_path,
-                                    "filename": f"{booking_id}.pdf",
-                                },
-                            }
-                        ],
-                    },
+                        "type": "document",
+                        "document": {
+                            "link": ticket_url,
+                            "filename": f"{booking_id}.pdf",
+                        },
+                    }
+                ],
+            },
+            {
+                "type": "body",
+                "parameters": [
                     {
-                        "type": "body",
-                        "parameters": [
-                            {
-                                "type": "text",
-                                "text": booking.date.strftime("%a, %d %b %Y"),
-                            }
-                        ],
-                    },
+                        "type": "text",
+                        "text": booking.date.strftime("%a, %d %b %Y"),
+                    }
                 ],
-            }
-            res = whatsapp_config.send_message(booking.wa_number, "template", payload)
+            },
+        ],
+    }
+    return [
+        {"recipient_number": booking.wa_number, "message_type": "template", "type_data": {"name": "booking_ticket_gate_confirm", "language": {"code": "en"}, "components": []}},
+        {"recipient_number": booking.wa_number, "message_type": "template", "type_data": payload},
+    ]
+
+
+def deliver_booking_ticket(booking: Booking, ticket_url: str, ticket_format: str="pdf") -> httpx.Response:
+    """
+    Function to send already generated booking ticket to the user.
+
+    :param `booking`: The booking instance
+    :param `ticket_url`: Public url of the generated ticket
+    :param `ticket_format`: Format of the generated ticket, must be `pdf` when the template message is used
+    :return: Response of the last sent message
+    """
+    for message in get_booking_ticket_messages(booking, ticket_url, ticket_format):
+        res = whatsapp_config.send_message(**message)
+    return res
+
+
+def send_booking_ticket(booking: Booking, send_ticket_directly: bool=False, ticket_format: str=WHATSAPP_TICKET_FORMAT) -> str:
+    """
+    Function to generate and send booking ticket to the user in the calling process.
+
+    :param `booking`: The booking instance
+    :param `booking_id`: The booking id
+    :param `ticket_format`: `pdf` to send the ticket as document or `png`/`jpeg` to send it as image,
+        the approved template message always sends the pdf
+    """
+    try:
+        if uses_booking_ticket_template(booking):
+            ticket_format = "pdf"
+        ticket_url = generate_ticket(str(booking.id), ticket_format)
+        res = deliver_booking_ticket(booking, ticket_url, ticket_format)
         return f"Response: {res.json()}"
     except Exception as e:
         logging.exception(e)
         return f"Error: {str(e.args[0])}"
 
 
+def render_booking_ticket_job(booking_id: str, ticket_format: str=WHATSAPP_TICKET_FORMAT) -> dict:
+    """
+    First stage of the ticket pipeline, renders the ticket on the `tickets` queue.
+
+    :param `booking_id`: The booking id
+    :param `ticket_format`: Format of the ticket to render, `pdf` is used for the template message
+
+    :return: dict with the `url` and `format` of the ticket, passed to the delivery job
+    """
+    start = time.perf_counter()
+    booking = Booking.objects.get(id=booking_id)
+    if uses_booking_ticket_template(booking):
+        ticket_format = "pdf"
+    file_name, cached = get_or_create_ticket(booking_id, ticket_format)
+    job = get_current_job()
+    if job:
+        job.meta.update({
+            "render_seconds": round(time.perf_counter() - start, 3),
+            "ticket_cached": cached,
+            "ticket_size": get_ticket_size(file_name),
+        })
+        job.save_meta()
+    return {"url": get_ticket_url(file_name), "format": ticket_format}
+
+
+def deliver_booking_ticket_job(booking_id: str) -> str:
+    """
+    Second stage of the ticket pipeline, queues the ticket rendered by the job it depends on in
+    the outbox which retries the send until WhatsApp accepts it.
+
+    :param `booking_id`: The booking id
+    """
+    job = get_current_job()
+    ticket = job.dependency.return_value() if job and job.dependency else None
+    booking = Booking.objects.get(id=booking_id)
+    if not ticket or (ticket["format"] != "pdf" and uses_booking_ticket_template(booking)):
+        # The conversation expired after rendering, the template message needs the pdf
+        ticket = {"url": generate_ticket_pdf(booking_id), "format": "pdf"}
+    outbound_messages = queue_outbound_messages(get_booking_ticket_messages(booking, ticket["url"], ticket["format"]))
+    outbound_ids = [message.id for message in outbound_messages]
+    if job:
+        job.meta.update({"outbound_message_ids": outbound_ids})
+        job.save_meta()
+    return f"Queued outbound messages: {outbound_ids}"
+
+
+def enqueue_booking_ticket(booking_id: str, ticket_format: str=WHATSAPP_TICKET_FORMAT) -> tuple[Job, Job]:
+    """
+    Enqueue the ticket pipeline of the booking, the ticket is rendered on the `tickets` queue and
+    the delivery job on the `high` queue runs once the render is done.
+
+    :param `booking_id`: The booking id
+    :param `ticket_format`: Format of the ticket to send
+
+    :return: render and delivery jobs
+    """
+    render_job = django_rq.get_queue("tickets").enqueue(
+        render_booking_ticket_job,
+        str(booking_id),
+        ticket_format,
+        retry=TICKET_RENDER_RETRY,
+    )
+    delivery_job = django_rq.get_queue("high").enqueue(
+        deliver_booking_ticket_job,
+        str(booking_id),
+        depends_on=render_job,
+        retry=TICKET_DELIVERY_RETRY,
+    )
+    return render_job, delivery_job
+
+
+def queue_booking_ticket(booking: Booking, ticket_format: str=WHATSAPP_TICKET_FORMAT):
+    """
+    Save the ticket of the booking in the outbox, the outbox drain enqueues its ticket pipeline.
+    Call it in the transaction of the payment so that the ticket is sent even if Redis is down
+    when the payment is committed.
+
+    :param `booking`: The booking
+    :param `ticket_format`: Format of the ticket to send
+    """
+    return queue_outbound_message(
+        booking.wa_number,
+        BOOKING_TICKET_MESSAGE_TYPE,
+        {"booking_id": str(booking.id), "ticket_format": ticket_format},
+    )
+
+
 def send_my_bookings_message(sender: str, msg_context: dict|None=None):
     """
     Function to send my bookings message to the user.
@@ -540,33 +813,51 @@ def handle_sending_booking_ticket(sender: str, booking_id: str, msg_context: dic
     if not booking:
         booking = Booking.objects.filter(id=booking_id).first()
     if booking:
-        res = send_booking_ticket(booking)
+        render_job, delivery_job = enqueue_booking_ticket(booking.id)
+        res = f"Ticket jobs enqueued: render {render_job.id}, delivery {delivery_job.id}"
     else:
         res = whatsapp_config.send_message(sender, "text", {"body": "No booking found with given id."}, msg_context)
         res.json()
     return res
 
 
+def handle_promotional_opt_out_message(sender: str, opt_out: bool, msg_context: dict|None) -> httpx.Response:
+    """
+    Function to opt the user out of or back in to the promotional messages.
+
+    :param `sender`: The number of the user
+    :param `opt_out`: True to stop the promotional messages, False to receive them again
+    :param `msg_context`: The context of the message i.e. for replying to msg
+    """
+    number = normalize_whatsapp_number(sender)
+    if opt_out:
+        WhatsAppOptOut.objects.get_or_create(number=number, defaults={"reason": "whatsapp"})
+        body = "You will not receive promotional messages anymore. Send *START* to receive them again."
+    else:
+        WhatsAppOptOut.objects.filter(number=number).delete()
+        body = "You will receive our promotional messages again. Send *STOP* to stop them."
+    return whatsapp_config.send_message(sender, "text", {"body": body}, msg_context)
+
+
 def handle_whatsapp_inquiry_message(sender: str) -> None:
     """
-    Function to handle whatsapp inquiry message.
+    Function to handle whatsapp inquiry message, the messages are sent in their `sent_order`.
 
     :param `sender`: The number to which message is to be sent
     """
-    inquiry_message = WhatsAppInquiryMessage.objects.all()
-    res = []
-    for msg in inquiry_message:
-        if msg.type == "text":
-            re = whatsapp_config.send_message(sender, "text", {"preview_url": True, "body": msg.message_text})
-            res.append(re)
-        elif msg.type == "image_only":
-            re = whatsapp_config.send_message(sender, "image", {"link": f"{HOST_URL}{msg.document.url}"})
-            res.append(re)
-        elif msg.type == "image_with_text":
-            re = whatsapp_config.send_message(sender, "image", {"link": f"{HOST_URL}{msg.document.url}", "caption": msg.message_text})
-            res.append(re)
+    messages = [
+        {"recipient_number": sender, **message}
+        for message in get_reply_payloads()["inquiry_messages"]
+    ]
+    if WA_INQUIRY_DELIVERY_MODE == "pipelined":
+        res = whatsapp_config.send_ordered(messages)
+    else:
+        res = [whatsapp_config.send_message(**message) for message in messages]
     logging.info(f"re: {str(res)}")
-    return [r.json() for r in res]
+    for r in res:
+        if isinstance(r, Exception):
+            logging.error(f"Inquiry message to {sender} failed: {r}", exc_info=r)
+    return [r.json() for r in res if not isinstance(r, Exception)]
             
     
 def send_review_message(recipient_number: str, review_url: str) -> None:
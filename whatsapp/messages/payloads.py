@@ -0,0 +1,113 @@
+"""
+Cached payloads of the WhatsApp replies which are the same for every user.
+
+The available booking dates, the date list message and the inquiry messages are built once per day
+and stored in the cache as a JSON string, so the reply path does not query the database. The
+`TicketPrice` and `WhatsAppInquiryMessage` signals of `management_core.signals` rebuild the cache
+when the admins edit them.
+"""
+
+from django.core.cache import cache
+from django.utils import timezone
+from datetime import date
+import logging
+import json
+
+from common_config.common import HOST_URL
+from management_core.models import TicketPrice, WhatsAppInquiryMessage
+
+logging.getLogger(__name__)
+
+# A day and an hour, the key of the next day is built by its first reply
+REPLY_PAYLOADS_TIMEOUT = 25*60*60
+
+
+def get_reply_payloads_key(day: date) -> str:
+    return f"wa_reply_payloads_{day.isoformat()}"
+
+
+def build_date_list_payload(available_dates: list[date]) -> dict:
+    return {
+        "type": "list",
+        "body": {"text": "Please select date for booking"},
+        "action": {
+            "button": "Select Date",
+            "sections": [
+                {
+                    "title": "Available Dates",
+                    "rows": [
+                        {
+                            "id": available_date.strftime("%d-%m-%Y"),
+                            "title": available_date.strftime("%d %b %Y"),
+                            # "description": "",
+                        }
+                        for available_date in available_dates
+                    ],
+                },
+            ],
+        },
+    }
+
+
+def build_inquiry_messages() -> list[dict]:
+    """
+    Function to build the inquiry messages in their sent order.
+
+    :return: The message type and the message data of every inquiry message
+    """
+    messages = []
+    for msg in WhatsAppInquiryMessage.objects.all():
+        if msg.type == "text":
+            messages.append({"message_type": "text", "type_data": {"preview_url": True, "body": msg.message_text}})
+        elif msg.type == "image_only":
+            messages.append({"message_type": "image", "type_data": {"link": f"{HOST_URL}{msg.document.url}"}})
+        elif msg.type == "image_with_text":
+            messages.append({"message_type": "image", "type_data": {"link": f"{HOST_URL}{msg.document.url}", "caption": msg.message_text}})
+    return messages
+
+
+def build_reply_payloads(day: date) -> dict:
+    """
+    Function to build the reply payloads of the day.
+
+    :param `day`: The current local date, the booking dates are after it
+    :return: dict with the `booking_dates` in ISO format, the `date_list` message and the `inquiry_messages`
+    """
+    # A list message has at most 10 rows
+    available_dates = list(
+        TicketPrice.objects.filter(date__gt=day).order_by("date")[:10].values_list("date", flat=True)
+    )
+    return {
+        "booking_dates": [available_date.isoformat() for available_date in available_dates],
+        "date_list": build_date_list_payload(available_dates),
+        "inquiry_messages": build_inquiry_messages(),
+    }
+
+
+def rebuild_reply_payloads() -> dict:
+    """
+    Function to rebuild the cached reply payloads of today, called when the prices or the inquiry
+    messages are changed.
+    """
+    day = timezone.localtime(timezone.now()).date()
+    payloads = build_reply_payloads(day)
+    cache.set(get_reply_payloads_key(day), json.dumps(payloads), timeout=REPLY_PAYLOADS_TIMEOUT)
+    logging.info(f"Rebuilt WhatsApp reply payloads of {day}")
+    return payloads
+
+
+def get_reply_payloads() -> dict:
+    """
+    Function to get the cached reply payloads of today, built on the first reply of the day.
+    """
+    day = timezone.localtime(timezone.now()).date()
+    raw_payloads = cache.get(get_reply_payloads_key(day))
+    if raw_payloads is None:
+        payloads = build_reply_payloads(day)
+        cache.add(get_reply_payloads_key(day), json.dumps(payloads), timeout=REPLY_PAYLOADS_TIMEOUT)
+        return payloads
+    return json.loads(raw_payloads)
+
+
+def get_cached_booking_dates() -> list[date]:
+    return [date.fromisoformat(value) for value in get_reply_payloads()["booking_dates"]]
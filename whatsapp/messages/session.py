@@ -0,0 +1,68 @@
+"""
+WhatsApp booking sessions.
+
+A session is a Redis hash `wa_booking_session_{sender}` with the current `state` of the booking
+conversation and one field per answered step. Every step writes only its own field with HSET and
+refreshes the expiry in the same pipeline instead of rewriting the whole session.
+"""
+
+from common_config.redis_client import get_redis_client
+
+BOOKING_SESSION_TIMEOUT = 5*60
+BOOKING_SESSION_INT_FIELDS = ("adult_male", "adult_female", "child", "infant")
+
+
+def get_booking_session_key(sender: str) -> str:
+    return f"wa_booking_session_{sender}"
+
+
+def get_booking_session(sender: str) -> dict | None:
+    """
+    Function to get the active booking session of the sender.
+
+    :param `sender`: The number of the user
+    :return: The session with the counts as int or None if there is no active session
+    """
+    raw_session = get_redis_client().hgetall(get_booking_session_key(sender))
+    if not raw_session:
+        return None
+    session = {key.decode(): value.decode() for key, value in raw_session.items()}
+    for field in BOOKING_SESSION_INT_FIELDS:
+        if field in session:
+            session[field] = int(session[field])
+    return session
+
+
+def update_booking_session(sender: str, state: str, **fields) -> None:
+    """
+    Function to move the booking session to the state and set the answered fields.
+
+    :param `sender`: The number of the user
+    :param `state`: The state the session moves to
+    :param `fields`: The session fields to set
+    """
+    key = get_booking_session_key(sender)
+    with get_redis_client().pipeline() as pipe:
+        pipe.hset(key, mapping={"state": state, **fields})
+        pipe.expire(key, BOOKING_SESSION_TIMEOUT)
+        pipe.execute()
+
+
+def start_booking_session(sender: str, state: str, **fields) -> None:
+    """
+    Function to start a new booking session, an existing session of the sender is discarded.
+
+    :param `sender`: The number of the user
+    :param `state`: The first state of the session
+    :param `fields`: The session fields already answered
+    """
+    key = get_booking_session_key(sender)
+    with get_redis_client().pipeline() as pipe:
+        pipe.delete(key)
+        pipe.hset(key, mapping={"state": state, "wa_number": sender, **fields})
+        pipe.expire(key, BOOKING_SESSION_TIMEOUT)
+        pipe.execute()
+
+
+def delete_booking_session(sender: str) -> None:
+    get_redis_client().delete(get_booking_session_key(sender))
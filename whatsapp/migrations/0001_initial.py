@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recipient', models.CharField(db_index=True, max_length=20)),
+                ('message_type', models.CharField(max_length=50)),
+                ('type_data', models.JSONField(default=dict)),
+                ('message_context', models.JSONField(blank=True, null=True)),
+                ('status', models.PositiveSmallIntegerField(choices=[(0, 'pending'), (1, 'sending'), (2, 'sent'), (3, 'dead')], default=0)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('message_id', models.CharField(blank=True, db_index=True, max_length=100, null=True)),
+                ('last_error', models.CharField(blank=True, max_length=200, null=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='whatsapp_ou_status_41704e_idx')],
+            },
+        ),
+    ]
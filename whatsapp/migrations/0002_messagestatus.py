@@ -0,0 +1,23 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageStatus',
+            fields=[
+                ('message_id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('recipient', models.CharField(max_length=20)),
+                ('status', models.PositiveSmallIntegerField(choices=[(1, 'sent'), (2, 'delivered'), (3, 'read'), (4, 'failed')])),
+                ('error_code', models.PositiveIntegerField(blank=True, null=True)),
+                ('status_at', models.DateTimeField()),
+            ],
+        ),
+    ]
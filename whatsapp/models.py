@@ -1,3 +1,42 @@
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+from common_config.common import (
+    MESSAGE_STATUSES,
+    OUTBOUND_MESSAGE_PENDING,
+    OUTBOUND_MESSAGE_STATUSES,
+)
+from management_core.models import DateTimeBaseModel
+
+
+class OutboundMessage(DateTimeBaseModel):
+    recipient = models.CharField(max_length=20, db_index=True)
+    message_type = models.CharField(max_length=50)
+    type_data = models.JSONField(default=dict)
+    message_context = models.JSONField(null=True, blank=True)
+    status = models.PositiveSmallIntegerField(
+        choices=OUTBOUND_MESSAGE_STATUSES, default=OUTBOUND_MESSAGE_PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    message_id = models.CharField(max_length=100, null=True, blank=True, db_index=True)
+    last_error = models.CharField(max_length=200, null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self) -> str:
+        return f"{self.recipient} - {self.message_type}"
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"])]
+
+
+class MessageStatus(models.Model):
+    message_id = models.CharField(max_length=100, primary_key=True)
+    recipient = models.CharField(max_length=20)
+    status = models.PositiveSmallIntegerField(choices=MESSAGE_STATUSES)
+    error_code = models.PositiveIntegerField(null=True, blank=True)
+    status_at = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return f"{self.message_id} - {self.get_status_display()}"
@@ -0,0 +1,366 @@
+"""
+Outbox of the WhatsApp messages which must not be lost, i.e. tickets and payment or locker updates.
+
+A message is saved as an `OutboundMessage` row in the transaction of the business change and a
+drain of the outbox is enqueued on the `high` queue once the transaction commits. The drain claims
+the due messages with `SELECT ... FOR UPDATE SKIP LOCKED`, sends them concurrently while keeping the
+order of the messages of a recipient and records the WhatsApp message id. A failed message is
+retried with an exponential backoff and dead lettered after `WA_OUTBOX_MAX_ATTEMPTS`, a scheduled
+drain picks up the retries and the messages whose drain could not be enqueued.
+
+A `booking_ticket` row is not sent to WhatsApp, the drain enqueues the render and delivery jobs of
+the ticket of the booking in `type_data` instead. It is saved with the payment so the ticket does
+not depend on Redis being reachable when the payment is committed.
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Q
+from django.utils import timezone
+from datetime import timedelta
+import django_rq
+import asyncio
+import logging
+import random
+
+import httpx
+
+from common_config.common import (
+    OUTBOUND_MESSAGE_DEAD,
+    OUTBOUND_MESSAGE_PENDING,
+    OUTBOUND_MESSAGE_SENDING,
+    OUTBOUND_MESSAGE_SENT,
+    WA_API_CONCURRENCY,
+    WA_OUTBOX_BACKOFF_SECONDS,
+    WA_OUTBOX_BATCH_SIZE,
+    WA_OUTBOX_MAX_ATTEMPTS,
+    WA_OUTBOX_MAX_BACKOFF_SECONDS,
+    WA_OUTBOX_SENDING_TIMEOUT,
+)
+from .models import OutboundMessage
+
+logging.getLogger(__name__)
+
+OUTBOX_DRAIN_KEY = "wa_outbox_drain_enqueued"
+BOOKING_TICKET_MESSAGE_TYPE = "booking_ticket"
+
+
+def enqueue_outbox_drain() -> None:
+    """
+    Function to enqueue a drain of the outbox unless one is already waiting in the queue.
+    """
+    if not cache.add(OUTBOX_DRAIN_KEY, 1, timeout=60):
+        return
+    try:
+        django_rq.get_queue("high").enqueue(drain_outbox)
+    except Exception as e:
+        # The scheduled drain sends the messages
+        cache.delete(OUTBOX_DRAIN_KEY)
+        logging.exception(e)
+
+
+def queue_outbound_message(
+    recipient_number: str,
+    message_type: str,
+    type_data: dict = None,
+    message_context: dict = None,
+) -> OutboundMessage:
+    """
+    Function to save a message in the outbox, call it in the transaction of the business change
+    so that the message is sent if and only if the change is committed.
+
+    :param `recipient_number`: The number to which message is to be sent
+    :param `message_type`: The type of message to be sent
+    :param `type_data`: The data of the message
+    :param `message_context`: The context of the message
+    :return: The saved outbound message
+    """
+    return queue_outbound_messages(
+        [
+            {
+                "recipient_number": recipient_number,
+                "message_type": message_type,
+                "type_data": type_data,
+                "message_context": message_context,
+            }
+        ]
+    )[0]
+
+
+def queue_outbound_messages(messages: list[dict]) -> list[OutboundMessage]:
+    """
+    Function to save the messages in the outbox, the messages of a recipient are sent in the given order.
+
+    :param `messages`: The keyword arguments of `queue_outbound_message` for every message
+    :return: The saved outbound messages
+    """
+    with transaction.atomic():
+        outbound_messages = OutboundMessage.objects.bulk_create(
+            [
+                OutboundMessage(
+                    recipient=message["recipient_number"],
+                    message_type=message["message_type"],
+                    type_data=message.get("type_data") or {},
+                    message_context=message.get("message_context"),
+                )
+                for message in messages
+            ]
+        )
+        transaction.on_commit(enqueue_outbox_drain)
+    return outbound_messages
+
+
+def release_stale_outbound_messages() -> int:
+    """
+    Function to send again the messages left sending by a worker which was killed.
+
+    :return: The number of released messages
+    """
+    return OutboundMessage.objects.filter(
+        status=OUTBOUND_MESSAGE_SENDING,
+        updated_at__lt=timezone.now() - timedelta(seconds=WA_OUTBOX_SENDING_TIMEOUT),
+    ).update(status=OUTBOUND_MESSAGE_PENDING, updated_at=timezone.now())
+
+
+def claim_outbound_messages(batch_size: int) -> list[OutboundMessage]:
+    """
+    Function to mark the due messages as sending, concurrent drains claim different messages.
+
+    A message is not claimed while an older message of its recipient is unsent outside of the
+    claimed ones, i.e. waiting for its backoff, sending by another drain or locked by a concurrent
+    claim, so the messages of a recipient are sent in order across the batches and the drains.
+    """
+    now = timezone.now()
+    waiting = OutboundMessage.objects.filter(
+        Q(status=OUTBOUND_MESSAGE_SENDING)
+        | Q(status=OUTBOUND_MESSAGE_PENDING, next_attempt_at__gt=now),
+        recipient=OuterRef("recipient"),
+        id__lt=OuterRef("id"),
+    )
+    with transaction.atomic():
+        messages = list(
+            OutboundMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=OUTBOUND_MESSAGE_PENDING, next_attempt_at__lte=now)
+            .filter(~Exists(waiting))
+            .order_by("id")[:batch_size]
+        )
+        # The older messages locked by a concurrent claim are not visible to the filter above
+        blocking = dict(
+            OutboundMessage.objects.filter(
+                recipient__in={message.recipient for message in messages},
+                status__in=[OUTBOUND_MESSAGE_PENDING, OUTBOUND_MESSAGE_SENDING],
+            )
+            .exclude(id__in=[message.id for message in messages])
+            .values("recipient")
+            .annotate(first_id=Min("id"))
+            .values_list("recipient", "first_id")
+        )
+        messages = [
+            message
+            for message in messages
+            if message.id < blocking.get(message.recipient, message.id + 1)
+        ]
+        OutboundMessage.objects.filter(id__in=[message.id for message in messages]).update(
+            status=OUTBOUND_MESSAGE_SENDING, updated_at=now
+        )
+    return messages
+
+
+def is_success(response: httpx.Response | Exception | tuple) -> bool:
+    """
+    Whether the message went through, a `booking_ticket` row succeeds once its jobs are enqueued.
+    """
+    if isinstance(response, Exception):
+        return False
+    return not isinstance(response, httpx.Response) or response.is_success
+
+
+def is_retryable(response: httpx.Response | Exception) -> bool:
+    if isinstance(response, Exception):
+        return True
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def get_backoff_seconds(attempts: int) -> float:
+    """
+    Seconds to wait before the next attempt, doubled after every failed attempt with a jitter so
+    that the messages failed by an outage are not retried at once.
+    """
+    seconds = min(WA_OUTBOX_BACKOFF_SECONDS * 2 ** (attempts - 1), WA_OUTBOX_MAX_BACKOFF_SECONDS)
+    return seconds * random.uniform(0.8, 1.2)
+
+
+async def send_outbound_messages(
+    messages: list[OutboundMessage],
+) -> dict[int, httpx.Response | Exception]:
+    """
+    Function to send the messages concurrently, the messages of a recipient are sent one after the
+    other and the rest of them are not sent once one fails.
+
+    :return: The response, the enqueued ticket jobs or the raised exception of every sent message
+        by the message id
+    """
+    # Imported here as the message handlers queue their messages in the outbox
+    from whatsapp.messages.message_handlers import enqueue_booking_ticket, whatsapp_config
+
+    conversations: dict[str, list[OutboundMessage]] = {}
+    for message in messages:
+        conversations.setdefault(message.recipient, []).append(message)
+    semaphore = asyncio.Semaphore(WA_API_CONCURRENCY)
+    results = {}
+
+    async def send_conversation(client, conversation: list[OutboundMessage]) -> None:
+        async with semaphore:
+            for message in conversation:
+                try:
+                    if message.message_type == BOOKING_TICKET_MESSAGE_TYPE:
+                        response = await asyncio.to_thread(
+                            enqueue_booking_ticket,
+                            message.type_data["booking_id"],
+                            message.type_data["ticket_format"],
+                        )
+                    else:
+                        response = await client.send_message(
+                            message.recipient,
+                            message.message_type,
+                            message.type_data,
+                            message.message_context,
+                        )
+                except Exception as e:
+                    response = e
+                results[message.id] = response
+                if not is_success(response):
+                    return
+
+    async with whatsapp_config.get_async_client() as client:
+        await asyncio.gather(
+            *(send_conversation(client, conversation) for conversation in conversations.values())
+        )
+    return results
+
+
+def record_outbound_results(
+    messages: list[OutboundMessage], results: dict[int, httpx.Response | Exception]
+) -> dict[str, int]:
+    """
+    Function to store the results of the sent messages, the messages which were not sent after a
+    failed message of the recipient are retried with it without counting an attempt.
+
+    :return: The number of messages by result
+    """
+    now = timezone.now()
+    counts = {"sent": 0, "retry": 0, "dead": 0, "skipped": 0}
+    next_attempt_at = {}
+    for message in messages:
+        if message.id not in results:
+            message.status = OUTBOUND_MESSAGE_PENDING
+            message.next_attempt_at = next_attempt_at.get(message.recipient, now)
+            counts["skipped"] += 1
+            continue
+
+        response = results[message.id]
+        message.attempts += 1
+        if is_success(response):
+            message.status = OUTBOUND_MESSAGE_SENT
+            message.sent_at = now
+            message.last_error = None
+            try:
+                message.message_id = response.json()["messages"][0]["id"]
+            except (AttributeError, ValueError, KeyError, IndexError):
+                message.message_id = None
+            counts["sent"] += 1
+            continue
+
+        if isinstance(response, Exception):
+            message.last_error = f"{type(response).__name__}: {response}"[:200]
+        else:
+            message.last_error = f"HTTP {response.status_code}: {response.text}"[:200]
+        if is_retryable(response) and message.attempts < WA_OUTBOX_MAX_ATTEMPTS:
+            message.status = OUTBOUND_MESSAGE_PENDING
+            message.next_attempt_at = now + timedelta(seconds=get_backoff_seconds(message.attempts))
+            counts["retry"] += 1
+        else:
+            message.status = OUTBOUND_MESSAGE_DEAD
+            logging.error(
+                f"Outbound message {message.id} to {message.recipient} dead lettered after "
+                f"{message.attempts} attempts: {message.last_error}"
+            )
+            counts["dead"] += 1
+        next_attempt_at[message.recipient] = message.next_attempt_at
+
+    for message in messages:
+        message.updated_at = now
+    OutboundMessage.objects.bulk_update(
+        messages,
+        ["status", "attempts", "next_attempt_at", "message_id", "last_error", "sent_at", "updated_at"],
+    )
+    return counts
+
+
+def drain_outbox(batch_size: int = WA_OUTBOX_BATCH_SIZE) -> str:
+    """
+    RQ job to send the due messages of the outbox in batches until none is left.
+    """
+    cache.delete(OUTBOX_DRAIN_KEY)
+    released = release_stale_outbound_messages()
+    if released:
+        logging.warning(f"Released {released} outbound messages left sending")
+
+    totals = {"sent": 0, "retry": 0, "dead": 0, "skipped": 0}
+    while True:
+        messages = claim_outbound_messages(batch_size)
+        if not messages:
+            break
+        results = asyncio.run(send_outbound_messages(messages))
+        counts = record_outbound_results(messages, results)
+        for key, value in counts.items():
+            totals[key] += value
+        if counts["sent"] == 0 and len(messages) < batch_size:
+            # Nothing went through, the rest waits for the backoff
+            break
+    logging.info(f"Outbox drained: {totals}")
+    return f"Outbox drained: {totals}"
+
+
+def retry_dead_outbound_messages(queryset) -> int:
+    """
+    Function to send the dead lettered messages of the queryset again.
+
+    :return: The number of messages queued again
+    """
+    with transaction.atomic():
+        count = queryset.filter(status=OUTBOUND_MESSAGE_DEAD).update(
+            status=OUTBOUND_MESSAGE_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        transaction.on_commit(enqueue_outbox_drain)
+    return count
+
+
+def get_outbox_metrics() -> dict:
+    """
+    Function to get the depth and the age of the outbox.
+
+    :return: dict with the number of messages by status, the number of pending messages which are
+        due and the age in seconds of the oldest pending and the oldest due message
+    """
+    now = timezone.now()
+    unsent = OutboundMessage.objects.filter(
+        status__in=[OUTBOUND_MESSAGE_PENDING, OUTBOUND_MESSAGE_SENDING, OUTBOUND_MESSAGE_DEAD]
+    )
+    metrics = unsent.aggregate(
+        pending=Count("id", filter=Q(status=OUTBOUND_MESSAGE_PENDING)),
+        due=Count("id", filter=Q(status=OUTBOUND_MESSAGE_PENDING, next_attempt_at__lte=now)),
+        sending=Count("id", filter=Q(status=OUTBOUND_MESSAGE_SENDING)),
+        dead=Count("id", filter=Q(status=OUTBOUND_MESSAGE_DEAD)),
+        oldest_pending=Min("created_at", filter=Q(status=OUTBOUND_MESSAGE_PENDING)),
+        oldest_due=Min(
+            "next_attempt_at", filter=Q(status=OUTBOUND_MESSAGE_PENDING, next_attempt_at__lte=now)
+        ),
+    )
+    for key in ("oldest_pending", "oldest_due"):
+        oldest = metrics.pop(key)
+        metrics[f"{key}_age_seconds"] = round((now - oldest).total_seconds(), 1) if oldest else 0
+    return metrics
@@ -0,0 +1,248 @@
+"""
+Delivery statuses of the sent WhatsApp messages.
+
+Meta posts a status update for every sent, delivered, read and failed message. Writing a row per
+webhook would load the database, so the statuses are pushed in compact form to a Redis list and a
+job on the `low` queue moves them to the `MessageStatus` table with one upsert per batch. The
+first status after `WA_STATUS_FLUSH_INTERVAL` seconds enqueues the flush and a scheduled flush
+writes the statuses left in the buffer.
+
+The statuses are joined on the WhatsApp message id to the campaign recipients and the outbox for
+the per campaign and per template delivery rates.
+"""
+
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.fields.json import KT
+from django.utils import timezone
+from datetime import datetime, timezone as dt_timezone
+import django_rq
+import logging
+import json
+
+from common_config.common import (
+    MESSAGE_STATUSES,
+    OUTBOUND_MESSAGE_SENT,
+    WA_STATUS_FLUSH_BATCH_SIZE,
+    WA_STATUS_FLUSH_INTERVAL,
+)
+from common_config.redis_client import get_redis_client
+from management_core.models import Campaign, CampaignRecipient
+from .models import MessageStatus, OutboundMessage
+
+logging.getLogger(__name__)
+
+STATUS_BUFFER_KEY = "wa_status_buffer"
+STATUS_FLUSH_KEY = "wa_status_flush_enqueued"
+STATUS_VALUES = {name: value for value, name in MESSAGE_STATUSES}
+
+
+def get_compact_status(message_status: dict) -> str | None:
+    """
+    Function to get the buffered form of a webhook status.
+
+    :param `message_status`: The status object of the webhook payload
+    :return: JSON list of the message id, recipient, status, unix timestamp and error code or
+        None if the status is not tracked
+    """
+    status = STATUS_VALUES.get(message_status.get("status"))
+    if not status or not message_status.get("id"):
+        return None
+    errors = message_status.get("errors") or [{}]
+    return json.dumps(
+        [
+            message_status["id"],
+            message_status.get("recipient_id", ""),
+            status,
+            int(message_status.get("timestamp") or timezone.now().timestamp()),
+            errors[0].get("code"),
+        ]
+    )
+
+
+def buffer_message_statuses(statuses: list[dict]) -> int:
+    """
+    Function to buffer the statuses of a webhook payload in Redis.
+
+    :param `statuses`: The status objects of the webhook payload
+    :return: The number of buffered statuses
+    """
+    compact_statuses = [
+        compact for compact in map(get_compact_status, statuses) if compact is not None
+    ]
+    if not compact_statuses:
+        return 0
+    with get_redis_client().pipeline() as pipe:
+        pipe.rpush(STATUS_BUFFER_KEY, *compact_statuses)
+        pipe.set(STATUS_FLUSH_KEY, 1, nx=True, ex=WA_STATUS_FLUSH_INTERVAL)
+        _, flush = pipe.execute()
+    if flush:
+        django_rq.get_queue("low").enqueue(flush_message_statuses)
+    return len(compact_statuses)
+
+
+def pop_buffered_statuses(count: int) -> list[bytes]:
+    with get_redis_client().pipeline() as pipe:
+        pipe.lrange(STATUS_BUFFER_KEY, 0, count - 1)
+        pipe.ltrim(STATUS_BUFFER_KEY, count, -1)
+        raw_statuses, _ = pipe.execute()
+    return raw_statuses
+
+
+def save_message_statuses(raw_statuses: list[bytes]) -> int:
+    """
+    Function to upsert the latest status of every message of the batch, the statuses are not
+    always received in order and a status never replaces a later one.
+
+    :param `raw_statuses`: The buffered statuses
+    :return: The number of inserted or updated messages
+    """
+    latest = {}
+    for raw_status in raw_statuses:
+        message_id, recipient, status, timestamp, error_code = json.loads(raw_status)
+        if message_id in latest and latest[message_id].status >= status:
+            continue
+        latest[message_id] = MessageStatus(
+            message_id=message_id,
+            recipient=recipient,
+            status=status,
+            error_code=error_code,
+            status_at=datetime.fromtimestamp(timestamp, tz=dt_timezone.utc),
+        )
+
+    saved_statuses = dict(
+        MessageStatus.objects.filter(message_id__in=list(latest)).values_list("message_id", "status")
+    )
+    message_statuses = [
+        message_status
+        for message_id, message_status in latest.items()
+        if saved_statuses.get(message_id, 0) < message_status.status
+    ]
+    MessageStatus.objects.bulk_create(
+        message_statuses,
+        batch_size=WA_STATUS_FLUSH_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["message_id"],
+        update_fields=["status", "error_code", "status_at"],
+    )
+    return len(message_statuses)
+
+
+def flush_message_statuses(batch_size: int = WA_STATUS_FLUSH_BATCH_SIZE) -> str:
+    """
+    RQ job to write the buffered statuses to the database in batches until the buffer is empty.
+    """
+    flushed = saved = 0
+    while True:
+        raw_statuses = pop_buffered_statuses(batch_size)
+        if not raw_statuses:
+            break
+        try:
+            saved += save_message_statuses(raw_statuses)
+        except Exception:
+            # Keep the statuses for the next flush
+            get_redis_client().rpush(STATUS_BUFFER_KEY, *raw_statuses)
+            raise
+        flushed += len(raw_statuses)
+    if flushed:
+        logging.info(f"Flushed {flushed} message statuses, {saved} messages updated")
+    return f"Flushed {flushed} message statuses, {saved} messages updated"
+
+
+def get_status_counts(message_ids) -> dict:
+    """
+    Function to count the messages by their latest status.
+
+    :param `message_ids`: Queryset of the WhatsApp message ids
+    """
+    return MessageStatus.objects.filter(message_id__in=message_ids).aggregate(
+        **{
+            name: Count("message_id", filter=Q(status=value))
+            for value, name in MESSAGE_STATUSES
+        }
+    )
+
+
+def get_delivery_rates(counts: dict, accepted: int) -> dict:
+    """
+    Function to add the delivery rates to the status counts, a read message is delivered as well.
+
+    :param `counts`: The number of messages by status
+    :param `accepted`: The number of messages accepted by WhatsApp
+    :return: The counts with the delivered, read and failed percentage of the accepted messages
+    """
+    delivered = counts.get("delivered", 0) + counts.get("read", 0)
+    return {
+        **counts,
+        "accepted": accepted,
+        "delivered_rate": round(delivered * 100 / accepted, 2) if accepted else 0,
+        "read_rate": round(counts.get("read", 0) * 100 / accepted, 2) if accepted else 0,
+        "failed_rate": round(counts.get("failed", 0) * 100 / accepted, 2) if accepted else 0,
+    }
+
+
+def get_campaign_delivery_rollup(campaign: Campaign) -> dict:
+    """
+    Function to get the delivery rates of the messages of the campaign.
+
+    :param `campaign`: The campaign
+    """
+    message_ids = CampaignRecipient.objects.filter(
+        campaign=campaign, message_id__isnull=False
+    ).values("message_id")
+    return get_delivery_rates(get_status_counts(message_ids), campaign.sent)
+
+
+def get_template_delivery_rollups(since: datetime = None) -> list[dict]:
+    """
+    Function to get the delivery rates of every template sent by the campaigns and the outbox.
+
+    :param `since`: Only count the messages created after the time
+    :return: The rates of every template, most sent first
+    """
+    latest_status = Subquery(
+        MessageStatus.objects.filter(message_id=OuterRef("message_id")).values("status")[:1]
+    )
+    campaigns = Campaign.objects.filter(message_type="template")
+    outbound_messages = OutboundMessage.objects.filter(
+        message_type="template", status=OUTBOUND_MESSAGE_SENT, message_id__isnull=False
+    )
+    if since:
+        campaigns = campaigns.filter(created_at__gte=since)
+        outbound_messages = outbound_messages.filter(created_at__gte=since)
+    campaign_templates = {
+        campaign_id: type_data.get("name")
+        for campaign_id, type_data in campaigns.values_list("id", "type_data")
+    }
+
+    rows = [
+        {**row, "template": campaign_templates[row["campaign_id"]]}
+        for row in CampaignRecipient.objects.filter(
+            campaign_id__in=list(campaign_templates), message_id__isnull=False
+        )
+        .annotate(delivery_status=latest_status)
+        .values("campaign_id", "delivery_status")
+        .annotate(count=Count("id"))
+        .order_by()
+    ]
+    rows.extend(
+        outbound_messages.annotate(template=KT("type_data__name"), delivery_status=latest_status)
+        .values("template", "delivery_status")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+
+    status_names = dict(MESSAGE_STATUSES)
+    counts = {}
+    for row in rows:
+        template_counts = counts.setdefault(
+            row["template"], {"accepted": 0, **{name: 0 for name in status_names.values()}}
+        )
+        template_counts["accepted"] += row["count"]
+        if row["delivery_status"] in status_names:
+            template_counts[status_names[row["delivery_status"]]] += row["count"]
+
+    rollups = [
+        {"template": template, **get_delivery_rates(template_counts, template_counts.pop("accepted"))}
+        for template, template_counts in counts.items()
+    ]
+    return sorted(rollups, key=lambda rollup: rollup["accepted"], reverse=True)
@@ -1,3 +1,309 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from common_config.common import (
+    OUTBOUND_MESSAGE_DEAD,
+    OUTBOUND_MESSAGE_PENDING,
+    OUTBOUND_MESSAGE_SENT,
+    WA_OUTBOX_BACKOFF_SECONDS,
+    WA_OUTBOX_MAX_ATTEMPTS,
+)
+from whatsapp.messages import message_handlers
+from . import webhook_utils
+from .models import OutboundMessage
+from .outbox import drain_outbox
+from .views import WhatsAppWebhook
+
+
+def text_message(message_id: str, sender: str, body: str) -> dict:
+    return {
+        "from": sender,
+        "id": message_id,
+        "type": "text",
+        "text": {"body": body},
+    }
+
+
+def message_status(message_id: str, recipient: str, status: str) -> dict:
+    return {"id": message_id, "recipient_id": recipient, "status": status}
+
+
+def webhook_payload(*values: dict) -> dict:
+    """Build a webhook payload with one entry per value and one change per entry"""
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [
+            {"id": str(index), "changes": [{"field": "messages", "value": value}]}
+            for index, value in enumerate(values)
+        ],
+    }
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class WhatsAppWebhookBatchTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        patches = [
+            mock.patch.object(webhook_utils, "is_ignored_sender", return_value=False),
+            mock.patch.object(webhook_utils, "handle_webhook_message"),
+            mock.patch.object(webhook_utils, "handle_webhook_status"),
+            mock.patch.object(webhook_utils, "buffer_message_statuses"),
+        ]
+        _, self.handle_message, self.handle_status, self.buffer_statuses = [
+            p.start() for p in patches
+        ]
+        for p in patches:
+            self.addCleanup(p.stop)
+
+    def post(self, data: dict):
+        request = self.factory.post("/whatsapp/webhook/", data, format="json")
+        return WhatsAppWebhook.as_view()(request)
+
+    def handled_message_ids(self) -> list[str]:
+        return [call.args[3]["message_id"] for call in self.handle_message.call_args_list]
+
+    def test_every_message_of_the_batch_is_handled_once(self):
+        data = webhook_payload(
+            {
+                "messages": [
+                    text_message("wamid.1", "911111111111", "hi"),
+                    text_message("wamid.2", "912222222222", "hi"),
+                ],
+                "statuses": [message_status("wamid.out.1", "911111111111", "read")],
+            },
+            {
+                "messages": [text_message("wamid.3", "911111111111", "my_bookings")],
+                "statuses": [
+                    message_status("wamid.out.2", "913333333333", "delivered"),
+                    message_status("wamid.out.3", "913333333333", "failed"),
+                ],
+            },
+        )
+
+        response = self.post(data)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.handled_message_ids(), ["wamid.1", "wamid.2", "wamid.3"])
+        self.assertEqual(
+            [call.args[0]["id"] for call in self.handle_status.call_args_list],
+            ["wamid.out.1", "wamid.out.2", "wamid.out.3"],
+        )
+        # Statuses of all the entries are buffered with a single call
+        self.buffer_statuses.assert_called_once()
+        self.assertEqual(
+            [item["id"] for item in self.buffer_statuses.call_args.args[0]],
+            ["wamid.out.1", "wamid.out.2", "wamid.out.3"],
+        )
+
+    def test_replayed_batches_do_not_handle_messages_again(self):
+        first = webhook_payload(
+            {
+                "messages": [
+                    text_message("wamid.1", "911111111111", "hi"),
+                    text_message("wamid.2", "911111111111", "my_bookings"),
+                ]
+            }
+        )
+        # Redelivery of the first batch merged with a new message
+        second = webhook_payload(
+            {"messages": [text_message("wamid.2", "911111111111", "my_bookings")]},
+            {
+                "messages": [
+                    text_message("wamid.1", "911111111111", "hi"),
+                    text_message("wamid.3", "911111111111", "hi"),
+                ]
+            },
+        )
+
+        for data in (first, first, second, second):
+            self.assertEqual(self.post(data).status_code, 200)
+
+        self.assertEqual(self.handled_message_ids(), ["wamid.1", "wamid.2", "wamid.3"])
+        self.assertEqual(
+            webhook_utils.get_webhook_stats()["duplicates_dropped"], 7
+        )
+
+    def test_failed_message_is_handled_on_redelivery(self):
+        data = webhook_payload(
+            {
+                "messages": [
+                    text_message("wamid.1", "911111111111", "hi"),
+                    text_message("wamid.2", "912222222222", "hi"),
+                ]
+            }
+        )
+        self.handle_message.side_effect = [None, Exception("Graph API is down")]
+
+        self.assertEqual(self.post(data).status_code, 500)
+
+        self.handle_message.side_effect = None
+        self.assertEqual(self.post(data).status_code, 200)
+        self.assertEqual(self.handled_message_ids(), ["wamid.1", "wamid.2", "wamid.2"])
+
+    def test_async_mode_queues_every_message(self):
+        data = webhook_payload(
+            {
+                "messages": [
+                    text_message("wamid.1", "911111111111", "hi"),
+                    text_message("wamid.2", "912222222222", "hi"),
+                ]
+            },
+            {"messages": [text_message("wamid.3", "911111111111", "my_bookings")]},
+        )
+
+        with mock.patch("whatsapp.views.WA_WEBHOOK_MODE", "async"), mock.patch.object(
+            webhook_utils, "enqueue_webhook_message"
+        ) as enqueue:
+            self.post(data)
+            self.post(data)
+
+        self.handle_message.assert_not_called()
+        self.assertEqual(
+            [(call.args[0], call.args[1]["id"]) for call in enqueue.call_args_list],
+            [
+                ("911111111111", "wamid.1"),
+                ("912222222222", "wamid.2"),
+                ("911111111111", "wamid.3"),
+            ],
+        )
+
+
+class FakeAsyncClient:
+    """Async WhatsApp client which answers every message with the next queued status code"""
+
+    def __init__(self, status_codes: list[int]):
+        self.status_codes = status_codes
+        self.sent = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+    async def send_message(self, recipient_number, message_type, type_data, message_context=None):
+        self.sent.append(type_data["body"])
+        status_code = self.status_codes.pop(0) if self.status_codes else 200
+        return httpx.Response(
+            status_code, json={"messages": [{"id": f"wamid.{type_data['body']}"}]}
+        )
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+)
+class OutboxDrainTestCase(TestCase):
+    def drain(self, *status_codes: int) -> FakeAsyncClient:
+        client = FakeAsyncClient(list(status_codes))
+        with mock.patch.object(
+            message_handlers.whatsapp_config, "get_async_client", return_value=client
+        ):
+            drain_outbox()
+        return client
+
+    def queue(self, recipient: str, body: str, **fields) -> OutboundMessage:
+        return OutboundMessage.objects.create(
+            recipient=recipient, message_type="text", type_data={"body": body}, **fields
+        )
+
+    def test_failed_message_is_retried_with_backoff(self):
+        message = self.queue("911111111111", "ticket")
+
+        before = timezone.now()
+        self.drain(500)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OUTBOUND_MESSAGE_PENDING)
+        self.assertEqual(message.attempts, 1)
+        self.assertTrue(message.last_error.startswith("HTTP 500"))
+        # First backoff is `WA_OUTBOX_BACKOFF_SECONDS` with a jitter of 20%
+        self.assertGreaterEqual(
+            message.next_attempt_at, before + timedelta(seconds=WA_OUTBOX_BACKOFF_SECONDS * 0.8)
+        )
+
+        # Not due yet, the next drain leaves it alone
+        self.assertEqual(self.drain().sent, [])
+
+        OutboundMessage.objects.filter(id=message.id).update(next_attempt_at=timezone.now())
+        self.drain()
+        message.refresh_from_db()
+        self.assertEqual(message.status, OUTBOUND_MESSAGE_SENT)
+        self.assertEqual(message.attempts, 2)
+        self.assertEqual(message.message_id, "wamid.ticket")
+
+    def test_message_is_dead_lettered_after_max_attempts(self):
+        message = self.queue("911111111111", "ticket", attempts=WA_OUTBOX_MAX_ATTEMPTS - 1)
+
+        self.drain(503)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OUTBOUND_MESSAGE_DEAD)
+        self.assertEqual(message.attempts, WA_OUTBOX_MAX_ATTEMPTS)
+        self.assertEqual(self.drain().sent, [])
+
+    def test_client_error_is_dead_lettered_at_once(self):
+        message = self.queue("911111111111", "ticket")
+
+        self.drain(400)
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OUTBOUND_MESSAGE_DEAD)
+        self.assertEqual(message.attempts, 1)
+
+    def test_later_message_waits_for_the_earlier_one_of_the_recipient(self):
+        first = self.queue("911111111111", "first")
+        second = self.queue("911111111111", "second")
+        other = self.queue("912222222222", "other")
+
+        # The first message fails, the second one is not sent before it
+        client = self.drain(500)
+        self.assertEqual(client.sent, ["first", "other"])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.status, OUTBOUND_MESSAGE_PENDING)
+        self.assertEqual(second.status, OUTBOUND_MESSAGE_PENDING)
+        self.assertEqual(second.attempts, 0)
+
+        # The second message is due but the first one is waiting for its backoff
+        OutboundMessage.objects.filter(id=second.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.drain().sent, [])
+
+        OutboundMessage.objects.filter(id=first.id).update(next_attempt_at=timezone.now())
+        self.assertEqual(self.drain().sent, ["first", "second"])
+        self.assertEqual(
+            set(OutboundMessage.objects.values_list("status", flat=True)), {OUTBOUND_MESSAGE_SENT}
+        )
+        other.refresh_from_db()
+        self.assertEqual(other.attempts, 1)
+
+    def test_booking_ticket_row_enqueues_the_ticket_pipeline(self):
+        message = OutboundMessage.objects.create(
+            recipient="911111111111",
+            message_type="booking_ticket",
+            type_data={"booking_id": "booking-1", "ticket_format": "pdf"},
+        )
+
+        with mock.patch.object(
+            message_handlers, "enqueue_booking_ticket", side_effect=[ConnectionError("down"), None]
+        ) as enqueue:
+            self.drain()
+            message.refresh_from_db()
+            self.assertEqual(message.status, OUTBOUND_MESSAGE_PENDING)
+            self.assertTrue(message.last_error.startswith("ConnectionError"))
+
+            OutboundMessage.objects.filter(id=message.id).update(next_attempt_at=timezone.now())
+            self.drain()
+
+        message.refresh_from_db()
+        self.assertEqual(message.status, OUTBOUND_MESSAGE_SENT)
+        self.assertIsNone(message.message_id)
+        enqueue.assert_called_with("booking-1", "pdf")
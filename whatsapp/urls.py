@@ -4,6 +4,9 @@ from .views import (
     WhatsAppWebhook,
     WhatsAppTestTriggerAPIView,
     DailyReviewReminderAPIView,
+    WhatsAppWebhookStatsAPIView,
+    OutboxMetricsAPIView,
+    TemplateDeliveryRollupAPIView,
 )
 
 
@@ -13,4 +16,13 @@ urlpatterns = [
     path(
         "review-reminder/", DailyReviewReminderAPIView.as_view(), name="review_reminder"
     ),
+    path(
+        "webhook-stats/", WhatsAppWebhookStatsAPIView.as_view(), name="whatsapp_webhook_stats"
+    ),
+    path("outbox-metrics/", OutboxMetricsAPIView.as_view(), name="whatsapp_outbox_metrics"),
+    path(
+        "template-delivery/",
+        TemplateDeliveryRollupAPIView.as_view(),
+        name="whatsapp_template_delivery",
+    ),
 ]
@@ -1,21 +1,240 @@
-import requests
+"""
+WhatsApp Cloud API clients.
+
+`AsyncWhatsAppClient` sends messages over a bounded pool of HTTP/2 keep-alive connections with
+per-call timeouts, `send_many` fans out a batch of messages with at most `concurrency` requests
+in flight and `send_ordered` overlaps the requests of a multi-part reply keeping its order.
+`WhatsAppClient` is the sync facade used by the views and the RQ jobs.
+
+Set `WA_GRAPH_API_URL` to a local stub of the Graph API to test the clients.
+"""
+
+from typing import Awaitable, Callable
+import asyncio
+import os
+
+import httpx
+
+from common_config.common import (
+    WA_API_CONCURRENCY,
+    WA_API_CONNECT_TIMEOUT,
+    WA_API_HTTP2,
+    WA_API_MAX_CONNECTIONS,
+    WA_API_TIMEOUT,
+    WA_GRAPH_API_URL,
+    WA_ORDERED_SEND_GAP,
+)
+
+
+def build_message_data(
+    recipient_number: str,
+    message_type: str,
+    type_data: dict = None,
+    message_context: dict = None,
+) -> dict:
+    """
+    Function to build the request body of a message.
+
+    Refer to the official documentation for more details: [WhatsApp Documentation](https://developers.facebook.com/docs/whatsapp/cloud-api/reference/messages)
+    """
+    data = {
+        "messaging_product": "whatsapp",
+        "to": recipient_number,
+        "type": message_type,
+    }
+    data[message_type] = type_data
+    if message_context:
+        data["context"] = message_context
+    return data
+
+
+def get_client_options(api_key: str, timeout: float, max_connections: int) -> dict:
+    return {
+        "headers": {"Authorization": f"Bearer {api_key}"},
+        "http2": WA_API_HTTP2,
+        "timeout": httpx.Timeout(timeout, connect=WA_API_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+        ),
+    }
+
+
+class AsyncWhatsAppClient:
+    """
+    Async client of the WhatsApp Cloud API, use it as an async context manager so that the
+    pooled connections are closed.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        wa_id: str,
+        base_url: str = WA_GRAPH_API_URL,
+        timeout: float = WA_API_TIMEOUT,
+        max_connections: int = WA_API_MAX_CONNECTIONS,
+    ):
+        self.api_key = api_key
+        self.wa_id = wa_id
+        self.base_url = f"{base_url.rstrip('/')}/{self.wa_id}"
+        self.message_url = self.base_url + "/messages"
+        self.client = httpx.AsyncClient(
+            **get_client_options(api_key, timeout, max_connections)
+        )
+
+    async def __aenter__(self) -> "AsyncWhatsAppClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def send_message(
+        self,
+        recipient_number: str,
+        message_type: str,
+        type_data: dict = None,
+        message_context: dict = None,
+    ) -> httpx.Response:
+        """
+        Function to send message to WhatsApp
+
+        :param `recipient_number`: The number to which message is to be sent
+        :param `message_type`: The type of message to be sent
+        :param `type_data`: The data of the message
+        :param `message_context`: The context of the message
+        :return: Response from the API
+        """
+        return await self.client.post(
+            self.message_url,
+            json=build_message_data(
+                recipient_number, message_type, type_data, message_context
+            ),
+        )
+
+    async def send_many(
+        self,
+        messages: list[dict],
+        concurrency: int = WA_API_CONCURRENCY,
+        before_send: Callable[[], Awaitable[None]] | None = None,
+    ) -> list[httpx.Response | Exception]:
+        """
+        Function to send a batch of messages with at most `concurrency` requests in flight.
+
+        :param `messages`: The keyword arguments of `send_message` for every message
+        :param `concurrency`: The maximum number of requests in flight
+        :param `before_send`: Coroutine function awaited before every request i.e. a rate limiter
+        :return: The response or the raised exception of every message in the order of `messages`
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(message: dict) -> httpx.Response:
+            async with semaphore:
+                if before_send:
+                    await before_send()
+                return await self.send_message(**message)
+
+        return await asyncio.gather(
+            *(send(message) for message in messages), return_exceptions=True
+        )
+
+    async def send_ordered(
+        self,
+        messages: list[dict],
+        gap: float = WA_ORDERED_SEND_GAP,
+        concurrency: int = WA_API_CONCURRENCY,
+    ) -> list[httpx.Response | Exception]:
+        """
+        Function to send the parts of a reply in order while overlapping their requests.
+
+        WhatsApp shows concurrently sent messages in the order they are accepted, so every message
+        is started `gap` seconds after the previous one is started instead of after its response.
+        The first message is sent alone, it pays for the connection setup which would otherwise
+        delay it behind the later messages. The rest reuse its connection, all of them with HTTP/2.
+
+        :param `messages`: The keyword arguments of `send_message` for every message in the sent order
+        :param `gap`: Seconds between the start of two consecutive messages
+        :param `concurrency`: The maximum number of requests in flight
+        :return: The response or the raised exception of every message in the order of `messages`
+        """
+        if not messages:
+            return []
+        try:
+            first = await self.send_message(**messages[0])
+        except Exception as e:
+            first = e
+
+        semaphore = asyncio.Semaphore(concurrency)
+        rest = messages[1:]
+        started = [asyncio.Event() for _ in rest]
+
+        async def send(index: int, message: dict) -> httpx.Response:
+            if index:
+                await started[index - 1].wait()
+                await asyncio.sleep(gap)
+            async with semaphore:
+                started[index].set()
+                return await self.send_message(**message)
+
+        return [first] + await asyncio.gather(
+            *(send(index, message) for index, message in enumerate(rest)),
+            return_exceptions=True,
+        )
 
 
 class WhatsAppClient:
-    def __init__(self, api_key: str, wa_id: str) -> requests.Session:
+    """
+    Sync facade of the WhatsApp Cloud API client.
+
+    The pooled connections are opened lazily per process, RQ forks a work horse for every job.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        wa_id: str,
+        base_url: str = WA_GRAPH_API_URL,
+        timeout: float = WA_API_TIMEOUT,
+        max_connections: int = WA_API_MAX_CONNECTIONS,
+    ):
         self.api_key = api_key
         self.wa_id = wa_id
-        self.base_url = f"https://graph.facebook.com/v19.0/{self.wa_id}"
+        self.graph_api_url = base_url
+        self.base_url = f"{base_url.rstrip('/')}/{self.wa_id}"
         self.message_url = self.base_url + "/messages"
         self.auth_header = {"Authorization": f"Bearer {self.api_key}"}
-        self.client = requests.Session()
-        self.client.headers.update(self.auth_header)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client = None
+        self._client_pid = None
+
+    def __getstate__(self) -> dict:
+        # `send_message` is enqueued as a bound method, the pooled connections are not pickled
+        state = self.__dict__.copy()
+        state.update({"_client": None, "_client_pid": None})
+        return state
 
-    def get_client(self) -> requests.Session:
+    def get_client(self) -> httpx.Client:
         """
         Returns the client object with the necessary headers.
         """
-        return self.client
+        if self._client is None or self._client_pid != os.getpid():
+            self._client = httpx.Client(
+                **get_client_options(self.api_key, self.timeout, self.max_connections)
+            )
+            self._client_pid = os.getpid()
+        return self._client
+
+    def get_async_client(self) -> AsyncWhatsAppClient:
+        return AsyncWhatsAppClient(
+            self.api_key,
+            self.wa_id,
+            self.graph_api_url,
+            self.timeout,
+            self.max_connections,
+        )
 
     def send_message(
         self,
@@ -23,7 +242,7 @@ class WhatsAppClient:
         message_type: str,
         type_data: dict = None,
         message_context: dict = None,
-    ) -> requests.Response:
+    ) -> httpx.Response:
         """
         Function to send message to WhatsApp
 
@@ -35,14 +254,52 @@ class WhatsAppClient:
 
         Refer to the official documentation for more details: [WhatsApp Documentation](https://developers.facebook.com/docs/whatsapp/cloud-api/reference/messages)
         """
-        data = {
-            "messaging_product": "whatsapp",
-            "to": recipient_number,
-            "type": message_type,
-        }
-        data[message_type] = type_data
-        if message_context:
-            data["context"] = message_context
-
-        response = self.client.post(self.message_url, json=data)
-        return response
+        return self.get_client().post(
+            self.message_url,
+            json=build_message_data(
+                recipient_number, message_type, type_data, message_context
+            ),
+        )
+
+    def upload_media(self, content: bytes, file_name: str, mime_type: str) -> str:
+        """
+        Function to upload media to WhatsApp, the media id can be sent instead of a link.
+
+        :param `content`: The content of the file
+        :param `file_name`: The name of the file
+        :param `mime_type`: The mime type of the file i.e. `image/jpeg`
+        :return: The media id
+        """
+        response = self.get_client().post(
+            self.base_url + "/media",
+            data={"messaging_product": "whatsapp", "type": mime_type},
+            files={"file": (file_name, content, mime_type)},
+        )
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def send_many(
+        self, messages: list[dict], concurrency: int = WA_API_CONCURRENCY
+    ) -> list[httpx.Response | Exception]:
+        """
+        Function to send a batch of messages concurrently from sync code, see `AsyncWhatsAppClient.send_many`.
+        """
+
+        async def send_all() -> list[httpx.Response | Exception]:
+            async with self.get_async_client() as client:
+                return await client.send_many(messages, concurrency)
+
+        return asyncio.run(send_all())
+
+    def send_ordered(
+        self, messages: list[dict], gap: float = WA_ORDERED_SEND_GAP
+    ) -> list[httpx.Response | Exception]:
+        """
+        Function to send the parts of a reply in order from sync code, see `AsyncWhatsAppClient.send_ordered`.
+        """
+
+        async def send_all() -> list[httpx.Response | Exception]:
+            async with self.get_async_client() as client:
+                return await client.send_ordered(messages, gap)
+
+        return asyncio.run(send_all())
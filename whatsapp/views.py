@@ -1,33 +1,26 @@
 from datetime import timedelta
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.request import Request
 from rest_framework import status
 from django.utils import timezone
-from django.core.cache import cache
-from decouple import config, Csv
-import django_rq
+from decouple import config
 import logging
 import os
 
-from common_config.common import CURRENT_ENVIRONMENT
+from bookings.decorators import user_type_required
+from common_config.common import ADMIN_USER, WA_WEBHOOK_MODE
 
 from .messages.message_handlers import (
-    handle_booking_session_messages,
-    handle_sending_booking_ticket,
-    handle_whatsapp_inquiry_message,
     send_daily_review_message,
-    send_date_list_message,
-    send_my_bookings_message,
     send_welcome_message,
-    whatsapp_config,
 )
+from .outbox import get_outbox_metrics
+from .statuses import get_template_delivery_rollups
+from .webhook_utils import get_webhook_stats, handle_webhook_payload
 
 
-TESTING_NUMBERS = config("WA_TEST_NUMBERS", cast=Csv())
-CONVERSATION_TIMEOUT = 24*60*60
-
 logging.getLogger(__name__)
-high_queue = django_rq.get_queue("high")
 
 
 class WhatsAppTestTriggerAPIView(APIView):
@@ -67,19 +60,6 @@ class WhatsAppWebhook(APIView):
     Class to handle the webhook for WhatsApp.
     """
 
-    def get_message(self, data: dict) -> str | None:
-        message = None
-        entry = data.get("entry", [])
-        if entry:
-            changes = entry[0].get("changes", [])
-            if changes:
-                value = changes[0].get("value")
-                if value:
-                    message_tmp = value.get("messages")
-                    if message_tmp:
-                        message = message_tmp[0]
-        return message
-
     def get(self, request):
         mode = request.GET.get("hub.mode")
         token = request.GET.get("hub.verify_token")
@@ -93,116 +73,39 @@ class WhatsAppWebhook(APIView):
     def post(self, request):
         """
         Function to handle the post request.
+
+        Every message and status of the payload is dispatched. With `WA_WEBHOOK_MODE=async` the
+        messages are only validated and queued here and the conversation step runs on the
+        `whatsapp` queue.
         """
         try:
-            data = request.data
-            message = self.get_message(data)
-            if not message:
-                return Response(200)
-            sender = message["from"]
-            received_msg_id = message["id"]
-            msg_context = {
-                "message_id": received_msg_id,
-            }
-            # TODO updated the below line to handle the test environment remove the testing condition
-            if CURRENT_ENVIRONMENT == "test" and sender not in TESTING_NUMBERS:
-                return Response(200)
-            message_payload, message_type = "", ""
-
-            cache.set(f"active_{sender}", True, timeout=CONVERSATION_TIMEOUT)
-            
-            if message.get("text"):
-                message_payload = message["text"]["body"]
-                message_type = "text"
-            elif message.get("interactive"):
-                message_payload = message["interactive"].get("list_reply")
-                if not message_payload:
-                    message_payload = message["interactive"].get("button_reply")
-                message_payload = message_payload["id"]
-                message_type = "interactive"
-            elif message.get("button"):
-                message_payload = message["button"]["payload"]
-                message_type = "button"
-
-            if not message_payload or not message_type:
-                return Response(400)
-
-            logging.info(
-                f"Message received from {sender}: {message_type}, {message_payload}"
-            )
-
-            try:
-                active_session = cache.get(f"booking_session_{sender}")
-                if active_session:
-                    handle_booking_session_messages(
-                        sender,
-                        message_type,
-                        message_payload,
-                        active_session,
-                        msg_context,
-                    )
-                    return Response(200)
-
-                if message_payload == "booking_session_start":
-                    cache.set(
-                        f"booking_session_{sender}",
-                        {
-                            "wa_number": sender,
-                        },
-                        timeout=300,
-                    )
-                    send_date_list_message(sender, msg_context)
-                    return Response(200)
-
-                if message_payload.startswith("booking_ticket_"):
-                    handle_sending_booking_ticket(
-                        sender,
-                        message_payload.replace("booking_ticket_", ""),
-                        msg_context,
-                    )
-                    return Response(200)
-
-                if message_payload == "my_bookings":
-                    send_my_bookings_message(sender, msg_context)
-                    return Response(200)
-
-                if message_payload == "whatsapp_inquiry":
-                    high_queue.enqueue(
-                        handle_whatsapp_inquiry_message,
-                        sender,
-                    )
-                    return Response(200)
-
-                if message_payload.lower().startswith("hi"):
-                    send_welcome_message(sender)
-                    return Response(200)
-
-                logging.warning(f"Unhandled message: data: {str(data)}")
-                whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {
-                        "body": "Sorry, I didn't understand that. Please try again by sending *Hi*."
-                    },
-                    msg_context,
-                )
-                return Response(200)
-            except Exception as e:
-                logging.exception(e)
-                whatsapp_config.send_message(
-                    sender,
-                    "text",
-                    {
-                        "body": "Sorry, there is some technical issue. Please try again later."
-                    },
-                    msg_context,
-                )
-                cache.delete(
-                    f"booking_session_{sender}"
-                )  # delete active booking if there is any.
-
-                return Response(200)
+            handled = handle_webhook_payload(request.data, WA_WEBHOOK_MODE == "async")
+            if not handled:
+                # Meta redelivers the whole payload on an error status, the handled messages are dropped as duplicates
+                return Response(status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return Response(200)
         except Exception as e:
             logging.exception(e)
-
             return Response(500)
+
+
+class WhatsAppWebhookStatsAPIView(APIView):
+    @user_type_required([ADMIN_USER])
+    def get(self, request: Request) -> Response:
+        return Response(get_webhook_stats(), status=status.HTTP_200_OK)
+
+
+class OutboxMetricsAPIView(APIView):
+    @user_type_required([ADMIN_USER])
+    def get(self, request: Request) -> Response:
+        return Response(get_outbox_metrics(), status=status.HTTP_200_OK)
+
+
+class TemplateDeliveryRollupAPIView(APIView):
+    @user_type_required([ADMIN_USER])
+    def get(self, request: Request) -> Response:
+        days = request.GET.get("days", "30")
+        if not days.isnumeric():
+            return Response({"error": "days must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        since = timezone.now() - timedelta(days=int(days))
+        return Response(get_template_delivery_rollups(since), status=status.HTTP_200_OK)
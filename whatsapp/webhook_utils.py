@@ -0,0 +1,403 @@
+from django.core.cache import cache
+from decouple import config, Csv
+import django_rq
+import logging
+import json
+
+from common_config.common import CURRENT_ENVIRONMENT, WA_INBOX_DRAIN_TIMEOUT, WA_SEEN_MESSAGE_TTL
+from common_config.redis_client import get_redis_client
+from .messages.message_handlers import (
+    handle_booking_flow_reply,
+    handle_booking_text_message,
+    handle_promotional_opt_out_message,
+    handle_booking_session_messages,
+    handle_sending_booking_ticket,
+    handle_whatsapp_inquiry_message,
+    send_my_bookings_message,
+    send_welcome_message,
+    start_whatsapp_booking_session,
+    whatsapp_config,
+)
+from .messages.session import delete_booking_session, get_booking_session
+from .statuses import buffer_message_statuses
+
+
+TESTING_NUMBERS = config("WA_TEST_NUMBERS", cast=Csv())
+CONVERSATION_TIMEOUT = 24*60*60
+# Seconds a sender inbox stays locked by its drain job, refreshed on every message
+INBOX_LOCK_TIMEOUT = 5*60
+PROMOTIONAL_OPT_OUT_KEYWORDS = ("stop", "unsubscribe")
+WEBHOOK_MESSAGES_KEY = "wa_webhook_messages"
+WEBHOOK_DUPLICATES_KEY = "wa_webhook_duplicates"
+
+logging.getLogger(__name__)
+
+
+def get_webhook_items(data: dict) -> tuple[list[dict], list[dict]]:
+    """
+    Function to get all the messages and statuses of the webhook payload.
+
+    Meta batches several messages and status updates of multiple entries and changes in one
+    webhook payload under load.
+
+    :param `data`: The webhook payload
+    :return: tuple of the messages and the statuses in the order they are received
+    """
+    messages, statuses = [], []
+    for entry in data.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            messages.extend(value.get("messages") or [])
+            statuses.extend(value.get("statuses") or [])
+    return messages, statuses
+
+
+def get_message_payload(message: dict) -> tuple[str, str]:
+    """
+    Function to get the payload and type of the received message.
+
+    :param `message`: The message object of the webhook payload
+    :return: tuple of message payload and message type, empty strings if the message is not supported
+    """
+    message_payload, message_type = "", ""
+    if message.get("text"):
+        message_payload = message["text"]["body"]
+        message_type = "text"
+    elif message.get("interactive", {}).get("nfm_reply"):
+        # Submission of a WhatsApp Flow
+        message_payload = message["interactive"]["nfm_reply"].get("response_json")
+        message_type = "flow"
+    elif message.get("interactive"):
+        message_payload = message["interactive"].get("list_reply")
+        if not message_payload:
+            message_payload = message["interactive"].get("button_reply")
+        message_payload = message_payload["id"]
+        message_type = "interactive"
+    elif message.get("button"):
+        message_payload = message["button"]["payload"]
+        message_type = "button"
+    return message_payload, message_type
+
+
+def _increment_counter(key: str) -> None:
+    cache.add(key, 0, timeout=None)
+    cache.incr(key)
+
+
+def mark_message_seen(message_id: str) -> bool:
+    """
+    Function to atomically mark the message as seen, Meta redelivers the webhook when it does not
+    get a timely response and a redelivered message must not run its conversation step again.
+
+    :param `message_id`: The WhatsApp message id
+    :return: True if the message is seen for the first time, False for a duplicate
+    """
+    if cache.add(f"wa_seen_{message_id}", 1, timeout=WA_SEEN_MESSAGE_TTL):
+        _increment_counter(WEBHOOK_MESSAGES_KEY)
+        return True
+    _increment_counter(WEBHOOK_DUPLICATES_KEY)
+    return False
+
+
+def forget_message_seen(message_id: str) -> None:
+    """
+    Function to forget a message which could not be processed so that its redelivery is handled.
+
+    :param `message_id`: The WhatsApp message id
+    """
+    cache.delete(f"wa_seen_{message_id}")
+
+
+def get_webhook_stats() -> dict:
+    """
+    Function to get the counters of the received and the dropped duplicate webhook messages.
+    """
+    messages = cache.get(WEBHOOK_MESSAGES_KEY, 0)
+    duplicates = cache.get(WEBHOOK_DUPLICATES_KEY, 0)
+    total = messages + duplicates
+    return {
+        "messages": messages,
+        "duplicates_dropped": duplicates,
+        "duplicate_ratio": round(duplicates / total, 4) if total else 0,
+    }
+
+
+def is_ignored_sender(sender: str) -> bool:
+    # TODO updated the below line to handle the test environment remove the testing condition
+    return CURRENT_ENVIRONMENT == "test" and sender not in TESTING_NUMBERS
+
+
+def handle_webhook_message(sender: str, message_type: str, message_payload: str, msg_context: dict, data: dict) -> None:
+    """
+    Function to run the conversation step of a received message.
+
+    :param `sender`: The number from which message is received
+    :param `message_type`: The type of the message i.e. text, interactive, button or flow
+    :param `message_payload`: The text or the reply id of the message
+    :param `msg_context`: The context of the message i.e. for replying to msg
+    :param `data`: The message object of the webhook payload
+    """
+    cache.set(f"active_{sender}", True, timeout=CONVERSATION_TIMEOUT)
+    logging.info(
+        f"Message received from {sender}: {message_type}, {message_payload}"
+    )
+
+    try:
+        if message_type == "flow":
+            handle_booking_flow_reply(sender, message_payload, msg_context)
+            return
+
+        if message_type == "text" and message_payload.lower().startswith("book "):
+            handle_booking_text_message(sender, message_payload, msg_context)
+            return
+
+        active_session = get_booking_session(sender)
+        if active_session:
+            handle_booking_session_messages(
+                sender,
+                message_type,
+                message_payload,
+                active_session,
+                msg_context,
+            )
+            return
+
+        if message_payload == "booking_session_start":
+            start_whatsapp_booking_session(sender, msg_context)
+            return
+
+        if message_payload.startswith("booking_ticket_"):
+            handle_sending_booking_ticket(
+                sender,
+                message_payload.replace("booking_ticket_", ""),
+                msg_context,
+            )
+            return
+
+        if message_payload == "my_bookings":
+            send_my_bookings_message(sender, msg_context)
+            return
+
+        if message_payload == "whatsapp_inquiry":
+            django_rq.get_queue("high").enqueue(
+                handle_whatsapp_inquiry_message,
+                sender,
+            )
+            return
+
+        if message_type == "text" and message_payload.strip().lower() in PROMOTIONAL_OPT_OUT_KEYWORDS:
+            handle_promotional_opt_out_message(sender, True, msg_context)
+            return
+
+        if message_type == "text" and message_payload.strip().lower() == "start":
+            handle_promotional_opt_out_message(sender, False, msg_context)
+            return
+
+        if message_payload.lower().startswith("hi"):
+            send_welcome_message(sender)
+            return
+
+        logging.warning(f"Unhandled message: data: {str(data)}")
+        whatsapp_config.send_message(
+            sender,
+            "text",
+            {
+                "body": "Sorry, I didn't understand that. Please try again by sending *Hi*."
+            },
+            msg_context,
+        )
+    except Exception as e:
+        logging.exception(e)
+        whatsapp_config.send_message(
+            sender,
+            "text",
+            {
+                "body": "Sorry, there is some technical issue. Please try again later."
+            },
+            msg_context,
+        )
+        delete_booking_session(sender)  # delete active booking if there is any.
+
+
+def handle_webhook_status(message_status: dict) -> None:
+    """
+    Function to handle the delivery status update of a sent message.
+
+    :param `message_status`: The status object of the webhook payload
+    """
+    if message_status.get("status") == "failed":
+        logging.warning(
+            f"Message {message_status.get('id')} to {message_status.get('recipient_id')} failed: {message_status.get('errors')}"
+        )
+        return
+    logging.info(
+        f"Message {message_status.get('id')} to {message_status.get('recipient_id')}: {message_status.get('status')}"
+    )
+
+
+def dispatch_webhook_message(message: dict, async_mode: bool = False) -> bool:
+    """
+    Function to handle a single message of the webhook payload exactly once.
+
+    :param `message`: The message object of the webhook payload
+    :param `async_mode`: Queue the message for the `whatsapp` queue instead of handling it here
+    :return: False if the message could not be handled and should be redelivered
+    """
+    sender = message.get("from")
+    received_msg_id = message.get("id")
+    if not sender or not received_msg_id or is_ignored_sender(sender):
+        return True
+
+    message_payload, message_type = get_message_payload(message)
+    if not message_payload or not message_type:
+        logging.warning(f"Unsupported message {received_msg_id} from {sender}: {message.get('type')}")
+        return True
+
+    if not mark_message_seen(received_msg_id):
+        logging.info(f"Duplicate message {received_msg_id} from {sender} dropped")
+        return True
+
+    try:
+        if async_mode:
+            enqueue_webhook_message(sender, message)
+        else:
+            handle_webhook_message(
+                sender,
+                message_type,
+                message_payload,
+                {"message_id": received_msg_id},
+                message,
+            )
+        return True
+    except Exception as e:
+        logging.exception(e)
+        forget_message_seen(received_msg_id)
+        return False
+
+
+def handle_webhook_payload(data: dict, async_mode: bool = False) -> bool:
+    """
+    Function to dispatch every message and status of the webhook payload.
+
+    :param `data`: The webhook payload
+    :param `async_mode`: Queue the messages for the `whatsapp` queue instead of handling them here
+    :return: False if any message could not be handled, the handled ones are dropped on redelivery
+    """
+    messages, statuses = get_webhook_items(data)
+    handled = True
+    for message in messages:
+        handled = dispatch_webhook_message(message, async_mode) and handled
+    for message_status in statuses:
+        try:
+            handle_webhook_status(message_status)
+        except Exception as e:
+            logging.exception(e)
+    try:
+        buffer_message_statuses(statuses)
+    except Exception as e:
+        logging.exception(e)
+    return handled
+
+
+def enqueue_webhook_message(sender: str, message: dict) -> None:
+    """
+    Function to queue the message for processing in the worker.
+
+    Messages are pushed to an inbox list of the sender and only one drain job per sender runs at
+    a time, so the messages of a sender are handled in the order they are received.
+
+    :param `sender`: The number from which message is received
+    :param `message`: The message object of the webhook payload
+    """
+    redis_client = get_redis_client()
+    inbox_key, lock_key = f"wa_inbox_{sender}", f"wa_inbox_lock_{sender}"
+    raw_message = json.dumps(message)
+    with redis_client.pipeline() as pipe:
+        pipe.rpush(inbox_key, raw_message)
+        pipe.set(lock_key, 1, nx=True, ex=INBOX_LOCK_TIMEOUT)
+        _, locked = pipe.execute()
+    if locked:
+        try:
+            enqueue_inbox_drain(sender)
+        except Exception:
+            # No drain will run, take the message back so that the redelivered webhook handles it
+            # and release the lock so that the next message of the sender enqueues a drain
+            with redis_client.pipeline() as pipe:
+                pipe.lrem(inbox_key, -1, raw_message)
+                pipe.delete(lock_key)
+                pipe.execute()
+            raise
+
+
+def enqueue_inbox_drain(sender: str) -> None:
+    """
+    Function to enqueue the drain of the inbox of the sender, the caller holds the inbox lock.
+
+    :param `sender`: The number from which messages are received
+    """
+    django_rq.get_queue("whatsapp").enqueue(
+        drain_webhook_messages, sender, job_timeout=WA_INBOX_DRAIN_TIMEOUT
+    )
+
+
+def sweep_webhook_inboxes() -> str:
+    """
+    RQ job to enqueue a drain for every inbox which has messages and no lock, i.e. its drain job
+    was killed by the job timeout or a worker restart and its lock has expired.
+    """
+    redis_client = get_redis_client()
+    enqueued = 0
+    for key in redis_client.scan_iter(match="wa_inbox_*", count=1000):
+        key = key.decode()
+        if key.startswith("wa_inbox_lock_"):
+            continue
+        sender = key.removeprefix("wa_inbox_")
+        lock_key = f"wa_inbox_lock_{sender}"
+        if not redis_client.set(lock_key, 1, nx=True, ex=INBOX_LOCK_TIMEOUT):
+            continue
+        if not redis_client.llen(key):
+            redis_client.delete(lock_key)
+            continue
+        try:
+            enqueue_inbox_drain(sender)
+        except Exception:
+            redis_client.delete(lock_key)
+            raise
+        enqueued += 1
+    if enqueued:
+        logging.warning(f"Enqueued {enqueued} drains of the webhook inboxes left behind")
+    return f"Enqueued {enqueued} inbox drains"
+
+
+def drain_webhook_messages(sender: str) -> int:
+    """
+    Function to handle the queued messages of the sender in order.
+
+    :param `sender`: The number from which messages are received
+    :return: Number of handled messages
+    """
+    redis_client = get_redis_client()
+    inbox_key, lock_key = f"wa_inbox_{sender}", f"wa_inbox_lock_{sender}"
+    handled = 0
+    while True:
+        raw_message = redis_client.lpop(inbox_key)
+        if raw_message is None:
+            redis_client.delete(lock_key)
+            # A message pushed after the last pop could not take the lock, drain it as well
+            if redis_client.llen(inbox_key) and redis_client.set(lock_key, 1, nx=True, ex=INBOX_LOCK_TIMEOUT):
+                continue
+            return handled
+        redis_client.expire(lock_key, INBOX_LOCK_TIMEOUT)
+        try:
+            message = json.loads(raw_message)
+            message_payload, message_type = get_message_payload(message)
+            handle_webhook_message(
+                sender,
+                message_type,
+                message_payload,
+                {"message_id": message["id"]},
+                message,
+            )
+        except Exception as e:
+            logging.exception(e)
+        handled += 1